@@ -0,0 +1,266 @@
+"""Fetch the pages of a `<category>/links/combine.txt` frontier.
+
+Writes the same `{"input": url, "result": html}` job files the external
+scraper produced, so 1.prettier_json.py and 2.extract_all.py read them
+unchanged. Connections are pooled and kept alive, requests are capped and
+spaced out per host, failed requests are retried with backoff, and pages
+fetched before are revalidated with ETag/Last-Modified so an unchanged page
+costs a 304 instead of a download.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
+from combine_link import CATEGORIES, FRONTIER_FILE, normalise_url
+
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "4"))
+# Requests per second per host, 0 for no limit
+FETCH_RATE = float(os.getenv("FETCH_RATE", "2"))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+# Longest wait before a retry, whatever Retry-After asks for
+FETCH_MAX_RETRY_DELAY = float(os.getenv("FETCH_MAX_RETRY_DELAY", "60"))
+FETCH_CACHE_FILE = os.getenv("FETCH_CACHE", "fetch_cache.sqlite")
+USER_AGENT = os.getenv(
+    "FETCH_USER_AGENT",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0 Safari/537.36",
+)
+
+# Statuses worth another attempt; anything else that isn't 200/304 fails
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Commit the page cache every this many pages
+CACHE_COMMIT_INTERVAL = 100
+
+
+class PageCache:
+    """Last fetched body and validators of every URL, in a SQLite file."""
+
+    def __init__(self, path=FETCH_CACHE_FILE):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT)"
+        )
+
+    def get(self, url):
+        row = self._connection.execute(
+            "SELECT etag, last_modified, body FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "body": row[2]}
+
+    def put(self, url, etag, last_modified, body):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, body) "
+            "VALUES (?, ?, ?, ?)",
+            (url, etag, last_modified, body),
+        )
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self.commit()
+        self._connection.close()
+
+
+class HostLimiter:
+    """Caps the concurrent requests to one host and spaces out their starts."""
+
+    def __init__(self, concurrency=FETCH_PER_HOST, rate=FETCH_RATE):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1 / rate if rate else 0.0
+        self._next_start = 0.0
+
+    async def wait_turn(self):
+        # Reserve the next start slot before sleeping, so waiters queue up in order
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start)
+        self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def retry_delay(response, attempt, max_delay=FETCH_MAX_RETRY_DELAY):
+    # Honour Retry-After (seconds or an HTTP date), otherwise back off
+    # exponentially; either way one server can't stall a worker past max_delay
+    delay = 2**attempt
+    retry_after = response.headers.get("Retry-After") if response else None
+    if retry_after:
+        try:
+            delay = max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                delay = max(0.0, retry_at.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(delay, max_delay)
+
+
+async def fetch_page(
+    client,
+    url,
+    limiter,
+    cache=None,
+    retries=FETCH_RETRIES,
+    max_delay=FETCH_MAX_RETRY_DELAY,
+):
+    """Return ("fetched" | "not_modified" | "failed", html or error) for `url`."""
+    cached = cache.get(url) if cache is not None else None
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    error = None
+    for attempt in range(retries + 1):
+        response = None
+        async with limiter.semaphore:
+            await limiter.wait_turn()
+            try:
+                response = await client.get(url, headers=headers)
+            # Any request error (connection, redirect loop, bad encoding)
+            # fails this URL only, never the whole run
+            except httpx.RequestError as e:
+                error = f"{type(e).__name__}: {e}"
+        if response is not None:
+            if response.status_code == 304 and cached:
+                return "not_modified", cached["body"]
+            if response.status_code == 200:
+                if cache is not None:
+                    cache.put(
+                        url,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                        response.text,
+                    )
+                return "fetched", response.text
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUSES:
+                break
+        if attempt < retries:
+            await asyncio.sleep(retry_delay(response, attempt, max_delay))
+    return "failed", error
+
+
+def load_frontier_urls(frontier_file):
+    """Return the normalised URLs of a frontier file, without duplicates."""
+    with open(frontier_file, "r", encoding="utf-8") as file:
+        urls = [normalise_url(line) for line in file if line.strip()]
+    return list(dict.fromkeys(urls))
+
+
+async def fetch_to_jsonl(
+    urls,
+    output_file,
+    concurrency=FETCH_CONCURRENCY,
+    per_host=FETCH_PER_HOST,
+    rate=FETCH_RATE,
+    retries=FETCH_RETRIES,
+    cache=None,
+    timeout=FETCH_TIMEOUT,
+    max_delay=FETCH_MAX_RETRY_DELAY,
+):
+    """Fetch `urls` into a job file; return a summary of the run.
+
+    Pages are written as soon as they arrive, so the file is in completion
+    order. Failed URLs are left out and listed in the summary.
+    """
+    summary = {"fetched": 0, "not_modified": 0, "failed": [], "seconds": 0.0}
+    limiters = {}
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    started = time.perf_counter()
+    tmp_file = f"{output_file}.tmp"
+    try:
+        async with httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        ) as client:
+            with open(tmp_file, "w", encoding="utf-8") as file:
+
+                async def worker():
+                    while not queue.empty():
+                        url = queue.get_nowait()
+                        host = urlsplit(url).netloc
+                        limiter = limiters.setdefault(host, HostLimiter(per_host, rate))
+                        status, result = await fetch_page(
+                            client, url, limiter, cache, retries, max_delay
+                        )
+                        if status == "failed":
+                            summary["failed"].append((url, result))
+                            continue
+                        summary[status] += 1
+                        file.write(json.dumps({"input": url, "result": result}) + "\n")
+                        if (
+                            cache is not None
+                            and (summary["fetched"] + summary["not_modified"])
+                            % CACHE_COMMIT_INTERVAL
+                            == 0
+                        ):
+                            cache.commit()
+
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+        os.replace(tmp_file, output_file)
+    finally:
+        # An aborted run leaves no partial job file behind
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    if cache is not None:
+        cache.commit()
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def print_fetch_summary(summary, label="Fetch"):
+    pages = summary["fetched"] + summary["not_modified"]
+    seconds = summary["seconds"] or float("inf")
+    print(
+        f"{label}: {pages} pages in {summary['seconds']:.2f}s "
+        f"({pages / seconds:.1f} pages/sec), {summary['fetched']} downloaded, "
+        f"{summary['not_modified']} not modified, {len(summary['failed'])} failed"
+    )
+    for url, error in summary["failed"]:
+        print(f"  failed {url}: {error}")
+
+
+def fetch_category(category, cache_file=FETCH_CACHE_FILE, **options):
+    """Fetch `<category>/links/combine.txt` into `<category>/job-<time>-result.jsonl`."""
+    urls = load_frontier_urls(os.path.join(category, "links", FRONTIER_FILE))
+    output_file = os.path.join(
+        category, f"job-{datetime.now():%Y%m%d%H%M%S}-result.jsonl"
+    )
+    # cache_file=None downloads every page again
+    cache = PageCache(cache_file) if cache_file else None
+    try:
+        summary = asyncio.run(fetch_to_jsonl(urls, output_file, cache=cache, **options))
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Pages written to '{output_file}'")
+    print_fetch_summary(summary, f"Fetch '{category}'")
+    return summary
+
+
+if __name__ == "__main__":
+    for category in CATEGORIES:
+        fetch_category(category)
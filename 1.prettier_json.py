@@ -1,51 +1,65 @@
 import json
-from bs4 import BeautifulSoup
 import os
 import glob
+from html_backend import DEFAULT_BACKEND, make_soup
 
-# Specify the directory containing the .jsonl files
-input_directory = "do"  # Replace with your directory path
-output_directory = os.path.join(
-    input_directory, "prettier_json"
-)  # Output in a subdirectory
+# Only needed when 2.extract_all.py runs without streaming=True, which reads
+# the .jsonl job files directly
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_directory, exist_ok=True)
 
-# Get all .jsonl files in the directory
-jsonl_files = glob.glob(os.path.join(input_directory, "*.jsonl"))
+def prettify_directory(input_directory, output_directory=None):
+    """Prettify the .jsonl job files of `input_directory`; return the files written."""
+    if output_directory is None:
+        output_directory = os.path.join(
+            input_directory, "prettier_json"
+        )  # Output in a subdirectory
 
-# Process each .jsonl file
-for input_file in jsonl_files:
-    # Read the JSONL file
-    with open(input_file, "r", encoding="utf-8") as f_in:
-        json_data = [json.loads(line) for line in f_in]
+    # Create the output directory if it doesn't exist
+    os.makedirs(output_directory, exist_ok=True)
 
-    # Reformat each JSON object and prettify the HTML
-    for entry in json_data:
-        # Rename the keys
-        entry["url"] = entry.pop("input")
-        entry["html"] = entry.pop("result")
+    # Get all .jsonl files in the directory
+    jsonl_files = glob.glob(os.path.join(input_directory, "*.jsonl"))
 
-        # Use BeautifulSoup to prettify the HTML
-        soup = BeautifulSoup(entry["html"], "html.parser")
-        entry["html"] = soup.prettify()
+    # Process each .jsonl file
+    output_files = []
+    for input_file in jsonl_files:
+        # Read the JSONL file
+        with open(input_file, "r", encoding="utf-8") as f_in:
+            json_data = [json.loads(line) for line in f_in]
 
-    # Determine the base output file name
-    base_name = os.path.basename(input_file).replace(".jsonl", "_output")
+        # Reformat each JSON object and prettify the HTML
+        for entry in json_data:
+            # Rename the keys
+            entry["url"] = entry.pop("input")
+            entry["html"] = entry.pop("result")
 
-    # Determine the next available number for the output file
-    file_number = 1
-    while os.path.exists(
-        os.path.join(output_directory, f"{base_name}{file_number}.json")
-    ):
-        file_number += 1
+            # Use BeautifulSoup to prettify the HTML (tree builder set by HTML_PARSER)
+            soup = make_soup(entry["html"], DEFAULT_BACKEND)
+            entry["html"] = soup.prettify()
 
-    # Construct the output file path with the incremented number
-    output_file = os.path.join(output_directory, f"{base_name}{file_number}.json")
+        # Determine the base output file name
+        base_name = os.path.basename(input_file).replace(".jsonl", "_output")
 
-    # Write the reformatted and prettified data to a JSON file
-    with open(output_file, "w", encoding="utf-8") as f_out:
-        json.dump(json_data, f_out, indent=4)
+        # Determine the next available number for the output file
+        file_number = 1
+        while os.path.exists(
+            os.path.join(output_directory, f"{base_name}{file_number}.json")
+        ):
+            file_number += 1
 
-    print(f"Reformatted and prettified data written to {output_file}")
+        # Construct the output file path with the incremented number
+        output_file = os.path.join(output_directory, f"{base_name}{file_number}.json")
+
+        # Write the reformatted and prettified data to a JSON file
+        with open(output_file, "w", encoding="utf-8") as f_out:
+            json.dump(json_data, f_out, indent=4)
+
+        print(f"Reformatted and prettified data written to {output_file}")
+        output_files.append(output_file)
+    return output_files
+
+
+if __name__ == "__main__":
+    # Specify the directory containing the .jsonl files
+    input_directory = "do"  # Replace with your directory path
+    prettify_directory(input_directory)
@@ -2,8 +2,28 @@ import json
 import html
 import os
 import re
-from bs4 import BeautifulSoup
+import textwrap
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from extraction_cache import EXTRACTION_CACHE_FILE, ExtractionCache
+from extraction_profile import (
+    EXTRACTION_PROFILE_FILE,
+    NO_PROFILE,
+    ExtractionProfile,
+    append_profile,
+    print_profile_report,
+)
+from html_backend import DEFAULT_BACKEND, class_matches, get_backend
+from id_allocator import (
+    DEFAULT_REGISTRY_FILE,
+    allocate_id,
+    get_prefix,
+    load_registry,
+    new_registry,
+    save_registry,
+)
 
 
 def convert_time_string(value):
@@ -18,6 +38,63 @@ def convert_time_string(value):
 LATITUDE_PATTERN = r'"latitude":(\d+\.\d+)'
 LONGITUDE_PATTERN = r'"longitude":(\d+\.\d+)'
 LAT_LONG_PATTERN = r"latitude%5C%5C%5C%22%3A(\d+\.\d+)%2C%5C%5C%5C%22longitude%5C%5C%5C%22%3A(\d+\.\d+)"
+DESCRIPTION_PATTERN = r'"description":"(.*?)"'
+DURATION_PATTERN = r"Duration:\s*.*?(\d+)"
+JSON_LD_PATTERN = r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>'
+OPENING_HOURS_PATTERN = r"(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})"
+HEADING_TAGS = ("h1", "h2", "h3")
+ABOUT_CLASS = "ui_columns"
+DESCRIPTION_TAG_CLASS = "SrqKb"
+PARTIAL_REVIEW_CLASS = "partial_entry"
+DODO_REVIEW_OUTER_CLASS = "JguWG"
+DODO_REVIEW_INNER_CLASS = "yCeTE"
+NEARBY_TITLE_CLASS = "biGQs _P fiohW ngXxk"
+NEARBY_SECTION_TITLE_CLASS = "sectionTitle"
+NEARBY_BLOCK_CLASS = "xCVkR"
+NEARBY_BLOCK_ITEM_CLASS = "o W q"
+NEARBY_LIST_CLASS = "yvHvW"
+NEARBY_LIST_ITEM_CLASS = "biGQs _P alXOW oCpZu GzNcM nvOhm UTQMg ZTpaU ngXxk"
+
+# Extraction settings per category directory, in process_files argument order:
+# name_key, desc_class, reviews_class, time_class, duration, best_nearby_hotels
+CATEGORY_SETTINGS = {
+    "eat": (
+        "foodAndDrink_name",
+        "biGQs _P pZUbB alXOW eWlDX GzNcM ATzgx UTQMg TwpTY hmDzD",
+        "JguWG",
+        "biGQs _P pZUbB egaXP hmDzD",
+        False,
+        True,
+    ),
+    "stay": (
+        "accommodation_name",
+        "uqMDf z BGJxv YGfmd YQkjl",
+        "orRIx Ci _a C",
+        ("12:00 AM", "11:59 PM"),
+        False,
+        False,
+    ),
+    "do": ("activity_name", "USjYi _d", "dodo", "EFKKt", True, False),
+}
+
+
+# Bump whenever a change to the extractors changes their output, so cached
+# classifications from older code are not reused (see extraction_cache.py)
+EXTRACTOR_VERSION = "2"
+
+# Worker pool defaults: one process per core, pages sent to workers in chunks
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_CHUNKSIZE = 8
+
+# "embedded_state" fills name, coordinates, description, hours and duration
+# from the page's embedded JSON state and only looks the rest up in the DOM,
+# which is not parsed at all when the page has none of the classes it needs
+EXTRACTION_MODES = ("dom", "embedded_state")
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "dom")
+
+# Output layouts of process_files: an indented JSON array, one object per line,
+# or a columnar.py directory the loaders can memory-map column by column
+OUTPUT_FORMATS = ("json", "jsonl", "columns")
 
 
 # Utility functions
@@ -25,25 +102,176 @@ def remove_newline_and_extra_spaces(string):
     return re.sub(r"\s+", " ", string).replace("\n", "").strip()
 
 
-def extract_lat_long(html_content):
+def extract_lat_long(html_content, profile=NO_PROFILE):
     latitude_match = re.search(LATITUDE_PATTERN, html_content)
     longitude_match = re.search(LONGITUDE_PATTERN, html_content)
 
     if latitude_match and longitude_match:
+        profile.lap("coordinates/plain", True)
         return float(latitude_match.group(1)), float(longitude_match.group(1))
+    profile.lap("coordinates/plain", False)
 
     lat_long_match = re.search(LAT_LONG_PATTERN, html_content)
+    profile.lap("coordinates/url_encoded", bool(lat_long_match))
     if lat_long_match:
         return float(lat_long_match.group(1)), float(lat_long_match.group(2))
 
     return None, None
 
 
-def clean_reviews(reviews):
+def iter_json_ld(html_content):
+    """Yield the schema.org objects of a page's JSON-LD script blocks."""
+    for match in re.finditer(JSON_LD_PATTERN, html_content, re.S | re.I):
+        try:
+            data = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict):
+                yield item
+                yield from (
+                    node for node in item.get("@graph", []) if isinstance(node, dict)
+                )
+
+
+def json_ld_hours(place):
+    # Either openingHoursSpecification objects or an "Mo-Su 09:00-17:30" string
+    specifications = place.get("openingHoursSpecification")
+    if isinstance(specifications, dict):
+        specifications = [specifications]
+    for specification in specifications or []:
+        if specification.get("opens") and specification.get("closes"):
+            return specification["opens"], specification["closes"]
+    opening_hours = place.get("openingHours")
+    if isinstance(opening_hours, list):
+        opening_hours = opening_hours[0] if opening_hours else None
+    if isinstance(opening_hours, str):
+        match = re.search(OPENING_HOURS_PATTERN, opening_hours)
+        if match:
+            return match.group(1), match.group(2)
+    return None
+
+
+def convert_24h_time(value):
+    try:
+        # Convert '9:00' or '09:00:00' to '09:00:00', like convert_time_string
+        hours, minutes, *seconds = [int(field) for field in value.split(":")]
+        return f"{hours:02d}:{minutes:02d}:{seconds[0] if seconds else 0:02d}"
+    except (ValueError, AttributeError):
+        return value
+
+
+def extract_embedded_state(html_content, duration=False):
+    """Return the fields the page's embedded state resolves, without a DOM.
+
+    The place's JSON-LD object comes first; coordinates, description and
+    duration then fall back to the state patterns the DOM path also searches.
+    Fields the state doesn't have are left out. Its description is only the
+    place's summary: classify_page uses it when the DOM has no description.
+    """
+    state = {}
+    place = next(
+        (
+            item
+            for item in iter_json_ld(html_content)
+            if "geo" in item or "address" in item
+        ),
+        {},
+    )
+    if isinstance(place.get("name"), str) and place["name"].strip():
+        state["name"] = place["name"].strip()
+    if isinstance(place.get("description"), str) and place["description"].strip():
+        state["about_and_tags"] = [
+            remove_newline_and_extra_spaces(place["description"])
+        ]
+    geo = place.get("geo")
+    if isinstance(geo, dict):
+        try:
+            state["latitude"] = float(geo["latitude"])
+            state["longitude"] = float(geo["longitude"])
+        except (KeyError, TypeError, ValueError):
+            state.pop("latitude", None)
+    hours = json_ld_hours(place)
+    if hours:
+        state["start_time"] = convert_24h_time(hours[0])
+        state["end_time"] = convert_24h_time(hours[1])
+
+    if "latitude" not in state:
+        latitude, longitude = extract_lat_long(html_content)
+        if latitude is not None:
+            state["latitude"], state["longitude"] = latitude, longitude
+    if "about_and_tags" not in state:
+        description_match = re.search(DESCRIPTION_PATTERN, html_content)
+        if description_match:
+            state["about_and_tags"] = [description_match.group(1)]
+    if duration:
+        duration_match = re.search(DURATION_PATTERN, html_content)
+        if duration_match:
+            state["duration"] = int(duration_match.group(1))
+    return state
+
+
+def compile_extraction_plan(desc_class, reviews_class=None, time_class=None):
+    """Return every class selector a page walk has to collect for these settings."""
+    classes = {
+        desc_class,
+        ABOUT_CLASS,
+        DESCRIPTION_TAG_CLASS,
+        PARTIAL_REVIEW_CLASS,
+        NEARBY_TITLE_CLASS,
+        NEARBY_SECTION_TITLE_CLASS,
+        NEARBY_BLOCK_CLASS,
+        NEARBY_LIST_CLASS,
+    }
+    if reviews_class:
+        classes.add(reviews_class)
+    if reviews_class == "dodo":
+        classes.add(DODO_REVIEW_OUTER_CLASS)
+    if isinstance(time_class, str):
+        classes.add(time_class)
+    return frozenset(classes)
+
+
+def collect_buckets(document, plan, backend):
+    """Walk the tree once and bucket the elements each field extractor needs.
+
+    Buckets keep document order and match like `soup.find_all(class_=...)`: a
+    selector hits an element when it equals one of its classes or the whole
+    class attribute. Headings are collected under "headings".
+    """
+    buckets = {selector: [] for selector in plan}
+    buckets["headings"] = []
+    for tag in backend.iter_elements(document):
+        if backend.tag_name(tag) in HEADING_TAGS:
+            buckets["headings"].append(tag)
+        classes = backend.classes(tag)
+        if not classes:
+            continue
+        for selector in plan.intersection(classes + [" ".join(classes)]):
+            buckets[selector].append(tag)
+    return buckets
+
+
+def lookup_class(document, buckets, selector, backend):
+    # Selectors outside the plan (e.g. a missing time_class) fall back to a walk
+    if selector in buckets:
+        return buckets[selector]
+    elements = backend.iter_elements(document)
+    if selector is None:
+        # find_all(class_=None) has no class filter at all
+        return list(elements)
+    return [
+        element
+        for element in elements
+        if class_matches(backend.classes(element), selector)
+    ]
+
+
+def clean_reviews(reviews, backend):
     return (
         [
             remove_newline_and_extra_spaces(
-                re.sub(r"[^\x00-\x7F]+", "", review.text.strip())
+                re.sub(r"[^\x00-\x7F]+", "", backend.text(review).strip())
             )
             for review in reviews
         ]
@@ -52,7 +280,7 @@ def clean_reviews(reviews):
     )
 
 
-def extract_nearby_places(soup, best_nearby_hotels):
+def extract_nearby_places(buckets, best_nearby_hotels, backend, profile=NO_PROFILE):
 
     # Initialize the classification dictionary with the new fields
     if not best_nearby_hotels:
@@ -78,12 +306,12 @@ def extract_nearby_places(soup, best_nearby_hotels):
         }
 
     # First method to find nearby places
-    nearby_places = soup.find_all(class_="biGQs _P fiohW ngXxk")
+    nearby_places = buckets[NEARBY_TITLE_CLASS]
     if not nearby_places:
-        nearby_places = soup.find_all(class_="sectionTitle")
+        nearby_places = buckets[NEARBY_SECTION_TITLE_CLASS]
 
     if nearby_places:
-        nearby_places_text = [place.text.strip() for place in nearby_places]
+        nearby_places_text = [backend.text(place).strip() for place in nearby_places]
         # Identify indexes for hotels, restaurants, and attractions
         try:
             index_best_nearby_hotels = nearby_places_text.index("Best nearby hotels")
@@ -143,228 +371,645 @@ def extract_nearby_places(soup, best_nearby_hotels):
             )
         except ValueError:
             pass
+    profile.lap("nearby/titles", nearby_complete(classification_nearby))
 
     # Second method if the first one didn't work or only found restaurants and attractions
     if not any(
         [classification_nearby[f"nearby_foodAndDrink{i}"] for i in range(1, 4)]
     ) or not any([classification_nearby[f"nearby_activity{i}"] for i in range(1, 4)]):
-        nearby_places = soup.find_all(class_="xCVkR")
+        nearby_places = buckets[NEARBY_BLOCK_CLASS]
         if nearby_places:
+            nearby_places_text = [
+                backend.text(place).strip() for place in nearby_places
+            ]
             res = [
-                place for place in nearby_places if "Restaurants" in place.text.strip()
+                place
+                for place, text in zip(nearby_places, nearby_places_text)
+                if "Restaurants" in text
             ]
             attr = [
-                place for place in nearby_places if "Attractions" in place.text.strip()
+                place
+                for place, text in zip(nearby_places, nearby_places_text)
+                if "Attractions" in text
             ]
 
             if res:
-                res = [place.find_all(class_="o W q") for place in res]
+                res = [
+                    backend.find_all_class(place, NEARBY_BLOCK_ITEM_CLASS)
+                    for place in res
+                ]
                 restaurants = [
-                    item.text.strip() for sublist in res for item in sublist if item
+                    backend.text(item).strip()
+                    for sublist in res
+                    for item in sublist
+                    if item
                 ][:3]
                 for i, restaurant in enumerate(restaurants):
                     classification_nearby[f"nearby_foodAndDrink{i+1}"] = restaurant
             if attr:
-                attr = [place.find_all(class_="o W q") for place in attr]
+                attr = [
+                    backend.find_all_class(place, NEARBY_BLOCK_ITEM_CLASS)
+                    for place in attr
+                ]
                 attractions = [
-                    item.text.strip() for sublist in attr for item in sublist if item
+                    backend.text(item).strip()
+                    for sublist in attr
+                    for item in sublist
+                    if item
                 ][:3]
                 for i, attraction in enumerate(attractions):
                     classification_nearby[f"nearby_activity{i+1}"] = attraction
+        profile.lap("nearby/blocks", nearby_complete(classification_nearby))
 
     # Third method if previous methods didn't yield results
     if not any(
         [classification_nearby[f"nearby_foodAndDrink{i}"] for i in range(1, 4)]
     ) or not any([classification_nearby[f"nearby_activity{i}"] for i in range(1, 4)]):
-        nearby_places = soup.find_all(class_="yvHvW")
+        nearby_places = buckets[NEARBY_LIST_CLASS]
         if nearby_places:
-            res = nearby_places[0].find_all(
-                class_="biGQs _P alXOW oCpZu GzNcM nvOhm UTQMg ZTpaU ngXxk"
-            )
-            attr = nearby_places[1].find_all(
-                class_="biGQs _P alXOW oCpZu GzNcM nvOhm UTQMg ZTpaU ngXxk"
-            )
+            res = backend.find_all_class(nearby_places[0], NEARBY_LIST_ITEM_CLASS)
+            attr = backend.find_all_class(nearby_places[1], NEARBY_LIST_ITEM_CLASS)
 
             restaurants = [
-                remove_newline_and_extra_spaces(restaurant.text.strip())
+                remove_newline_and_extra_spaces(backend.text(restaurant).strip())
                 for restaurant in res
-                if restaurant.text.strip() != ""
+                if backend.text(restaurant).strip() != ""
             ][:3]
             attractions = [
-                remove_newline_and_extra_spaces(attraction.text.strip())
+                remove_newline_and_extra_spaces(backend.text(attraction).strip())
                 for attraction in attr
-                if attraction.text.strip() != ""
+                if backend.text(attraction).strip() != ""
             ][:3]
 
             for i, restaurant in enumerate(restaurants):
                 classification_nearby[f"nearby_foodAndDrink{i+1}"] = restaurant
             for i, attraction in enumerate(attractions):
                 classification_nearby[f"nearby_activity{i+1}"] = attraction
+        profile.lap("nearby/lists", nearby_complete(classification_nearby))
 
     return classification_nearby
 
 
-def get_next_id(existing_ids, prefix):
-    # Extract numbers from IDs that match the given prefix
-    ids_with_prefix = [
-        int(id[len(prefix) :]) for id in existing_ids if id.startswith(prefix)
-    ]
-    if ids_with_prefix:
-        next_id_num = max(ids_with_prefix) + 1
-    else:
-        next_id_num = 1
-    return f"{prefix}{next_id_num:04d}"
+def nearby_complete(classification_nearby):
+    # What the fallback methods of extract_nearby_places check before running
+    return any(
+        classification_nearby[f"nearby_foodAndDrink{i}"] for i in range(1, 4)
+    ) and any(classification_nearby[f"nearby_activity{i}"] for i in range(1, 4))
 
 
-def generate_id(category_name, existing_ids):
-    if category_name == "foodAndDrink_name":
-        prefix = "F"
-    elif category_name == "accommodation_name":
-        prefix = "H"
-    elif category_name == "activity_name":
-        prefix = "A"
-    else:
-        raise ValueError("Unknown table name")
+def generate_id(category_name, id_registry, key=None):
+    # Raises ValueError("Unknown table name") for anything but F/H/A categories
+    prefix = get_prefix(category_name)
 
-    # Generate the next ID
-    return get_next_id(existing_ids, prefix)
+    # Look up or allocate the ID in O(1)
+    return allocate_id(id_registry, prefix, key)
 
 
-def clean_html_and_classify(
-    json_data,
+def classify_page(
+    html_content,
     name_key,
     desc_class,
     reviews_class=None,
     time_class=None,
     duration=False,
     best_nearby_hotels=True,
+    parser_backend=DEFAULT_BACKEND,
+    extraction_mode="dom",
+    sources=None,
+    profile=None,
 ):
-    cleaned_json = []
+    """Extract the classification fields of one unescaped page (without its ID).
 
-    for entry in json_data:
-        url = entry.get("url", "")
-        html_content = html.unescape(entry.get("html", ""))
-        soup = BeautifulSoup(html_content, "html.parser")
+    In "embedded_state" mode, `sources` (a Counter) counts the fields resolved
+    from the embedded state ("fast") and from the DOM ("fallback"). An
+    ExtractionProfile `profile` records the time and hits of every step.
+    """
+    if profile is None:
+        profile = NO_PROFILE
+    profile.start()
+    state = (
+        extract_embedded_state(html_content, duration)
+        if extraction_mode == "embedded_state"
+        else None
+    )
+    if state is not None:
+        profile.lap("embedded_state")
 
-        id_name = f"{name_key[:len(name_key) - len('_name')]}_id"
-        classification = {}
-        existing_ids = [
-            entry.get("classification", {}).get(f"{id_name}", "")
-            for entry in json_data
-            if "classification" in entry
-        ]
-        # Generate ID based on table name and existing IDs
-        classification[id_name] = (
-            generate_id(name_key, existing_ids) if name_key else None
+    def resolved(field):
+        # Whether the embedded state has `field`; counts the source either way
+        if state is None:
+            return False
+        if sources is not None:
+            sources[(field, "fast" if field in state else "fallback")] += 1
+        return field in state
+
+    plan = compile_extraction_plan(desc_class, reviews_class, time_class)
+    # Selectors of the fields the embedded state already has are not collected;
+    # the description is the exception, the DOM has the amenities paragraphs
+    if state is not None and "start_time" in state and isinstance(time_class, str):
+        plan = plan - {time_class}
+
+    backend = get_backend(parser_backend)
+    dom_plan = plan
+    if state is not None:
+        # A selector can only match if every one of its classes is in the page
+        dom_plan = frozenset(
+            selector
+            for selector in plan
+            if all(name in html_content for name in selector.split())
         )
+    # Hours outside the plan (e.g. a None time_class) are found by a full walk
+    hours_walk = (
+        not (isinstance(time_class, tuple) and len(time_class) == 2)
+        and time_class not in plan
+    )
+    # The DOM is parsed only for what the state leaves to it: present
+    # selectors, the heading of a missing name, or that walk for the hours
+    if (
+        state is None
+        or dom_plan
+        or "name" not in state
+        or (hours_walk and "start_time" not in state)
+    ):
+        document = backend.parse(html_content)
+        profile.lap("parse")
+        # One walk over the tree collects everything the extractors below look up
+        buckets = collect_buckets(document, dom_plan, backend)
+        profile.lap("walk")
+    else:
+        document = None
+        buckets = {"headings": []}
+        profile.lap("parse/skipped", True)
+    buckets.update((selector, []) for selector in plan - dom_plan)
+    profile.count_selectors(buckets, plan)
+    classification = {}
 
-        # Extract title
-        headings = soup.find_all(["h1", "h2", "h3"])
-        classification[name_key] = headings[0].text.strip() if headings else None
-
-        # Extract description
-        paragraphs = soup.find_all(class_=desc_class)
-
-        if not paragraphs:
-            paragraphs = soup.find_all(class_="ui_columns")
-            # find element with the "Details" text
-            paragraphs = [
-                para
-                for para in paragraphs
-                if "About" in para.text.strip()
-                and "Manage this business?" not in para.text.strip()
-            ]
-        if paragraphs:
-            classification["about_and_tags"] = [
-                remove_newline_and_extra_spaces(paragraph.text.strip())
-                for paragraph in paragraphs
+    # Extract title
+    headings = buckets["headings"]
+    if resolved("name"):
+        classification[name_key] = state["name"]
+        profile.lap("name/state", True)
+    else:
+        classification[name_key] = (
+            backend.text(headings[0]).strip() if headings else None
+        )
+        profile.lap("name/heading", bool(headings))
+
+    # Extract description
+    paragraphs = buckets[desc_class]
+    tier = "desc_class"
+
+    if not paragraphs:
+        profile.lap("about_and_tags/desc_class", False)
+        tier = "ui_columns"
+        paragraphs = buckets[ABOUT_CLASS]
+        # find element with the "Details" text
+        paragraphs = [
+            para
+            for para in paragraphs
+            if "About" in backend.text(para).strip()
+            and "Manage this business?" not in backend.text(para).strip()
+        ]
+    if paragraphs:
+        classification["about_and_tags"] = [
+            remove_newline_and_extra_spaces(backend.text(paragraph).strip())
+            for paragraph in paragraphs
+        ]
+        profile.lap(f"about_and_tags/{tier}", True)
+        if state is not None and sources is not None:
+            sources[("about_and_tags", "fallback")] += 1
+    elif state is not None:
+        profile.lap("about_and_tags/ui_columns", False)
+        # The state's description (JSON-LD, else the regex below) only when
+        # the DOM has none: it is the summary without the amenities paragraphs
+        if resolved("about_and_tags"):
+            # Tags still come from the page, as in the regex fallback below
+            classification["about_and_tags"] = state["about_and_tags"] + [
+                backend.text(desc).strip() for desc in buckets[DESCRIPTION_TAG_CLASS]
             ]
         else:
-            # Try to find description using regex
-            description_pattern = r'"description":"(.*?)"'
-            description_match = re.search(description_pattern, html_content)
-            description_soup = soup.find_all(class_="SrqKb")
-
-            if description_match:
-                # Initialize as a list with the matched description
-                classification["about_and_tags"] = [description_match.group(1)]
-
-                # Append the description_soup text to the list
-                for desc in description_soup:
-                    classification["about_and_tags"].append(desc.text.strip())
-            else:
-                classification["about_and_tags"] = None
+            classification["about_and_tags"] = None
+        profile.lap("about_and_tags/state", "about_and_tags" in state)
+    else:
+        profile.lap("about_and_tags/ui_columns", False)
+        # Try to find description using regex
+        description_match = re.search(DESCRIPTION_PATTERN, html_content)
+        description_soup = buckets[DESCRIPTION_TAG_CLASS]
 
-        # Extract latitude and longitude
-        latitude, longitude = extract_lat_long(html_content)
-        classification["latitude"] = latitude
-        classification["longitude"] = longitude
-
-        # Set time duration or start/end times if applicable
-        if type(time_class) == tuple and len(time_class) == 2:
-            classification["start_time"], classification["end_time"] = (
-                convert_time_string(time_class[0]),
-                convert_time_string(time_class[1]),
-            )
+        if description_match:
+            # Initialize as a list with the matched description
+            classification["about_and_tags"] = [description_match.group(1)]
+
+            # Append the description_soup text to the list
+            for desc in description_soup:
+                classification["about_and_tags"].append(backend.text(desc).strip())
         else:
-            start_end_time = soup.find_all(class_=time_class)
-            if start_end_time:
-                time_classes = [
-                    remove_newline_and_extra_spaces(time)
-                    for time in start_end_time[0].text.split("-")
-                ]
-                classification["start_time"] = convert_time_string(time_classes[0])
-                classification["end_time"] = convert_time_string(time_classes[1])
-            else:
-                classification["start_time"] = None
-                classification["end_time"] = None
-
-        if duration:
-            classification["duration"] = None
-            duration_pattern = r"Duration:\s*.*?(\d+)"
-            duration_match = re.search(duration_pattern, html_content)
-            if duration_match:
-                duration_int = int(duration_match.group(1))
-                classification["duration"] = duration_int
-
-        # Extract reviews
-        classification["reviews"] = None
-        reviews = soup.find_all(class_=reviews_class) or soup.find_all(
-            class_="partial_entry"
+            classification["about_and_tags"] = None
+        profile.lap("about_and_tags/regex", bool(description_match))
+
+    # Extract latitude and longitude (there is no DOM source for these)
+    if resolved("latitude"):
+        latitude, longitude = state["latitude"], state["longitude"]
+        profile.lap("coordinates/state", True)
+    elif state is not None:
+        latitude, longitude = None, None
+        profile.lap("coordinates/state", False)
+    else:
+        latitude, longitude = extract_lat_long(html_content, profile)
+    classification["latitude"] = latitude
+    classification["longitude"] = longitude
+
+    # Set time duration or start/end times if applicable
+    if type(time_class) == tuple and len(time_class) == 2:
+        classification["start_time"], classification["end_time"] = (
+            convert_time_string(time_class[0]),
+            convert_time_string(time_class[1]),
         )
-        classification["reviews"] = clean_reviews(reviews)
+        profile.lap("hours/fixed", True)
+    elif resolved("start_time"):
+        classification["start_time"] = state["start_time"]
+        classification["end_time"] = state["end_time"]
+        profile.lap("hours/state", True)
+    else:
+        start_end_time = lookup_class(document, buckets, time_class, backend)
+        if start_end_time:
+            time_classes = [
+                remove_newline_and_extra_spaces(time)
+                for time in backend.text(start_end_time[0]).split("-")
+            ]
+            classification["start_time"] = convert_time_string(time_classes[0])
+            classification["end_time"] = convert_time_string(time_classes[1])
+        else:
+            classification["start_time"] = None
+            classification["end_time"] = None
+        profile.lap("hours/class", bool(start_end_time))
+
+    if duration and resolved("duration"):
+        classification["duration"] = state["duration"]
+        profile.lap("duration/state", True)
+    elif duration:
+        classification["duration"] = None
+        # Already checked by extract_embedded_state in "embedded_state" mode
+        duration_match = state is None and re.search(DURATION_PATTERN, html_content)
+        if duration_match:
+            duration_int = int(duration_match.group(1))
+            classification["duration"] = duration_int
+        profile.lap(
+            "duration/regex" if state is None else "duration/state",
+            bool(duration_match),
+        )
+
+    # Extract reviews
+    classification["reviews"] = None
+    reviews = lookup_class(document, buckets, reviews_class, backend)
+    profile.lap("reviews/class", bool(reviews))
+    if not reviews:
+        reviews = buckets[PARTIAL_REVIEW_CLASS]
+        profile.lap("reviews/partial_entry", bool(reviews))
+    classification["reviews"] = clean_reviews(reviews, backend)
+    profile.lap("reviews/clean")
+
+    if reviews_class == "dodo":
+        reviews_outer = buckets[DODO_REVIEW_OUTER_CLASS]
+        reviews_inner = [
+            backend.find_all_class(review, DODO_REVIEW_INNER_CLASS)
+            for review in reviews_outer
+        ]
+        reviews_inner_flat = [
+            item for sublist in reviews_inner for item in sublist
+        ]  # Flatten the list
 
-        if reviews_class == "dodo":
-            reviews_outer = soup.find_all(class_="JguWG")
-            reviews_inner = [
-                review.find_all(class_="yCeTE") for review in reviews_outer
+        if reviews_inner_flat:
+            classification["reviews"] = [
+                backend.text(review).strip() for review in reviews_inner_flat
             ]
-            reviews_inner_flat = [
-                item for sublist in reviews_inner for item in sublist
-            ]  # Flatten the list
+            classification["reviews"] = [
+                remove_newline_and_extra_spaces(
+                    re.sub(r"[^\x00-\x7F]+", "", backend.text(review).strip())
+                )
+                for review in reviews_inner_flat
+            ]
+        profile.lap("reviews/dodo", bool(reviews_inner_flat))
 
-            if reviews_inner_flat:
-                classification["reviews"] = [
-                    review.text.strip() for review in reviews_inner_flat
-                ]
-                classification["reviews"] = [
-                    remove_newline_and_extra_spaces(
-                        re.sub(r"[^\x00-\x7F]+", "", review.text.strip())
+    # Extract nearby places
+    classification_nearby = extract_nearby_places(
+        buckets, best_nearby_hotels, backend, profile
+    )
+    classification.update(classification_nearby)
+
+    return classification
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _classify_chunk(pages, options, profile=False):
+    # Runs inside a worker process; the pid, busy time, field sources and
+    # profile feed the throughput report
+    started = time.perf_counter()
+    sources = Counter()
+    chunk_profile = ExtractionProfile() if profile else None
+    classifications = [
+        classify_page(page, *options, sources=sources, profile=chunk_profile)
+        for page in pages
+    ]
+    busy = time.perf_counter() - started
+    return classifications, os.getpid(), busy, sources, chunk_profile
+
+
+def _record_chunk(stats, pid, pages, busy, sources=None, profile=None):
+    if stats is None:
+        return
+    worker = stats["workers"].setdefault(pid, {"pages": 0, "busy": 0.0})
+    worker["pages"] += pages
+    worker["busy"] += busy
+    stats["pages"] += pages
+    if sources:
+        stats["sources"].update(sources)
+    if profile is not None:
+        stats["profile"].update(profile)
+
+
+def new_throughput_stats():
+    return {
+        "pages": 0,
+        "elapsed": 0.0,
+        "workers": {},
+        "sources": Counter(),
+        "profile": ExtractionProfile(),
+    }
+
+
+def merge_throughput_stats(total, stats):
+    total["elapsed"] += stats["elapsed"]
+    for pid, worker in stats["workers"].items():
+        _record_chunk(total, pid, worker["pages"], worker["busy"])
+    total["sources"].update(stats["sources"])
+    total["profile"].update(stats["profile"])
+
+
+def iter_classifications(
+    pages,
+    options,
+    workers=DEFAULT_WORKERS,
+    chunksize=DEFAULT_CHUNKSIZE,
+    stats=None,
+    profile=False,
+):
+    """Classify unescaped pages, yielding results in input order.
+
+    With more than one worker the pages are sent to a process pool in chunks of
+    `chunksize`; at most two chunks per worker are in flight so a lazy `pages`
+    iterable is never read far ahead of the output. With `profile`, every
+    page is profiled into stats["profile"].
+    """
+    started = time.perf_counter()
+    if workers <= 1:
+        for chunk in _chunked(pages, chunksize):
+            classifications, pid, busy, sources, chunk_profile = _classify_chunk(
+                chunk, options, profile
+            )
+            _record_chunk(stats, pid, len(chunk), busy, sources, chunk_profile)
+            yield from classifications
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in _chunked(pages, chunksize):
+                pending.append(
+                    executor.submit(_classify_chunk, chunk, options, profile)
+                )
+                if len(pending) >= workers * 2:
+                    classifications, pid, busy, sources, chunk_profile = (
+                        pending.popleft().result()
                     )
-                    for review in reviews_inner_flat
-                ]
+                    _record_chunk(
+                        stats, pid, len(classifications), busy, sources, chunk_profile
+                    )
+                    yield from classifications
+            while pending:
+                classifications, pid, busy, sources, chunk_profile = (
+                    pending.popleft().result()
+                )
+                _record_chunk(
+                    stats, pid, len(classifications), busy, sources, chunk_profile
+                )
+                yield from classifications
+    if stats is not None:
+        stats["elapsed"] += time.perf_counter() - started
+
+
+def print_throughput_report(stats, label="Extraction"):
+    elapsed = stats["elapsed"] or float("inf")
+    print(
+        f"{label}: {stats['pages']} pages in {stats['elapsed']:.2f}s "
+        f"({stats['pages'] / elapsed:.1f} pages/sec, {len(stats['workers'])} workers)"
+    )
+    for pid, worker in sorted(stats["workers"].items()):
+        busy = worker["busy"] or float("inf")
+        print(
+            f"  worker {pid}: {worker['pages']} pages, busy {worker['busy']:.2f}s "
+            f"({worker['pages'] / busy:.1f} pages/sec)"
+        )
+    if stats["sources"]:
+        print_fast_path_report(stats["sources"])
+
+
+def print_fast_path_report(sources):
+    # `sources` counts (field, "fast" | "fallback") pairs, see classify_page
+    fast, fallback = Counter(), Counter()
+    for (field, source), count in sources.items():
+        (fast if source == "fast" else fallback)[field] += count
+    total = sum(fast.values()) + sum(fallback.values())
+    print(
+        f"  embedded state: {sum(fast.values())} of {total} fields on the fast path "
+        f"({sum(fast.values()) / total:.1%}), {sum(fallback.values())} fallbacks"
+    )
+    for field in sorted(fast.keys() | fallback.keys()):
+        print(f"    {field}: {fast[field]} fast path, {fallback[field]} fallback")
+
+
+def iter_jsonl_entries(input_file):
+    """Yield the records of a raw scraper job file one line at a time.
+
+    The scraper writes one `{"input": url, "result": html}` object per line;
+    records are renamed to the `url`/`html` keys 1.prettier_json.py produces.
+    """
+    with open(input_file, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield {"url": record.get("input", ""), "html": record.get("result", "")}
+
+
+def classify_entries(
+    entries,
+    name_key,
+    desc_class,
+    reviews_class=None,
+    time_class=None,
+    duration=False,
+    best_nearby_hotels=True,
+    workers=1,
+    chunksize=DEFAULT_CHUNKSIZE,
+    stats=None,
+    id_registry=None,
+    parser_backend=DEFAULT_BACKEND,
+    extraction_cache=None,
+    extraction_mode="dom",
+    profile=False,
+):
+    """Yield the classification of each `url`/`html` entry, in input order.
+
+    `entries` is consumed lazily, so a generator such as iter_jsonl_entries is
+    never held in memory as a whole, and a page's HTML can be freed as soon as
+    its worker has it. Pages found in `extraction_cache` are not parsed (nor
+    profiled).
+    """
+    if id_registry is None:
+        id_registry = new_registry()
+    options = (
+        name_key,
+        desc_class,
+        reviews_class,
+        time_class,
+        duration,
+        best_nearby_hotels,
+        parser_backend,
+        extraction_mode,
+    )
+    # The parser backend doesn't change the output (see benchmark.py backends)
+    cache_settings = (EXTRACTOR_VERSION,) + options[:-2] + (extraction_mode,)
+    id_name = f"{name_key[:len(name_key) - len('_name')]}_id"
+    # (url, cache key, cached fields) of every page read but not yet yielded;
+    # cached fields are None for the pages sent to the workers
+    pending = deque()
+
+    def pages():
+        for entry in entries:
+            raw_html = entry.get("html", "")
+            key, fields = None, None
+            if extraction_cache is not None:
+                key = extraction_cache.key(raw_html, cache_settings)
+                fields = extraction_cache.get(key)
+            pending.append((entry.get("url") or None, key, fields))
+            if fields is None:
+                yield html.unescape(raw_html)
+
+    def finish(url, fields):
+        classification = {}
+        # Generate ID based on table name, keyed by URL so re-runs keep the same ID
+        classification[id_name] = (
+            generate_id(name_key, id_registry, url) if name_key else None
+        )
+        classification.update(fields)
+        return classification
 
-        # Extract nearby places
-        classification_nearby = extract_nearby_places(soup, best_nearby_hotels)
-        classification.update(classification_nearby)
+    # IDs are handed out here, in input order, so they don't depend on scheduling
+    for fields in iter_classifications(
+        pages(), options, workers, chunksize, stats, profile
+    ):
+        # Cached pages read before this one come first
+        while pending[0][2] is not None:
+            url, _, cached_fields = pending.popleft()
+            yield finish(url, cached_fields)
+        url, key, _ = pending.popleft()
+        if extraction_cache is not None:
+            extraction_cache.put(key, fields)
+        yield finish(url, fields)
+    while pending:
+        url, _, cached_fields = pending.popleft()
+        yield finish(url, cached_fields)
 
-        entry["html"] = html_content
+
+def clean_html_and_classify(
+    json_data,
+    name_key,
+    desc_class,
+    reviews_class=None,
+    time_class=None,
+    duration=False,
+    best_nearby_hotels=True,
+    workers=1,
+    chunksize=DEFAULT_CHUNKSIZE,
+    stats=None,
+    id_registry=None,
+    parser_backend=DEFAULT_BACKEND,
+):
+    cleaned_json = []
+    classifications = classify_entries(
+        json_data,
+        name_key,
+        desc_class,
+        reviews_class,
+        time_class,
+        duration,
+        best_nearby_hotels,
+        workers,
+        chunksize,
+        stats,
+        id_registry,
+        parser_backend,
+    )
+    for classification, entry in zip(classifications, json_data):
+        entry["html"] = html.unescape(entry.get("html", ""))
         entry["classification"] = classification
         cleaned_json.append(entry)
 
     return cleaned_json
 
 
+def drain_entries(json_data):
+    # Hand out a loaded file's entries while dropping them from the list, so
+    # each page's HTML is released once it has been classified
+    json_data.reverse()
+    while json_data:
+        yield json_data.pop()
+
+
+def write_classifications(classifications, output_file, output_format="json"):
+    """Write classifications as they are produced; return how many were written.
+
+    "json" streams the same indented array json.dump(..., indent=4) writes,
+    "jsonl" writes one object per line and "columns" a columnar.py table
+    directory. The output only replaces `output_file` once every
+    classification is written.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'")
+    if output_format == "columns":
+        # numpy is only needed for the columnar output
+        from columnar import write_columns
+
+        return write_columns(classifications, output_file)
+
+    count = 0
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        if output_format == "jsonl":
+            for classification in classifications:
+                file.write(json.dumps(classification, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            file.write("[")
+            for classification in classifications:
+                file.write(",\n" if count else "\n")
+                item = json.dumps(classification, indent=4, ensure_ascii=False)
+                file.write(textwrap.indent(item, "    "))
+                count += 1
+            file.write("\n]" if count else "]")
+    os.replace(tmp_file, output_file)
+    return count
+
+
 def process_files(
     input_directory,
     output_directory,
@@ -374,35 +1019,74 @@ def process_files(
     time_class=None,
     duration=False,
     best_nearby_hotels=True,
+    workers=DEFAULT_WORKERS,
+    chunksize=DEFAULT_CHUNKSIZE,
+    registry_file=DEFAULT_REGISTRY_FILE,
+    parser_backend=DEFAULT_BACKEND,
+    streaming=False,
+    output_format="json",
+    cache_file=EXTRACTION_CACHE_FILE,
+    extraction_mode=EXTRACTION_MODE,
+    profile_file=EXTRACTION_PROFILE_FILE,
 ):
+    # profile_file turns on the per-field profile (see extraction_profile.py)
+    if extraction_mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{extraction_mode}'")
+    # Streaming mode reads the scraper's raw .jsonl job files record by record,
+    # skipping 1.prettier_json.py and its second parse of every page
+    extension = ".jsonl" if streaming else ".json"
     os.makedirs(output_directory, exist_ok=True)
-    json_files = [f for f in os.listdir(input_directory) if f.endswith(".json")]
+    json_files = [f for f in os.listdir(input_directory) if f.endswith(extension)]
+    total_stats = new_throughput_stats()
+    id_registry = load_registry(registry_file)
+    # cache_file=None parses every page
+    extraction_cache = ExtractionCache(cache_file) if cache_file else None
 
     for json_file in json_files:
         input_file = os.path.join(input_directory, json_file)
         output_file = os.path.join(
-            output_directory, f"{os.path.splitext(json_file)[0]}_clean.json"
+            output_directory,
+            f"{os.path.splitext(json_file)[0]}_clean.{output_format}",
         )
 
         try:
-            with open(input_file, "r", encoding="utf-8") as file:
-                json_data = json.load(file)
-
-            cleaned_data = clean_html_and_classify(
-                json_data,
-                name_key,
-                desc_class,
-                reviews_class,
-                time_class,
-                duration,
-                best_nearby_hotels,
+            if streaming:
+                entries = iter_jsonl_entries(input_file)
+            else:
+                with open(input_file, "r", encoding="utf-8") as file:
+                    entries = drain_entries(json.load(file))
+
+            stats = new_throughput_stats()
+            write_classifications(
+                classify_entries(
+                    entries,
+                    name_key,
+                    desc_class,
+                    reviews_class,
+                    time_class,
+                    duration,
+                    best_nearby_hotels,
+                    workers,
+                    chunksize,
+                    stats,
+                    id_registry,
+                    parser_backend,
+                    extraction_cache,
+                    extraction_mode,
+                    bool(profile_file),
+                ),
+                output_file,
+                output_format,
             )
-            classification_data = [entry["classification"] for entry in cleaned_data]
 
-            with open(output_file, "w", encoding="utf-8") as file:
-                json.dump(classification_data, file, indent=4, ensure_ascii=False)
+            save_registry(id_registry, registry_file)
+            if extraction_cache is not None:
+                extraction_cache.commit()
 
             print(f"Data successfully cleaned and saved to '{output_file}'")
+            print_throughput_report(stats, f"  {json_file}")
+
+            merge_throughput_stats(total_stats, stats)
 
         except FileNotFoundError:
             print(f"Error: Input file '{input_file}' not found.")
@@ -411,26 +1095,34 @@ def process_files(
         except Exception as ex:
             print(f"An error occurred with file '{input_file}': {ex}")
 
+    if total_stats["pages"]:
+        print_throughput_report(total_stats, f"Total for '{input_directory}'")
+    if profile_file and total_stats["profile"].pages:
+        summary = total_stats["profile"].summary()
+        print_profile_report(summary, f"Extraction profile for '{input_directory}'")
+        append_profile(
+            summary,
+            profile_file,
+            time=datetime.now().isoformat(timespec="seconds"),
+            input_directory=input_directory,
+            parser_backend=parser_backend,
+            extraction_mode=extraction_mode,
+        )
+        print(f"Extraction profile appended to '{profile_file}'")
+    if extraction_cache is not None:
+        print(extraction_cache.report())
+        extraction_cache.close()
 
-# Example usage for the different datasets
-# process_files("eat/prettier_json", "eat/extract_json", "foodAndDrink_name", "biGQs _P pZUbB alXOW eWlDX GzNcM ATzgx UTQMg TwpTY hmDzD", "JguWG", "biGQs _P pZUbB egaXP hmDzD", False, True)
-process_files(
-    "stay/prettier_json",
-    "stay/extract_json",
-    "accommodation_name",
-    "uqMDf z BGJxv YGfmd YQkjl",
-    "orRIx Ci _a C",
-    ("12:00 AM", "11:59 PM"),
-    False,
-    False,
-)
-process_files(
-    "do/prettier_json",
-    "do/extract_json",
-    "activity_name",
-    "USjYi _d",
-    "dodo",
-    "EFKKt",
-    True,
-    False,
-)
+
+if __name__ == "__main__":
+    # Example usage for the different datasets, streaming the scraper's raw
+    # job files from each category directory
+    # process_files("eat", "eat/extract_json", *CATEGORY_SETTINGS["eat"], streaming=True)
+    process_files(
+        "stay", "stay/extract_json", *CATEGORY_SETTINGS["stay"], streaming=True
+    )
+    process_files("do", "do/extract_json", *CATEGORY_SETTINGS["do"], streaming=True)
+
+    # Or, after running 1.prettier_json.py:
+    # process_files("stay/prettier_json", "stay/extract_json", *CATEGORY_SETTINGS["stay"])
+    # process_files("do/prettier_json", "do/extract_json", *CATEGORY_SETTINGS["do"])
@@ -148,9 +148,39 @@
 
 import os
 import json
+import hashlib
+import math
+import queue
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import pymysql
 from pymysql import OperationalError, ProgrammingError
 from dotenv import load_dotenv
+from columnar import COLUMNS_SUFFIX, ColumnarTable
+from geo_index import EARTH_RADIUS_KM, KM_PER_DEGREE
+from id_allocator import (
+    ID_PREFIXES,
+    allocate_id,
+    get_prefix,
+    load_registry,
+    place_key,
+    save_registry,
+)
+from name_index import EDGE_DIRECTORY, EDGE_TABLE, NEARBY_FIELD_PATTERN
+from schema_registry import (
+    INFERRED_TYPES,
+    SchemaInference,
+    load_schema_registry,
+    registered_schema,
+    save_schema_registry,
+    widen_type,
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -161,8 +191,107 @@ db_config = {
     "user": os.getenv("DB_USER"),
     "password": os.getenv("DB_PASSWORD"),
     "database": os.getenv("DB_NAME"),
+    # Needed by the LOAD DATA LOCAL INFILE load method
+    "local_infile": os.getenv("DB_LOAD_METHOD") == "load_data",
 }
 
+# Bulk loading: "executemany" sends multi-row INSERTs, "load_data" streams a
+# generated TSV through LOAD DATA LOCAL INFILE
+LOAD_METHODS = ("executemany", "load_data")
+LOAD_METHOD = os.getenv("DB_LOAD_METHOD", "executemany")
+BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "1000"))  # rows per INSERT/TSV chunk
+COMMIT_INTERVAL = int(os.getenv("DB_COMMIT_INTERVAL", "10000"))  # rows per commit
+
+# "insert" appends every row; "upsert" keys rows on `<table>_id` and only
+# writes rows whose content hash changed since the last run
+WRITE_MODES = ("insert", "upsert")
+WRITE_MODE = os.getenv("DB_WRITE_MODE", "insert")
+HASH_COLUMN = "content_hash"
+
+# Tables are loaded concurrently, one pooled connection each
+MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "4"))
+
+# Secondary indexes per table, so joins through the edge table are key lookups
+TABLE_INDEXES = {EDGE_TABLE: ("source_id", "target_id")}
+
+# "inferred" guesses a flat table from the JSON; "typed" gives the place tables
+# a fixed layout with a SPATIAL index on a POINT, FULLTEXT indexes on the text
+# and `<table>_review` / `<table>_nearby` child tables (see typed_layout)
+SCHEMA_MODES = ("inferred", "typed")
+SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "inferred")
+LOCATION_COLUMN = "location"
+# A SPATIAL index needs a NOT NULL column, so places without coordinates get
+# this point; their latitude/longitude stay NULL, and places_within skips
+# them rather than treating (0, 0) as a location
+MISSING_LOCATION = (0.0, 0.0)
+
+
+class ConnectionPool:
+    """Up to `size` pymysql connections, shared by the loader threads.
+
+    Connections are opened on first use and handed back after each
+    `with pool.connection()` block. A connection whose block raised is closed
+    instead, so its uncommitted rows are rolled back and never reused.
+    """
+
+    def __init__(self, size=MAX_CONNECTIONS, **config):
+        if size < 1:
+            raise ValueError("A connection pool needs at least one connection")
+        self.size = size
+        self.config = config
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = pymysql.connect(**self.config)
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            if self._closed:
+                # Handed back after close(), e.g. by a thread still loading
+                connection.close()
+            else:
+                self._idle.put(connection)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def check_settings(
+    write_mode=WRITE_MODE,
+    schema_mode=SCHEMA_MODE,
+    load_method=LOAD_METHOD,
+    max_connections=MAX_CONNECTIONS,
+):
+    """Raise ValueError for a setting the loaders would reject mid-load."""
+    if write_mode not in WRITE_MODES:
+        raise ValueError(
+            f"Unknown DB_WRITE_MODE '{write_mode}', use one of {WRITE_MODES}"
+        )
+    if schema_mode not in SCHEMA_MODES:
+        raise ValueError(
+            f"Unknown DB_SCHEMA_MODE '{schema_mode}', use one of {SCHEMA_MODES}"
+        )
+    if load_method not in LOAD_METHODS:
+        raise ValueError(
+            f"Unknown DB_LOAD_METHOD '{load_method}', use one of {LOAD_METHODS}"
+        )
+    if max_connections < 1:
+        raise ValueError("DB_MAX_CONNECTIONS needs to be at least 1")
+
 
 def escape_string(value):
     if isinstance(value, str):
@@ -171,111 +300,820 @@ def escape_string(value):
 
 
 def infer_schema_from_json(data):
-    schema = {}
+    # Types only widen, so records can come in any order (see schema_registry.py)
+    inference = SchemaInference()
     for entry in data:
-        for key, value in entry.items():
-            # Skip NoneType values
-            if value is None:
-                continue
-
-            if key not in schema:
-                if isinstance(value, int):
-                    schema[key] = "INT"
-                elif isinstance(value, float):
-                    schema[key] = "DOUBLE"
-                elif isinstance(value, bool):
-                    schema[key] = "BOOLEAN"
-                elif isinstance(value, str) and not key.endswith("_time"):
-                    if len(value) <= 255:
-                        schema[key] = "VARCHAR(255)"
-                    else:
-                        schema[key] = "TEXT"
-                elif isinstance(value, str) and key.endswith("_time"):
-                    schema[key] = "TIME"
-                else:
-                    schema[key] = "TEXT"
+        inference.observe(entry)
+    return inference.schema
 
-            else:
-                if isinstance(value, str):
-                    if len(value) > 255:
-                        schema[key] = "TEXT"
-                if isinstance(value, int) and schema[key] != "INT":
-                    schema[key] = "INT"
-                if isinstance(value, float) and schema[key] != "DOUBLE":
-                    schema[key] = "DOUBLE"
-                if isinstance(value, bool) and schema[key] != "BOOLEAN":
-                    schema[key] = "BOOLEAN"
-    return schema
-
-
-def create_table_from_schema(connection, table_name, schema):
+
+def create_table_from_schema(
+    connection,
+    table_name,
+    schema,
+    primary_key=None,
+    indexes=(),
+    fulltext=(),
+    spatial=(),
+):
     with connection.cursor() as cursor:
         fields = ", ".join([f"`{col}` {dtype}" for col, dtype in schema.items()])
+        if primary_key:
+            # A column name, or a tuple of them for a composite key
+            if isinstance(primary_key, str):
+                primary_key = (primary_key,)
+            fields += f", PRIMARY KEY ({', '.join(f'`{col}`' for col in primary_key)})"
+        for kind, columns in (("KEY", indexes), ("FULLTEXT KEY", fulltext)):
+            for col in columns:
+                # An all-NULL column is left out of the inferred schema
+                if col in schema:
+                    fields += f", {kind} (`{col}`)"
+        for col in spatial:
+            fields += f", SPATIAL KEY (`{col}`)"
         create_table_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({fields}) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;"
         cursor.execute(create_table_query)
         connection.commit()
 
 
-def insert_data_into_table(connection, table_name, data, schema):
+def prepare_values(entry, schema):
+    # Prepare values based on their types
+    values = []
+    for col in schema.keys():
+        value = entry.get(col, None)  # Get the value, or use None if not present
+        if isinstance(value, str):
+            value = escape_string(value)
+        elif isinstance(value, (list, dict)):
+            # Convert lists or dicts to JSON strings
+            value = json.dumps(value)
+        elif value is None:
+            value = None  # This will be treated as NULL in SQL
+        values.append(value)
+    return values
+
+
+def iter_batches(data, batch_size):
+    for start in range(0, len(data), batch_size):
+        yield data[start : start + batch_size]
+
+
+def insert_data_into_table(
+    connection,
+    table_name,
+    data,
+    schema,
+    batch_size=BATCH_SIZE,
+    commit_interval=COMMIT_INTERVAL,
+    upsert=False,
+):
+    columns = ", ".join([f"`{col}`" for col in schema.keys()])
+    placeholders = ", ".join(["%s"] * len(schema))
+    insert_query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
+    if upsert:
+        updates = ", ".join([f"`{col}` = VALUES(`{col}`)" for col in schema.keys()])
+        insert_query += f" ON DUPLICATE KEY UPDATE {updates}"
+
+    uncommitted = 0
     with connection.cursor() as cursor:
-        for entry in data:
-            columns = ", ".join([f"`{col}`" for col in schema.keys()])
-            placeholders = ", ".join(["%s"] * len(schema))
-            insert_query = (
-                f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
-            )
-            # Prepare values based on their types
-            values = []
-            for col in schema.keys():
-                value = entry.get(
-                    col, None
-                )  # Get the value, or use None if not present
-                if isinstance(value, str):
-                    value = escape_string(value)
-                elif isinstance(value, (list, dict)):
-                    # Convert lists or dicts to JSON strings
-                    value = json.dumps(value)
-                elif value is None:
-                    value = None  # This will be treated as NULL in SQL
-                values.append(value)
-            print(f"Inserting: {values}")
+        for batch in iter_batches(data, batch_size):
+            rows = [prepare_values(entry, schema) for entry in batch]
             try:
-                cursor.execute(insert_query, values)
+                # PyMySQL rewrites this into multi-row INSERT ... VALUES statements
+                cursor.executemany(insert_query, rows)
             except Exception as e:
                 print(f"Error executing query: {e}")
                 raise
+            uncommitted += len(rows)
+            if uncommitted >= commit_interval:
+                connection.commit()
+                uncommitted = 0
         connection.commit()
 
 
-def process_json_files(connection, json_directory, table_name):
-    json_files = [f for f in os.listdir(json_directory) if f.endswith(".json")]
-    for json_file in json_files:
-        input_file = os.path.join(json_directory, json_file)
-        with open(input_file, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
+def tsv_field(value):
+    # Escaping for LOAD DATA's default FIELDS ESCAPED BY '\\'
+    if value is None:
+        return "\\N"
+    if isinstance(value, bytes):
+        # Geometry values, unhexed again by load_data_into_table
+        return value.hex()
+    if isinstance(value, bool):
+        value = int(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\0", "\\0")
+    )
+
+
+def load_data_into_table(
+    connection,
+    table_name,
+    data,
+    schema,
+    batch_size=BATCH_SIZE,
+    commit_interval=COMMIT_INTERVAL,
+    upsert=False,
+):
+    """Bulk load rows with LOAD DATA LOCAL INFILE from generated TSV files.
+
+    Each batch becomes one TSV file and one LOAD DATA statement. The connection
+    must be opened with local_infile=True (DB_LOAD_METHOD=load_data). With
+    `upsert`, rows replace existing rows with the same primary key.
+    """
+    columns, assignments = [], []
+    for col, dtype in schema.items():
+        if dtype.startswith("POINT"):
+            # Geometry can't be read from text; it goes through a variable
+            columns.append(f"@{col}")
+            assignments.append(f"`{col}` = UNHEX(@{col})")
+        else:
+            columns.append(f"`{col}`")
+    replace = "REPLACE " if upsert else ""
+    load_query = (
+        f"LOAD DATA LOCAL INFILE %s {replace}INTO TABLE `{table_name}` "
+        "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' "
+        f"LINES TERMINATED BY '\\n' ({', '.join(columns)})"
+    )
+    if assignments:
+        load_query += f" SET {', '.join(assignments)}"
+
+    uncommitted = 0
+    with connection.cursor() as cursor:
+        for batch in iter_batches(data, batch_size):
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", suffix=".tsv", delete=False
+            ) as tsv_file:
+                for entry in batch:
+                    values = prepare_values(entry, schema)
+                    tsv_file.write("\t".join(tsv_field(v) for v in values) + "\n")
+            try:
+                cursor.execute(load_query, (tsv_file.name,))
+            except Exception as e:
+                print(f"Error executing query: {e}")
+                raise
+            finally:
+                os.remove(tsv_file.name)
+            uncommitted += len(batch)
+            if uncommitted >= commit_interval:
+                connection.commit()
+                uncommitted = 0
+        connection.commit()
+
+
+def content_hash(entry, schema):
+    values = prepare_values(entry, schema)
+    return hashlib.sha256(json.dumps(values, default=str).encode("utf-8")).hexdigest()
+
+
+def fetch_content_hashes(connection, table_name, key):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT `{key}`, `{HASH_COLUMN}` FROM `{table_name}`")
+        return dict(cursor.fetchall())
+
+
+def changed_rows(connection, table_name, data, schema, key):
+    """Return the rows (with their content hash) that differ from the table."""
+    stored_hashes = fetch_content_hashes(connection, table_name, key)
+    rows = []
+    for entry in data:
+        row_hash = content_hash(entry, schema)
+        if stored_hashes.get(entry.get(key)) != row_hash:
+            rows.append({**entry, HASH_COLUMN: row_hash})
+    return rows
+
+
+def write_rows(
+    connection,
+    table_name,
+    data,
+    schema,
+    method=LOAD_METHOD,
+    batch_size=BATCH_SIZE,
+    commit_interval=COMMIT_INTERVAL,
+    upsert=False,
+):
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method '{method}', use one of {LOAD_METHODS}")
+    if method == "load_data":
+        load_data_into_table(
+            connection, table_name, data, schema, batch_size, commit_interval, upsert
+        )
+    else:
+        insert_data_into_table(
+            connection, table_name, data, schema, batch_size, commit_interval, upsert
+        )
+
+
+def load_rows(
+    connection,
+    table_name,
+    data,
+    schema,
+    method=LOAD_METHOD,
+    batch_size=BATCH_SIZE,
+    commit_interval=COMMIT_INTERVAL,
+    upsert=False,
+):
+    if upsert:
+        data = changed_rows(connection, table_name, data, schema, f"{table_name}_id")
+        schema = {**schema, HASH_COLUMN: "CHAR(64)"}
+    write_rows(
+        connection,
+        table_name,
+        data,
+        schema,
+        method,
+        batch_size,
+        commit_interval,
+        upsert,
+    )
+    return len(data)
+
+
+def point_value(latitude, longitude):
+    # MariaDB's internal geometry format: a 4-byte SRID, then the WKB point
+    # with x = longitude and y = latitude
+    if latitude is None or longitude is None:
+        latitude, longitude = MISSING_LOCATION
+    return struct.pack("<IBIdd", 0, 1, 1, longitude, latitude)
+
+
+def split_typed_rows(table_name, data):
+    """Split records into place rows and the rows of their child tables.
+
+    Reviews become one `<table>_review` row each and the nearby fields one
+    `<table>_nearby` row each, keyed by `<table>_id`. about_and_tags is joined
+    into one text for its FULLTEXT index.
+    """
+    id_name = f"{table_name}_id"
+    places, reviews, nearby = [], [], []
+    for record in data:
+        place_id = record.get(id_name)
+        if not place_id:
+            raise ValueError(f"The typed schema needs a '{id_name}' column")
+        place = {}
+        for key, value in record.items():
+            field_match = re.match(NEARBY_FIELD_PATTERN, key)
+            if field_match:
+                if value is not None:
+                    nearby.append(
+                        {
+                            id_name: place_id,
+                            "category": field_match.group(1),
+                            "rank": int(field_match.group(2)),
+                            "nearby": value,
+                        }
+                    )
+            elif key == "reviews":
+                for position, review in enumerate(value or [], 1):
+                    reviews.append(
+                        {id_name: place_id, "position": position, "review": review}
+                    )
+            elif key == "about_and_tags":
+                place[key] = "\n".join(value) if value else None
+            else:
+                place[key] = value
+        place[LOCATION_COLUMN] = point_value(
+            record.get("latitude"), record.get("longitude")
+        )
+        places.append(place)
+    return places, {f"{table_name}_review": reviews, f"{table_name}_nearby": nearby}
+
+
+def typed_layout(table_name, columns, upsert=False):
+    """Return the create_table_from_schema arguments of every typed table.
+
+    `columns` are the inferred columns of the records (of every input file,
+    so one layout fits them all); the ones the layout doesn't know yet are
+    added to the place table with their inferred type.
+    """
+    id_name = f"{table_name}_id"
+    name_key = f"{table_name}_name"
+    schema = {
+        id_name: "VARCHAR(16) NOT NULL",
+        name_key: "VARCHAR(255)",
+        "about_and_tags": "TEXT",
+        "latitude": "DOUBLE",
+        "longitude": "DOUBLE",
+        LOCATION_COLUMN: "POINT NOT NULL",
+        "start_time": "TIME",
+        "end_time": "TIME",
+        "duration": "INT",
+    }
+    # Reviews and nearby fields go to the child tables
+    schema.update(
+        {
+            column: sql_type
+            for column, sql_type in columns.items()
+            if column not in schema
+            and column not in ("reviews", HASH_COLUMN)
+            and not re.match(NEARBY_FIELD_PATTERN, column)
+        }
+    )
+    if upsert:
+        schema[HASH_COLUMN] = "CHAR(64)"
+    return {
+        table_name: {
+            "schema": schema,
+            "primary_key": id_name,
+            "indexes": (name_key,),
+            "fulltext": ("about_and_tags",),
+            "spatial": (LOCATION_COLUMN,),
+        },
+        f"{table_name}_review": {
+            "schema": {
+                id_name: "VARCHAR(16) NOT NULL",
+                "position": "INT NOT NULL",
+                "review": "TEXT",
+            },
+            "primary_key": (id_name, "position"),
+            "fulltext": ("review",),
+        },
+        f"{table_name}_nearby": {
+            "schema": {
+                id_name: "VARCHAR(16) NOT NULL",
+                "category": "VARCHAR(32) NOT NULL",
+                "rank": "INT NOT NULL",
+                # A name, or a place ID once name_index.py resolved it
+                "nearby": "VARCHAR(255)",
+            },
+            "primary_key": (id_name, "category", "rank"),
+            "indexes": ("nearby",),
+        },
+    }
+
+
+def prepare_typed_tables(connection, table_name, columns, upsert=False):
+    """Create the typed tables, or add the columns they lack; return the layout."""
+    layout = typed_layout(table_name, columns, upsert)
+    for name, table in layout.items():
+        if not table_exists(connection, name):
+            create_table_from_schema(connection, name, **table)
+            print(f"Table '{name}' created")
+            continue
+        changes = column_changes(table["schema"], table_columns(connection, name))
+        if changes:
+            alter_table_columns(connection, name, changes)
+            print(f"Table '{name}' altered: {', '.join(changes)}")
+    return layout
+
+
+def delete_place_rows(connection, tables, key, ids, batch_size=BATCH_SIZE):
+    with connection.cursor() as cursor:
+        for batch in iter_batches(ids, batch_size):
+            placeholders = ", ".join(["%s"] * len(batch))
+            for table in tables:
+                cursor.execute(
+                    f"DELETE FROM `{table}` WHERE `{key}` IN ({placeholders})",
+                    batch,
+                )
+    connection.commit()
+
+
+def load_typed_rows(
+    connection,
+    table_name,
+    data,
+    layout=None,
+    method=LOAD_METHOD,
+    batch_size=BATCH_SIZE,
+    commit_interval=COMMIT_INTERVAL,
+    upsert=False,
+):
+    """Load `data` into the typed tables of a place table.
+
+    `layout` comes from prepare_typed_tables; without one the tables are
+    prepared for `data` alone. The tables are keyed on `<table>_id`, so a
+    place written by an earlier run is replaced, never duplicated: in insert
+    mode its place and child rows are deleted first. With `upsert`, the
+    content hash covers the whole record, so only changed places are
+    rewritten, a changed review or nearby place included. Returns the number
+    of places written.
+    """
+    id_name = f"{table_name}_id"
+    if layout is None:
+        layout = prepare_typed_tables(
+            connection, table_name, infer_schema_from_json(data), upsert
+        )
+    if upsert:
+        record_schema = dict.fromkeys(
+            sorted({key for record in data for key in record})
+        )
+        data = changed_rows(connection, table_name, data, record_schema, id_name)
+    places, children = split_typed_rows(table_name, data)
+    # An upsert overwrites the place row itself
+    tables = list(children) if upsert else [table_name, *children]
+    delete_place_rows(connection, tables, id_name, [place[id_name] for place in places])
+    write_rows(
+        connection,
+        table_name,
+        places,
+        layout[table_name]["schema"],
+        method,
+        batch_size,
+        commit_interval,
+        upsert,
+    )
+    for child_table, rows in children.items():
+        write_rows(
+            connection,
+            child_table,
+            rows,
+            layout[child_table]["schema"],
+            method,
+            batch_size,
+            commit_interval,
+        )
+    return len(places)
+
+
+def places_within(
+    connection, table_name, latitude, longitude, radius_km, schema_mode=SCHEMA_MODE
+):
+    """Return (place ID, distance in km) of the places within `radius_km`.
+
+    The bounding box is searched through the SPATIAL index of the typed
+    schema, and by a scan of latitude/longitude on the inferred one; the exact
+    haversine distance then filters and sorts the candidates.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    lon_delta = radius_km / (
+        KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6)
+    )
+    south, north = latitude - lat_delta, latitude + lat_delta
+    west, east = longitude - lon_delta, longitude + lon_delta
+    distance = (
+        "2 * %s * ASIN(SQRT(POW(SIN(RADIANS(`latitude` - %s) / 2), 2) "
+        "+ COS(RADIANS(%s)) * COS(RADIANS(`latitude`)) "
+        "* POW(SIN(RADIANS(`longitude` - %s) / 2), 2)))"
+    )
+    args = [EARTH_RADIUS_KM, latitude, latitude, longitude]
+    if schema_mode == "typed":
+        # Places without coordinates sit at MISSING_LOCATION in the index
+        condition = (
+            f"MBRIntersects(ST_GeomFromText(%s), `{LOCATION_COLUMN}`) "
+            "AND `latitude` IS NOT NULL AND `longitude` IS NOT NULL"
+        )
+        args.append(
+            f"POLYGON(({west} {south}, {east} {south}, {east} {north}, "
+            f"{west} {north}, {west} {south}))"
+        )
+    else:
+        condition = "`latitude` BETWEEN %s AND %s AND `longitude` BETWEEN %s AND %s"
+        args += [south, north, west, east]
+    query = (
+        f"SELECT `{table_name}_id`, {distance} AS distance_km FROM `{table_name}` "
+        f"WHERE {condition} HAVING distance_km <= %s ORDER BY distance_km"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(query, args + [radius_km])
+        return list(cursor.fetchall())
+
+
+def places_matching(connection, table_name, keyword, schema_mode=SCHEMA_MODE):
+    """Return the sorted IDs of the places whose description or reviews mention `keyword`.
+
+    The typed schema uses its FULLTEXT indexes, which match whole words
+    (InnoDB skips stopwords and words under innodb_ft_min_token_size); the
+    inferred one scans the JSON text with LIKE, which also matches inside words.
+    """
+    id_name = f"{table_name}_id"
+    if schema_mode == "typed":
+        query = (
+            f"SELECT `{id_name}` FROM `{table_name}` "
+            "WHERE MATCH(`about_and_tags`) AGAINST (%s IN BOOLEAN MODE) "
+            f"UNION SELECT `{id_name}` FROM `{table_name}_review` "
+            "WHERE MATCH(`review`) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        # A quoted phrase, so the keyword's characters aren't boolean operators
+        phrase = '"' + keyword.replace('"', " ") + '"'
+        args = [phrase, phrase]
+    else:
+        query = (
+            f"SELECT `{id_name}` FROM `{table_name}` "
+            "WHERE `about_and_tags` LIKE %s OR `reviews` LIKE %s"
+        )
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", keyword) + "%"
+        args = [pattern, pattern]
+    with connection.cursor() as cursor:
+        cursor.execute(query, args)
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def load_json_records(input_file):
+    # 2.extract_all.py writes an indented JSON array, JSON lines or a columnar
+    # table directory
+    if input_file.endswith(COLUMNS_SUFFIX):
+        return ColumnarTable(input_file).records()
+    with open(input_file, "r", encoding="utf-8") as file:
+        if input_file.endswith(".jsonl"):
+            return [json.loads(line) for line in file if line.strip()]
+        return json.load(file)
+
+
+def assign_missing_ids(data, table_name, id_registry):
+    # Older extraction output has no `<table>_id`; key those rows by place_key
+    # (name and coordinates) so they share the extraction stage's counters,
+    # never collide with its IDs and same-named places stay apart
+    id_name = f"{table_name}_id"
+    prefix = get_prefix(table_name)
+    for index, entry in enumerate(data):
+        if entry.get(id_name):
+            continue
+        entry_id = allocate_id(id_registry, prefix, place_key(entry, table_name))
+        data[index] = {id_name: entry_id, **entry}
+
+
+def list_json_files(json_directory):
+    return [
+        os.path.join(json_directory, f)
+        for f in os.listdir(json_directory)
+        if f.endswith((".json", ".jsonl", COLUMNS_SUFFIX))
+    ]
+
+
+def iter_json_files(input_files, table_name, id_registry=None):
+    # (input file, records) of every non-empty output file, IDs assigned in order
+    for input_file in input_files:
+        json_data = load_json_records(input_file)
 
         if not json_data:
             continue
-        schema = infer_schema_from_json(json_data)
-        create_table_from_schema(connection, table_name, schema)
-        print(f"Table '{table_name}' created")
-        insert_data_into_table(connection, table_name, json_data, schema)
-        print(f"Data from '{input_file}' inserted into '{table_name}'")
+        if id_registry is not None:
+            assign_missing_ids(json_data, table_name, id_registry)
+        yield input_file, json_data
+
+
+def read_ahead(iterable):
+    """Yield from `iterable` while a thread already produces the next item.
+
+    Items are still produced one at a time and in order; a file is decoded
+    while the previous one is being written to the database.
+    """
+    iterator = iter(iterable)
+    done = object()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, iterator, done)
+        while (item := future.result()) is not done:
+            future = executor.submit(next, iterator, done)
+            yield item
+
+
+def table_exists(connection, table_name):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table_name,),
+        )
+        return cursor.fetchone() is not None
+
+
+def table_columns(connection, table_name):
+    # Column -> type of the live table, e.g. {"accommodation_id": "VARCHAR(255)"}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name, column_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table_name,),
+        )
+        return {name: column_type.upper() for name, column_type in cursor.fetchall()}
+
+
+def live_type(column_type):
+    # information_schema spells INT as INT(11) and BOOLEAN as TINYINT(1)
+    if column_type == "TINYINT(1)":
+        return "BOOLEAN"
+    return re.sub(r"^INT\(\d+\)$", "INT", column_type)
+
+
+def column_changes(schema, columns):
+    """Return {column: (live type or None, new type)} the live `columns` lack.
+
+    Only the types schema inference produces are widened; any other live or
+    wanted type (say a LONGTEXT someone altered by hand) is left as it is.
+    """
+    changes = {}
+    for column, sql_type in schema.items():
+        if column not in columns:
+            changes[column] = (None, sql_type)
+            continue
+        current = live_type(columns[column])
+        # Fixed typed-layout types ("INT NOT NULL", "POINT NOT NULL") never widen
+        if current == sql_type or not {current, sql_type} <= INFERRED_TYPES:
+            continue
+        widened = widen_type(current, sql_type)
+        if widened != current:
+            changes[column] = (current, widened)
+    return changes
+
+
+def alter_table_columns(connection, table_name, changes):
+    """Add or widen the columns in `changes` ({column: (old, new type)})."""
+    clauses = [
+        (
+            f"ADD COLUMN `{col}` {new_type}"
+            if old_type is None
+            else f"MODIFY COLUMN `{col}` {new_type}"
+        )
+        for col, (old_type, new_type) in changes.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE `{table_name}` {', '.join(clauses)}")
+    connection.commit()
+
+
+def prepare_table(connection, table_name, schema, write_mode, evolve=False):
+    """Create the table for `schema`.
+
+    With `evolve`, an existing table is altered to fit `schema` instead:
+    missing columns are added and narrower ones widened. The diff is taken
+    against the live columns, not the registry, so a registry that is new or
+    out of date never adds a column twice.
+    """
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode '{write_mode}'")
+    indexes = TABLE_INDEXES.get(table_name, ())
+    primary_key = None
+    if write_mode == "upsert":
+        primary_key = f"{table_name}_id"
+        if primary_key not in schema:
+            raise ValueError(f"Upsert needs a '{primary_key}' column")
+        schema = {**schema, HASH_COLUMN: "CHAR(64)"}
+    if evolve and table_exists(connection, table_name):
+        changes = column_changes(schema, table_columns(connection, table_name))
+        if changes:
+            alter_table_columns(connection, table_name, changes)
+            print(f"Table '{table_name}' altered: {', '.join(changes)}")
+        return
+    create_table_from_schema(connection, table_name, schema, primary_key, indexes)
+    print(f"Table '{table_name}' created")
+
+
+def process_json_files(
+    connection,
+    json_directory,
+    table_name,
+    id_registry=None,
+    write_mode=WRITE_MODE,
+    prefetch=True,
+    schema_mode=SCHEMA_MODE,
+    schema_registry=None,
+):
+    """Load every output file of `json_directory` into `table_name`.
+
+    With a `schema_registry` (see schema_registry.py) the table gets one
+    schema for all its files, inferred only from the files the registry hasn't
+    seen, and an existing table is only altered for the columns that were
+    added or widened. Without one, each file's schema is inferred on its own,
+    except in the typed schema, whose layout always covers every file.
+    """
+    if schema_mode not in SCHEMA_MODES:
+        raise ValueError(f"Unknown schema mode '{schema_mode}'")
+    typed = schema_mode == "typed" and table_name in ID_PREFIXES
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode '{write_mode}'")
+    input_files = list_json_files(json_directory)
+    registry_schema = None
+    if schema_registry is not None:
+        # Rows without an ID get one before they are written
+        required = {f"{table_name}_id": "VARCHAR(255)"} if id_registry else None
+        registry_schema, _ = registered_schema(
+            schema_registry, table_name, input_files, required
+        )
+    if typed:
+        # One layout for every file, even without a registry
+        if registry_schema is None:
+            inference = SchemaInference()
+            for input_file in input_files:
+                inference.observe_file(input_file)
+            registry_schema = inference.schema
+        layout = prepare_typed_tables(
+            connection, table_name, registry_schema, write_mode == "upsert"
+        )
+    elif registry_schema:
+        prepare_table(connection, table_name, registry_schema, write_mode, evolve=True)
+    else:
+        # No registry, or nothing but missing values so far
+        registry_schema = None
+
+    files = iter_json_files(input_files, table_name, id_registry)
+    for input_file, json_data in read_ahead(files) if prefetch else files:
+        if typed:
+            written = load_typed_rows(
+                connection,
+                table_name,
+                json_data,
+                layout,
+                upsert=write_mode == "upsert",
+            )
+            print(
+                f"Data from '{input_file}' written to '{table_name}' "
+                f"({written} of {len(json_data)} places written)"
+            )
+            continue
+        schema = registry_schema
+        if schema is None:
+            schema = infer_schema_from_json(json_data)
+            prepare_table(connection, table_name, schema, write_mode)
+        written = load_rows(
+            connection,
+            table_name,
+            json_data,
+            schema,
+            upsert=write_mode == "upsert",
+        )
+        print(
+            f"Data from '{input_file}' written to '{table_name}' "
+            f"({written} of {len(json_data)} rows written)"
+        )
+
+
+def load_tables(
+    pool, jobs, write_mode=WRITE_MODE, schema_mode=SCHEMA_MODE, schema_registry=None
+):
+    """Load `(json_directory, table_name, id_registry)` jobs concurrently.
+
+    Every table is loaded by one thread on one pooled connection, its
+    directories and files in job order, so it gets the same statements and
+    commits as a sequential load; up to pool.size tables load at once. Tables
+    draw IDs from their own prefix, so they can share a registry. Returns the
+    seconds each table took; the first error is raised once every table has
+    finished. Tables keep separate entries in a shared `schema_registry`.
+    """
+    tables = {}
+    for json_directory, table_name, id_registry in jobs:
+        tables.setdefault(table_name, []).append((json_directory, id_registry))
+
+    def load_table(table_name, directories):
+        started = time.perf_counter()
+        with pool.connection() as connection:
+            for json_directory, id_registry in directories:
+                process_json_files(
+                    connection,
+                    json_directory,
+                    table_name,
+                    id_registry,
+                    write_mode,
+                    schema_mode=schema_mode,
+                    schema_registry=schema_registry,
+                )
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        futures = {
+            table_name: executor.submit(load_table, table_name, directories)
+            for table_name, directories in tables.items()
+        }
+    timings, errors = {}, []
+    for table_name, future in futures.items():
+        try:
+            timings[table_name] = future.result()
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    return timings
 
 
 def main():
+    # Checked before any connection is opened
+    try:
+        check_settings()
+    except ValueError as e:
+        sys.exit(f"Invalid setting: {e}")
+    id_registry = load_registry()
+    schema_registry = load_schema_registry()
+    jobs = [
+        # ("eat/extract_json", "foodAndDrink", id_registry),
+        ("stay/extract_json", "accommodation", id_registry),
+        ("do/extract_json", "activity", id_registry),
+    ]
+    # Written by name_index.py; edge rows carry their own IDs
+    if os.path.isdir(EDGE_DIRECTORY):
+        jobs.append((EDGE_DIRECTORY, EDGE_TABLE, None))
+    pool = ConnectionPool(**db_config)
     try:
-        connection = pymysql.connect(**db_config)
-        # process_json_files(connection, 'eat/extract_json', 'foodAndDrink')
-        process_json_files(connection, "stay/extract_json", "accommodation")
-        process_json_files(connection, "do/extract_json", "activity")
+        started = time.perf_counter()
+        timings = load_tables(pool, jobs, schema_registry=schema_registry)
+        save_registry(id_registry)
+        save_schema_registry(schema_registry)
+        print(
+            f"Loaded {len(timings)} tables in {time.perf_counter() - started:.2f}s "
+            f"(slowest table {max(timings.values(), default=0):.2f}s)"
+        )
     except OperationalError as e:
         print(f"Error connecting to MariaDB: {e}")
     except ProgrammingError as e:
         print(f"SQL Error: {e}")
+    except ValueError as e:
+        # e.g. an upsert into a table without an ID column
+        sys.exit(f"Load failed: {e}")
     finally:
-        if connection:
-            connection.close()
+        pool.close()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,16 @@
 import json
 import os
+import time
 import weaviate
+from collections import Counter
 from dotenv import load_dotenv
+from columnar import COLUMNS_SUFFIX, ColumnarTable
+from embeddings import EmbeddingCache, embed_texts, get_provider
+from name_index import EDGE_DIRECTORY
+from passages import PASSAGE_FANOUT, aggregate_hits, place_passages
 from weaviate.classes.init import Auth
+from weaviate.classes.query import MetadataQuery
+from weaviate.util import generate_uuid5
 import weaviate.classes.config as wc
 
 CATEGORIES = {
@@ -10,6 +18,31 @@ CATEGORIES = {
     "ACCOMMODATION": ["accommodation_Embedded", "accommodation_Bridge"],
     "ACTIVITY": ["activity_Embedded", "activity_Bridge"],
 }
+# Nearby-place edges from name_index.py, keyed by place ID like the Bridge
+# collections; plain properties, so never vectorized
+EDGE_COLLECTION = "nearby_Edge"
+# Place fields the collections hold besides <prefix>_id and <prefix>_name
+PLACE_FIELDS = ("about_and_tags", "latitude", "longitude", "reviews")
+
+# Ingestion: "dynamic" or "fixed" client-side batching, or "single" for one
+# insert request per object
+BATCH_MODES = ("dynamic", "fixed", "single")
+BATCH_MODE = os.getenv("WEAVIATE_BATCH_MODE", "dynamic")
+BATCH_SIZE = int(os.getenv("WEAVIATE_BATCH_SIZE", "100"))  # fixed mode only
+CONCURRENT_REQUESTS = int(os.getenv("WEAVIATE_CONCURRENT_REQUESTS", "2"))
+MAX_RETRIES = int(os.getenv("WEAVIATE_MAX_RETRIES", "3"))
+
+# "openai" lets Weaviate vectorize with text2vec_openai; "local" computes the
+# vectors here (see embeddings.py) and creates collections without a vectorizer;
+# "none" stores objects without vectors, for collections only filtered on
+VECTORIZERS = ("openai", "local", "none")
+VECTORIZER = os.getenv("WEAVIATE_VECTORIZER", "openai")
+
+# "place" embeds each place's text as one <prefix>_Embedded object;
+# "passages" replaces those with size-bounded <prefix>_Passage objects (see
+# passages.py), linked to the Bridge collections by <prefix>_id
+TEXT_MODES = ("place", "passages")
+TEXT_MODE = os.getenv("WEAVIATE_TEXT_MODE", "place")
 
 
 def connect_to_weaviate():
@@ -20,11 +53,20 @@ def connect_to_weaviate():
     }  # Replace with your OpenAI API key
     weaviate_url = os.getenv("WEAVIATE_URL")
     weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=weaviate_url,
-        auth_credentials=Auth.api_key(weaviate_api_key),
-        headers=headers,
-    )
+    if os.getenv("WEAVIATE_HOST"):
+        # A local instance, e.g. with WEAVIATE_VECTORIZER=local to run offline
+        client = weaviate.connect_to_local(
+            host=os.getenv("WEAVIATE_HOST"),
+            port=int(os.getenv("WEAVIATE_PORT", "8080")),
+            grpc_port=int(os.getenv("WEAVIATE_GRPC_PORT", "50051")),
+            headers=headers,
+        )
+    else:
+        client = weaviate.connect_to_weaviate_cloud(
+            cluster_url=weaviate_url,
+            auth_credentials=Auth.api_key(weaviate_api_key),
+            headers=headers,
+        )
 
     # client = weaviate.connect_to_weaviate_cloud(..., headers=headers) or
     # client = weaviate.connect_to_local(..., headers=headers)
@@ -43,20 +85,160 @@ def connect_to_weaviate():
     return client
 
 
-def create_collection(client, collection_name):
+def create_collection(client, collection_name, vectorizer=VECTORIZER, properties=None):
+    if vectorizer not in VECTORIZERS:
+        raise ValueError(f"Unknown vectorizer '{vectorizer}', use one of {VECTORIZERS}")
     client.collections.create(
         f"{collection_name}",
-        # Define the vectorizer module
-        vectorizer_config=wc.Configure.Vectorizer.text2vec_openai(),
+        # Without properties Weaviate infers them from the first objects
+        properties=properties,
+        # Define the vectorizer module; local vectors are sent with each object
+        vectorizer_config=(
+            wc.Configure.Vectorizer.text2vec_openai()
+            if vectorizer == "openai"
+            else wc.Configure.Vectorizer.none()
+        ),
         # Define the generative module
         generative_config=wc.Configure.Generative.openai(),
     )
 
 
-def insert_data(client, collection_name, object_data):
+def passage_collection(collection_name):
+    # accommodation_Embedded -> accommodation_Passage
+    return collection_name.replace("_Embedded", "_Passage")
+
+
+def collection_names(collections, text_mode=TEXT_MODE):
+    if text_mode not in TEXT_MODES:
+        raise ValueError(f"Unknown text mode '{text_mode}', use one of {TEXT_MODES}")
+    if text_mode == "place":
+        return list(collections)
+    return [
+        (
+            passage_collection(collection)
+            if collection.endswith("_Embedded")
+            else collection
+        )
+        for collection in collections
+    ]
+
+
+def passage_properties(collection_name):
+    # Only the passage text is vectorized, not the ID and field name
+    prefix = collection_name.split("_")[0]
+    return [
+        wc.Property(
+            name=f"{prefix}_id", data_type=wc.DataType.TEXT, skip_vectorization=True
+        ),
+        wc.Property(name="field", data_type=wc.DataType.TEXT, skip_vectorization=True),
+        wc.Property(name="position", data_type=wc.DataType.INT),
+        wc.Property(name="text", data_type=wc.DataType.TEXT),
+    ]
+
+
+def insert_data(client, collection_name, object_data, vector=None):
     """Insert data into a specified collection."""
     obj = client.collections.get(f"{collection_name}")
-    uuid = obj.data.insert(properties=object_data)
+    uuid = obj.data.insert(properties=object_data, vector=vector)
+
+
+def batch_context(collection, mode, batch_size, concurrent_requests):
+    if mode == "fixed":
+        return collection.batch.fixed_size(
+            batch_size=batch_size, concurrent_requests=concurrent_requests
+        )
+    return collection.batch.dynamic()
+
+
+def insert_objects(
+    client,
+    collection_name,
+    objects,
+    mode=BATCH_MODE,
+    batch_size=BATCH_SIZE,
+    concurrent_requests=CONCURRENT_REQUESTS,
+    max_retries=MAX_RETRIES,
+    vectors=None,
+):
+    """Insert objects into a collection and return an ingestion summary.
+
+    Batched modes give every object a UUID derived from its properties, so
+    retrying the objects a batch reported as failed cannot create duplicates.
+    `vectors`, when given, are explicit vectors aligned with `objects`.
+    """
+    if mode not in BATCH_MODES:
+        raise ValueError(f"Unknown batch mode '{mode}', use one of {BATCH_MODES}")
+
+    started = time.perf_counter()
+    summary = {"collection": collection_name, "objects": len(objects), "errors": []}
+    if vectors is None:
+        vectors = [None] * len(objects)
+    if mode == "single":
+        for object_data, vector in zip(objects, vectors):
+            try:
+                insert_data(client, collection_name, object_data, vector)
+            except Exception as e:
+                summary["errors"].append(str(e))
+    else:
+        collection = client.collections.get(f"{collection_name}")
+        pending = list(zip(objects, vectors))
+        for attempt in range(max_retries + 1):
+            with batch_context(
+                collection, mode, batch_size, concurrent_requests
+            ) as batch:
+                for object_data, vector in pending:
+                    batch.add_object(
+                        properties=object_data,
+                        uuid=generate_uuid5(object_data),
+                        vector=vector,
+                    )
+            failed = collection.batch.failed_objects
+            pending = [
+                (error.object_.properties, error.object_.vector) for error in failed
+            ]
+            if not pending or attempt == max_retries:
+                break
+            print(
+                f"Retrying {len(pending)} failed objects in '{collection_name}' "
+                f"(attempt {attempt + 1} of {max_retries})"
+            )
+        summary["errors"] = [error.message for error in failed]
+
+    summary["inserted"] = summary["objects"] - len(summary["errors"])
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def print_ingestion_summary(summaries):
+    for summary in summaries:
+        rate = summary["objects"] / summary["seconds"] if summary["seconds"] else 0
+        print(
+            f"'{summary['collection']}': {summary['inserted']} of "
+            f"{summary['objects']} objects inserted in {summary['seconds']:.2f}s "
+            f"({rate:.1f} objects/sec), {len(summary['errors'])} failed"
+        )
+        for message, count in Counter(summary["errors"]).most_common(5):
+            print(f"  {count} x {message}")
+
+
+def embedding_text(object_data):
+    # The text text2vec_openai would vectorize: every text property, in order
+    parts = []
+    for value in object_data.values():
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.extend(str(item) for item in value)
+    return " ".join(parts)
+
+
+def compute_vectors(objects, provider, cache, texts=None):
+    # `texts` overrides what each object is embedded by, e.g. a passage's text
+    if texts is None:
+        texts = [embedding_text(object_data) for object_data in objects]
+    vectors, hits = embed_texts(texts, provider, cache)
+    print(f"Embedded {len(objects)} objects locally ({hits} from the cache)")
+    return [vector.tolist() for vector in vectors]
 
 
 def list_collections(client):
@@ -113,8 +295,30 @@ def extract_data(json_data, collection_name):
         }
 
 
-def process_json_files(client, json_directory):
-    json_files = [f for f in os.listdir(json_directory) if f.endswith(".json")]
+def load_json_records(input_file, columns=None):
+    # 2.extract_all.py writes an indented JSON array, JSON lines or a columnar
+    # table directory, of which only `columns` are read
+    if input_file.endswith(COLUMNS_SUFFIX):
+        return ColumnarTable(input_file).records(columns)
+    with open(input_file, "r", encoding="utf-8") as file:
+        if input_file.endswith(".jsonl"):
+            return [json.loads(line) for line in file if line.strip()]
+        return json.load(file)
+
+
+def process_json_files(
+    client,
+    json_directory,
+    mode=BATCH_MODE,
+    provider=None,
+    embedding_cache=None,
+    text_mode=TEXT_MODE,
+):
+    json_files = [
+        f
+        for f in os.listdir(json_directory)
+        if f.endswith((".json", ".jsonl", COLUMNS_SUFFIX))
+    ]
     relevant_categories = []
     if "eat" in json_directory.lower():
         relevant_categories = {
@@ -126,24 +330,86 @@ def process_json_files(client, json_directory):
         }
     elif "do" in json_directory.lower():
         relevant_categories = {"ACTIVITY": ["activity_Embedded", "activity_Bridge"]}
+    # The fields extract_data reads
+    columns = list(PLACE_FIELDS)
+    for collections in relevant_categories.values():
+        prefix = collections[0].split("_")[0]
+        columns.extend([f"{prefix}_id", f"{prefix}_name"])
+    json_data = []
     for json_file in json_files:
         input_file = os.path.join(json_directory, json_file)
-        with open(input_file, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
-        if not json_data:
-            continue
+        json_data.extend(load_json_records(input_file, columns))
+
+    summaries = []
     for category, collections in relevant_categories.items():
-        for collection in collections:
-            for json_dict in json_data:
-                data = extract_data(json_dict, collection)
-                insert_data(client, collection, data)
+        for collection in collection_names(collections, text_mode):
+            texts = None
+            if collection.endswith("_Passage"):
+                prefix = collection.split("_")[0]
+                objects = [
+                    passage
+                    for json_dict in json_data
+                    for passage in place_passages(json_dict, prefix)
+                ]
+                texts = [passage["text"] for passage in objects]
+            else:
+                objects = [
+                    extract_data(json_dict, collection) for json_dict in json_data
+                ]
+            vectors = (
+                compute_vectors(objects, provider, embedding_cache, texts)
+                if provider is not None
+                else None
+            )
+            summaries.append(
+                insert_objects(client, collection, objects, mode, vectors=vectors)
+            )
+    return summaries
+
+
+def process_edge_files(client, json_directory=EDGE_DIRECTORY, mode=BATCH_MODE):
+    edges = []
+    for json_file in sorted(os.listdir(json_directory)):
+        if json_file.endswith((".json", ".jsonl", COLUMNS_SUFFIX)):
+            edges.extend(load_json_records(os.path.join(json_directory, json_file)))
+    return insert_objects(client, EDGE_COLLECTION, edges, mode)
+
+
+def search_places(client, prefix, text, k=10, provider=None, fanout=PASSAGE_FANOUT):
+    """Return the `k` best (<prefix>_id, score) places by their passages.
+
+    With a local `provider` the query is embedded here, otherwise Weaviate's
+    vectorizer embeds it. Fetches `k * fanout` passages and scores each place
+    by its best one.
+    """
+    collection = client.collections.get(f"{prefix}_Passage")
+    metadata = MetadataQuery(distance=True)
+    if provider is not None:
+        response = collection.query.near_vector(
+            near_vector=provider.encode([text])[0].tolist(),
+            limit=k * fanout,
+            return_metadata=metadata,
+        )
+    else:
+        response = collection.query.near_text(
+            query=text, limit=k * fanout, return_metadata=metadata
+        )
+    hits = [
+        (obj.properties[f"{prefix}_id"], 1 - obj.metadata.distance)
+        for obj in response.objects
+    ]
+    return aggregate_hits(hits, k)
 
 
 def delete_collections(client):
     for category, collections in CATEGORIES.items():
-        for collection in collections:
+        # Both text modes, whichever the previous run used
+        for collection in dict.fromkeys(
+            collections + collection_names(collections, "passages")
+        ):
             client.collections.delete(f"{collection}")
             print(f"Collection '{collection}' deleted.")
+    client.collections.delete(EDGE_COLLECTION)
 
 
 def main():
@@ -152,11 +418,36 @@ def main():
         delete_collections(client)
     if client:
         for category, collections in CATEGORIES.items():
-            for collection in collections:
-                create_collection(client, collection)
+            for collection in collection_names(collections):
+                create_collection(
+                    client,
+                    collection,
+                    properties=(
+                        passage_properties(collection)
+                        if collection.endswith("_Passage")
+                        else None
+                    ),
+                )
+        provider, embedding_cache = None, None
+        if VECTORIZER == "local":
+            provider, embedding_cache = get_provider(), EmbeddingCache()
         directories = ["stay/extract_json", "do/extract_json"]  # "eat/extract_json",
+        summaries = []
         for directory in directories:
-            process_json_files(client, directory)
+            summaries.extend(
+                process_json_files(
+                    client,
+                    directory,
+                    provider=provider,
+                    embedding_cache=embedding_cache,
+                )
+            )
+        if embedding_cache is not None:
+            embedding_cache.close()
+        if os.path.isdir(EDGE_DIRECTORY):
+            create_collection(client, EDGE_COLLECTION, vectorizer="none")
+            summaries.append(process_edge_files(client))
+        print_ingestion_summary(summaries)
         list_collections(client)
     client.close()
 
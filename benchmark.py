@@ -0,0 +1,1529 @@
+"""Benchmarks for the scraping pipeline stages.
+
+Run from the repository root, after 1.prettier_json.py has produced the
+`<category>/prettier_json` job files (the backend check also reads the raw
+`<category>/*.jsonl` job files 0.fetch_pages.py saved):
+
+    python benchmark.py selectors stay do
+    python benchmark.py backends stay do
+
+The database benchmarks expect a disposable local server, configured through
+the same DB_* variables as 3.store_mariadb.py, e.g.
+
+    docker run -d --name bench-mariadb -p 3306:3306 \\
+        -e MARIADB_ROOT_PASSWORD=bench -e MARIADB_DATABASE=bench mariadb:11 \\
+        --local-infile=1
+    DB_HOST=127.0.0.1 DB_USER=root DB_PASSWORD=bench DB_NAME=bench \\
+        python benchmark.py mariadb --rows 100000
+
+Radius and keyword lookups compare the inferred schema with the typed one
+(DB_SCHEMA_MODE=typed) on the same server:
+
+    python benchmark.py queries --rows 100000
+
+and a local Weaviate without a vectorizer module stands in for Weaviate Cloud:
+
+    docker run -d --name bench-weaviate -p 8080:8080 -p 50051:50051 \\
+        cr.weaviate.io/semitechnologies/weaviate:1.26.1
+    python benchmark.py weaviate --objects 10000
+
+The fetcher benchmark serves the saved (else synthetic) pages from the local
+HTTP stand-in of the fetcher tests (tests/stand_in.py):
+
+    python benchmark.py fetch stay --fail-every 10
+
+and the spatial index runs on synthetic places:
+
+    python benchmark.py geo --places 100000
+    python benchmark.py recommend --places 100000
+
+Passage retrieval (passages.py) is compared with one vector per place, under
+an embedding model's input limit:
+
+    python benchmark.py passages --places 2000 --reviews 20
+
+The columnar output is compared with JSON on copies of stay/extract_json:
+
+    python benchmark.py columns --places 100000
+
+and the whole pipeline (prettify, extraction, MariaDB and Weaviate loads) runs
+on synthetic pages from synthetic_pages.py, appending its timings to
+benchmark_results.jsonl and comparing them with the previous run:
+
+    python benchmark.py pipeline --pages 1000 10000 100000
+
+With --profile, the extract stage also records where each page's time goes
+(see extraction_profile.py):
+
+    python benchmark.py pipeline --pages 10000 --stages extract --profile profile.jsonl
+
+In "embedded_state" mode, the saved `<category>/prettier_json` pages are also
+extracted both ways and must give the same fields:
+
+    python benchmark.py pipeline --pages 1000 --extraction-mode embedded_state
+
+and pages whose embedded state covers every field skip the DOM altogether:
+
+    python benchmark.py lazy-dom eat do --pages 500
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import glob
+import html
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from datetime import datetime
+from bs4 import BeautifulSoup
+from html_backend import BACKENDS, get_backend
+
+ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Stage timings of every `pipeline` run, one JSON object per line
+BENCHMARK_RESULTS_FILE = os.path.join(ROOT_DIRECTORY, "benchmark_results.jsonl")
+PIPELINE_STAGES = ("prettify", "extract", "mariadb", "weaviate")
+# Settings a result is only comparable with the same values of
+RESULT_SETTINGS = (
+    "stage",
+    "pages",
+    "page_kb",
+    "workers",
+    "output_format",
+    "extraction_mode",
+    "categories",
+    "db_connections",
+)
+
+
+def load_stage(filename, module_name):
+    # The pipeline stages are numbered scripts, so they can't be imported by name
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_pages(input_directory, limit=None):
+    """Return the unescaped HTML of every page in a prettier_json directory."""
+    pages = []
+    for input_file in sorted(glob.glob(os.path.join(input_directory, "*.json"))):
+        with open(input_file, "r", encoding="utf-8") as file:
+            pages.extend(html.unescape(entry["html"]) for entry in json.load(file))
+        if limit and len(pages) >= limit:
+            return pages[:limit]
+    return pages
+
+
+def load_raw_pages(input_directory, limit=None):
+    """Return the unescaped HTML of every page in a directory's raw .jsonl job files."""
+    pages = []
+    for input_file in sorted(glob.glob(os.path.join(input_directory, "*.jsonl"))):
+        with open(input_file, "r", encoding="utf-8") as file:
+            pages.extend(
+                html.unescape(json.loads(line).get("result", ""))
+                for line in file
+                if line.strip()
+            )
+        if limit and len(pages) >= limit:
+            return pages[:limit]
+    return pages
+
+
+def timed(function, repeat):
+    # Best of `repeat` runs, to keep scheduler noise out of the comparison
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(value)) for value in column) for column in zip(headers, *rows)
+    ]
+    for row in [headers] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+
+def repeated_find_all(soup, plan):
+    # The lookup pattern classify_page used before the single-pass plan:
+    # one full tree walk for the headings and one per class selector
+    soup.find_all(["h1", "h2", "h3"])
+    for selector in plan:
+        soup.find_all(class_=selector)
+
+
+def bench_selectors(args):
+    extract_all = load_stage("2.extract_all.py", "extract_all")
+    rows = []
+    for category in args.categories:
+        pages = load_pages(os.path.join(category, "prettier_json"), args.limit)
+        if not pages:
+            print(f"No pages found in '{category}/prettier_json', skipping")
+            continue
+        settings = extract_all.CATEGORY_SETTINGS[category]
+        plan = extract_all.compile_extraction_plan(*settings[1:4])
+        soups = [BeautifulSoup(page, "html.parser") for page in pages]
+        backend = get_backend("html.parser")
+
+        before = timed(
+            lambda: [repeated_find_all(soup, plan) for soup in soups], args.repeat
+        )
+        after = timed(
+            lambda: [
+                extract_all.collect_buckets(soup, plan, backend) for soup in soups
+            ],
+            args.repeat,
+        )
+        classify = timed(
+            lambda: [extract_all.classify_page(page, *settings) for page in pages],
+            args.repeat,
+        )
+        rows.append(
+            [
+                category,
+                len(pages),
+                f"{before / len(pages) * 1000:.2f}",
+                f"{after / len(pages) * 1000:.2f}",
+                f"{before / after:.1f}x",
+                f"{classify / len(pages) * 1000:.2f}",
+            ]
+        )
+    print_table(
+        [
+            "category",
+            "pages",
+            "find_all ms/page",
+            "single pass ms/page",
+            "speedup",
+            "classify_page ms/page",
+        ],
+        rows,
+    )
+
+
+def state_only_page(page):
+    # A page whose JSON-LD object is all the place markup it has: the <main>
+    # block keeps it but loses the heading, description, reviews and nearby
+    start, end = page.index("<main>") + len("<main>"), page.index("</main>")
+    json_ld = page.index('<script type="application/ld+json">', start, end)
+    return page[:start] + page[json_ld:end] + page[end:]
+
+
+def bench_lazy_dom(args):
+    """Time classify_page in "embedded_state" mode with and without a DOM.
+
+    Pages the embedded state covers are not parsed at all; the parse+walk
+    column is the time those pages used to spend on a tree they never read.
+    """
+    import synthetic_pages
+    from extraction_profile import ExtractionProfile
+
+    extract_all = load_stage("2.extract_all.py", "extract_all")
+    backend = get_backend(args.backend)
+    rows = []
+    for category in args.categories:
+        settings = extract_all.CATEGORY_SETTINGS[category]
+        plan = extract_all.compile_extraction_plan(*settings[1:4])
+        # Only every 4th synthetic page carries a JSON-LD place object
+        full = [
+            page
+            for index, (_, page, _) in enumerate(
+                synthetic_pages.iter_pages(
+                    category, args.pages * 4, page_kb=args.page_kb
+                )
+            )
+            if index % 4 == 0
+        ]
+        for source, pages in (
+            ("state only", [state_only_page(page) for page in full]),
+            ("full page", full),
+        ):
+            profile = ExtractionProfile()
+            for page in pages:
+                extract_all.classify_page(
+                    page,
+                    *settings,
+                    parser_backend=args.backend,
+                    extraction_mode="embedded_state",
+                    profile=profile,
+                )
+            classify = timed(
+                lambda: [
+                    extract_all.classify_page(
+                        page,
+                        *settings,
+                        parser_backend=args.backend,
+                        extraction_mode="embedded_state",
+                    )
+                    for page in pages
+                ],
+                args.repeat,
+            )
+            parse_and_walk = timed(
+                lambda: [
+                    extract_all.collect_buckets(backend.parse(page), plan, backend)
+                    for page in pages
+                ],
+                args.repeat,
+            )
+            rows.append(
+                [
+                    category,
+                    source,
+                    len(pages),
+                    profile.hits["parse/skipped"],
+                    f"{classify / len(pages) * 1000:.2f}",
+                    f"{parse_and_walk / len(pages) * 1000:.2f}",
+                ]
+            )
+    print_table(
+        [
+            "category",
+            "pages from",
+            "pages",
+            "parse skipped",
+            "classify_page ms/page",
+            "parse+walk ms/page",
+        ],
+        rows,
+    )
+
+
+def available_backends():
+    backends = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError as e:
+            print(f"Skipping backend '{name}': {e}")
+            continue
+        backends.append(name)
+    return backends
+
+
+def bench_backends(args):
+    """Check every backend extracts the same fields as html.parser, and time them.
+
+    Both the prettified `<category>/prettier_json` pages and the raw
+    `<category>/*.jsonl` job files are checked: prettify already ran one tree
+    builder over the first, so only the raw pages show how the backends
+    repair the markup the scraper fetched (see html_backend.py). Exits with
+    status 1 when any field differs, so it can gate a backend switch.
+    """
+    extract_all = load_stage("2.extract_all.py", "extract_all")
+    backends = available_backends()
+    reference = backends[0]
+    rows = []
+    mismatches = 0
+    for category in args.categories:
+        sources = {
+            "prettier_json": load_pages(
+                os.path.join(category, "prettier_json"), args.limit
+            ),
+            "raw": load_raw_pages(category, args.limit),
+        }
+        settings = extract_all.CATEGORY_SETTINGS[category]
+        for source, pages in sources.items():
+            if not pages:
+                print(f"No {source} pages found for '{category}', skipping")
+                continue
+
+            results = {}
+            for name in backends:
+                backend = get_backend(name)
+                parse = timed(
+                    lambda: [backend.parse(page) for page in pages], args.repeat
+                )
+                classify = timed(
+                    lambda: [
+                        extract_all.classify_page(page, *settings, name)
+                        for page in pages
+                    ],
+                    args.repeat,
+                )
+                results[name] = [
+                    extract_all.classify_page(page, *settings, name) for page in pages
+                ]
+                rows.append(
+                    [
+                        category,
+                        source,
+                        name,
+                        len(pages),
+                        f"{parse / len(pages) * 1000:.2f}",
+                        f"{classify / len(pages) * 1000:.2f}",
+                    ]
+                )
+
+            # Field-by-field comparison against the reference backend
+            for name in backends[1:]:
+                for index, (expected, actual) in enumerate(
+                    zip(results[reference], results[name])
+                ):
+                    for field in expected.keys() | actual.keys():
+                        if expected.get(field) != actual.get(field):
+                            mismatches += 1
+                            print(
+                                f"MISMATCH {category} {source} page {index} "
+                                f"field '{field}' ({reference} vs {name}): "
+                                f"{expected.get(field)!r} != {actual.get(field)!r}"
+                            )
+
+    print_table(
+        [
+            "category",
+            "pages from",
+            "backend",
+            "pages",
+            "parse ms/page",
+            "classify_page ms/page",
+        ],
+        rows,
+    )
+    if mismatches:
+        print(f"{mismatches} field mismatches across backends")
+        sys.exit(1)
+    print(f"All fields identical across {', '.join(backends)}")
+
+
+def load_sample_records(categories=("stay", "do")):
+    """Return the checked-in extraction output of each category."""
+    records = {}
+    for category in categories:
+        records[category] = []
+        for input_file in sorted(
+            glob.glob(os.path.join(ROOT_DIRECTORY, category, "extract_json", "*.json"))
+        ):
+            with open(input_file, "r", encoding="utf-8") as file:
+                records[category].extend(json.load(file))
+    return records
+
+
+def synthetic_rows(records, count, name_key):
+    # Cycle through the sample records, giving each copy its own name
+    rows = []
+    for index in range(count):
+        row = copy.deepcopy(records[index % len(records)])
+        row[name_key] = f"{row.get(name_key)} #{index}"
+        rows.append(row)
+    return rows
+
+
+def bench_mariadb(args):
+    store_mariadb = load_stage("3.store_mariadb.py", "store_mariadb")
+    import pymysql
+
+    rows = synthetic_rows(
+        load_sample_records(["stay"])["stay"], args.rows, "accommodation_name"
+    )
+    schema = store_mariadb.infer_schema_from_json(rows)
+    connection = pymysql.connect(**{**store_mariadb.db_config, "local_infile": True})
+    results = []
+    try:
+        # "row" is the old one-INSERT-per-row behaviour, as a baseline
+        for method in ["row"] + list(args.methods):
+            table_name = f"bench_{method}"
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+            store_mariadb.create_table_from_schema(connection, table_name, schema)
+
+            started = time.perf_counter()
+            store_mariadb.load_rows(
+                connection,
+                table_name,
+                rows,
+                schema,
+                "executemany" if method == "row" else method,
+                1 if method == "row" else args.batch_size,
+                args.commit_interval,
+            )
+            elapsed = time.perf_counter() - started
+            results.append(
+                [method, len(rows), f"{elapsed:.2f}", f"{len(rows) / elapsed:.0f}"]
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE `{table_name}`")
+    finally:
+        connection.close()
+    print_table(["method", "rows", "seconds", "rows/sec"], results)
+
+
+def bench_queries(args):
+    """Radius and keyword lookups on the inferred vs the typed MariaDB schema.
+
+    Exits with status 1 when the schemas disagree on a radius query, or when a
+    FULLTEXT match is missing from the LIKE scan (which also matches inside
+    words, so it may find more).
+    """
+    store_mariadb = load_stage("3.store_mariadb.py", "store_mariadb")
+    import pymysql
+
+    rng = np.random.default_rng(args.seed)
+    records, vocabulary = synthetic_places(args.rows, rng)
+    origins = np.column_stack(
+        [
+            7.9 + rng.normal(0, 0.1, args.queries),
+            98.3 + rng.normal(0, 0.1, args.queries),
+        ]
+    )
+    # Skip the most common words, like a FULLTEXT stopword list would
+    keywords = rng.choice(vocabulary[100:1000], args.queries)
+    tables = {"inferred": "bench_inferred", "typed": "bench_typed"}
+
+    def table_rows(table_name):
+        # The typed layout keys rows on `<table>_id`
+        return [
+            {
+                key.replace("accommodation", table_name): value
+                for key, value in row.items()
+            }
+            for row in records
+        ]
+
+    connection = pymysql.connect(**store_mariadb.db_config)
+
+    def drop_tables():
+        with connection.cursor() as cursor:
+            for table_name in tables.values():
+                for suffix in ("", "_review", "_nearby"):
+                    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}{suffix}`")
+
+    results, answers = [], {}
+    try:
+        drop_tables()
+        for mode, table_name in tables.items():
+            rows = table_rows(table_name)
+            started = time.perf_counter()
+            if mode == "typed":
+                with contextlib.redirect_stdout(io.StringIO()):
+                    store_mariadb.load_typed_rows(connection, table_name, rows)
+            else:
+                schema = store_mariadb.infer_schema_from_json(rows)
+                store_mariadb.create_table_from_schema(
+                    connection, table_name, schema, f"{table_name}_id"
+                )
+                store_mariadb.load_rows(connection, table_name, rows, schema)
+            load = time.perf_counter() - started
+            results.append([mode, "load", args.rows, f"{load:.2f}", "-", "-", "-"])
+
+            shapes = {
+                f"within {args.radius} km": lambda q: [
+                    place_id
+                    for place_id, _ in store_mariadb.places_within(
+                        connection, table_name, *origins[q], args.radius, mode
+                    )
+                ],
+                "keyword": lambda q: store_mariadb.places_matching(
+                    connection, table_name, keywords[q], mode
+                ),
+            }
+            for shape, run in shapes.items():
+                latencies, found = [], []
+                for query in range(args.queries):
+                    started = time.perf_counter()
+                    found.append(run(query))
+                    latencies.append(time.perf_counter() - started)
+                answers[mode, shape] = found
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+                results.append(
+                    [
+                        mode,
+                        shape,
+                        args.queries,
+                        f"{sum(latencies):.2f}",
+                        f"{p50:.2f}",
+                        f"{p99:.2f}",
+                        f"{np.mean([len(ids) for ids in found]):.1f}",
+                    ]
+                )
+    finally:
+        drop_tables()
+        connection.close()
+    print_table(
+        ["schema", "query", "count", "total s", "p50 ms", "p99 ms", "avg rows"],
+        results,
+    )
+
+    radius = f"within {args.radius} km"
+    mismatches = sum(
+        set(inferred) != set(typed)
+        for inferred, typed in zip(
+            answers["inferred", radius], answers["typed", radius]
+        )
+    ) + sum(
+        not set(typed) <= set(inferred)
+        for inferred, typed in zip(
+            answers["inferred", "keyword"], answers["typed", "keyword"]
+        )
+    )
+    if mismatches:
+        print(f"{mismatches} queries differ between the schemas")
+        sys.exit(1)
+    print(f"{2 * args.queries} queries agree between the schemas")
+
+
+def bench_weaviate(args):
+    store_weaviate = load_stage("4.store_weaviate.py", "store_weaviate")
+    import weaviate
+    import weaviate.classes.config as wc
+
+    rows = synthetic_rows(
+        load_sample_records(["stay"])["stay"], args.objects, "accommodation_name"
+    )
+    objects = [
+        store_weaviate.extract_data(row, "accommodation_Embedded") for row in rows
+    ]
+    client = weaviate.connect_to_local(
+        host=args.host, port=args.port, grpc_port=args.grpc_port
+    )
+    results = []
+    try:
+        for mode in args.modes:
+            collection_name = f"Bench_{mode}"
+            client.collections.delete(collection_name)
+            client.collections.create(
+                collection_name, vectorizer_config=wc.Configure.Vectorizer.none()
+            )
+            summary = store_weaviate.insert_objects(
+                client,
+                collection_name,
+                objects,
+                mode,
+                args.batch_size,
+                args.concurrent_requests,
+            )
+            results.append(
+                [
+                    mode,
+                    summary["objects"],
+                    len(summary["errors"]),
+                    f"{summary['seconds']:.2f}",
+                    f"{summary['objects'] / summary['seconds']:.0f}",
+                ]
+            )
+            client.collections.delete(collection_name)
+    finally:
+        client.close()
+    print_table(["mode", "objects", "failed", "seconds", "objects/sec"], results)
+
+
+def bench_fetch(args):
+    """Fetch saved pages from a local stand-in twice: cold, then revalidating.
+
+    Without saved pages, synthetic ones (synthetic_pages.py) are served.
+    Exits with status 1 when a page is missing or differs from what was
+    served, or when the second pass downloads anything again.
+    """
+    fetch_pages = load_stage("0.fetch_pages.py", "fetch_pages")
+    import synthetic_pages
+    from tests.stand_in import serve_pages
+
+    pages = []
+    for category in args.categories:
+        saved = load_pages(os.path.join(category, "prettier_json"), args.limit)
+        if not saved:
+            saved = [
+                page
+                for _, page, _ in synthetic_pages.iter_pages(
+                    category, args.limit or 100
+                )
+            ]
+        pages.extend(saved)
+
+    server, base_url = serve_pages(pages)
+    urls = [f"{base_url}{index}" for index in range(len(pages))]
+
+    rows = []
+    problems = 0
+    with tempfile.TemporaryDirectory() as directory:
+        cache = fetch_pages.PageCache(os.path.join(directory, "fetch_cache.sqlite"))
+        for label in ("cold", "revalidate"):
+            output_file = os.path.join(directory, f"job-{label}-result.jsonl")
+            server.requests = 0
+            # Every --fail-every-th page gets a 503 on its first request
+            if args.fail_every:
+                server.failures = {
+                    index: [503] for index in range(0, len(pages), args.fail_every)
+                }
+            summary = asyncio.run(
+                fetch_pages.fetch_to_jsonl(
+                    urls,
+                    output_file,
+                    args.concurrency,
+                    args.per_host,
+                    args.rate,
+                    cache=cache,
+                )
+            )
+            with open(output_file, "r", encoding="utf-8") as file:
+                fetched = {
+                    record["input"]: record["result"]
+                    for record in map(json.loads, file)
+                }
+            problems += sum(
+                1 for url, page in zip(urls, pages) if fetched.get(url) != page
+            )
+            if label == "revalidate":
+                problems += summary["fetched"]
+            rows.append(
+                [
+                    label,
+                    len(fetched),
+                    summary["fetched"],
+                    summary["not_modified"],
+                    len(summary["failed"]),
+                    server.requests,
+                    f"{summary['seconds']:.2f}",
+                    f"{len(fetched) / summary['seconds']:.0f}",
+                ]
+            )
+        cache.close()
+    server.shutdown()
+
+    print_table(
+        [
+            "pass",
+            "pages",
+            "200",
+            "304",
+            "failed",
+            "requests",
+            "seconds",
+            "pages/sec",
+        ],
+        rows,
+    )
+    if problems:
+        print(f"{problems} pages missing, different or downloaded again")
+        sys.exit(1)
+    print("All pages fetched intact; the second pass only revalidated")
+
+
+def bench_geo(args):
+    """Time the spatial index on synthetic places and check it by brute force.
+
+    Exits with status 1 when a query disagrees with a full haversine scan.
+    """
+    import geo_index
+
+    # Places scattered around Phuket, denser near the centre like the real data
+    rng = np.random.default_rng(args.seed)
+    latitudes = 7.9 + rng.normal(0, 0.1, args.places)
+    longitudes = 98.3 + rng.normal(0, 0.1, args.places)
+    queries = rng.integers(0, args.places, args.queries)
+
+    started = time.perf_counter()
+    index = geo_index.GeoIndex(latitudes, longitudes, args.cell_degrees)
+    build = time.perf_counter() - started
+
+    mismatches = 0
+    for query in queries[: args.check]:
+        distances = geo_index.haversine_km(
+            latitudes[query], longitudes[query], latitudes, longitudes
+        )
+        _, found = index.nearest(latitudes[query], longitudes[query], args.k)
+        mismatches += not np.allclose(found, np.sort(distances)[: args.k])
+        within, _ = index.within_radius(
+            latitudes[query], longitudes[query], args.radius
+        )
+        mismatches += set(within) != set(np.flatnonzero(distances <= args.radius))
+
+    nearest = timed(
+        lambda: [
+            index.nearest(latitudes[query], longitudes[query], args.k)
+            for query in queries
+        ],
+        args.repeat,
+    )
+    within = timed(
+        lambda: [
+            index.within_radius(latitudes[query], longitudes[query], args.radius)
+            for query in queries
+        ],
+        args.repeat,
+    )
+    started = time.perf_counter()
+    index.batch_nearest(
+        latitudes, longitudes, geo_index.NEARBY_COUNT, np.arange(args.places)
+    )
+    batch = time.perf_counter() - started
+
+    print_table(
+        ["operation", "count", "total s", "per item us"],
+        [
+            ["build", args.places, f"{build:.3f}", f"{build / args.places * 1e6:.1f}"],
+            [
+                f"nearest k={args.k}",
+                len(queries),
+                f"{nearest:.3f}",
+                f"{nearest / len(queries) * 1e6:.1f}",
+            ],
+            [
+                f"within {args.radius} km",
+                len(queries),
+                f"{within:.3f}",
+                f"{within / len(queries) * 1e6:.1f}",
+            ],
+            [
+                "batch nearby",
+                args.places,
+                f"{batch:.3f}",
+                f"{batch / args.places * 1e6:.1f}",
+            ],
+        ],
+    )
+    if mismatches:
+        print(f"{mismatches} queries differ from a brute-force scan")
+        sys.exit(1)
+    print(f"{min(args.check, len(queries))} queries match a brute-force scan")
+
+
+def synthetic_places(count, rng, vocabulary_size=2000, words=40, reviews=1):
+    # Records shaped like the extraction output, with random text and
+    # coordinates; each review has words - 10 words
+    vocabulary = [f"w{index}" for index in range(vocabulary_size)]
+    # Zipf-like word frequencies, so some words are common and most are rare
+    weights = 1 / np.arange(1, vocabulary_size + 1)
+    weights /= weights.sum()
+    review_words = words - 10
+    tokens = rng.choice(
+        vocabulary_size, size=(count, 10 + reviews * review_words), p=weights
+    )
+    latitudes = 7.9 + rng.normal(0, 0.1, count)
+    longitudes = 98.3 + rng.normal(0, 0.1, count)
+    return [
+        {
+            "accommodation_id": f"H{index:06d}",
+            "accommodation_name": f"Place {index}",
+            "about_and_tags": [" ".join(vocabulary[t] for t in tokens[index, :10])],
+            "latitude": float(latitudes[index]),
+            "longitude": float(longitudes[index]),
+            "reviews": [
+                " ".join(
+                    vocabulary[t] for t in tokens[index, start : start + review_words]
+                )
+                for start in range(10, tokens.shape[1], review_words)
+            ],
+        }
+        for index in range(count)
+    ], vocabulary
+
+
+def bench_recommend(args):
+    """p50/p99 query latency of the recommendation engine on synthetic places."""
+    import recommend
+    from embeddings import HashingProvider
+
+    rng = np.random.default_rng(args.seed)
+    records, vocabulary = synthetic_places(args.places, rng)
+    engine = recommend.RecommendationEngine(HashingProvider())
+    started = time.perf_counter()
+    engine.add_category("stay", records)
+    build = time.perf_counter() - started
+    print(f"Indexed {len(records)} places in {build:.1f}s")
+
+    texts = [
+        " ".join(rng.choice(vocabulary[:500], size=rng.integers(1, 4)))
+        for _ in range(args.queries)
+    ]
+    origins = np.column_stack(
+        [
+            7.9 + rng.normal(0, 0.1, args.queries),
+            98.3 + rng.normal(0, 0.1, args.queries),
+        ]
+    )
+    shapes = {
+        "text": lambda q: engine.query("stay", texts[q], k=args.k),
+        "near": lambda q: engine.query("stay", None, *origins[q], k=args.k),
+        "text + near": lambda q: engine.query("stay", texts[q], *origins[q], k=args.k),
+        "text + near + radius": lambda q: engine.query(
+            "stay", texts[q], *origins[q], k=args.k, radius_km=args.radius
+        ),
+    }
+    rows = []
+    for shape, run in shapes.items():
+        latencies = []
+        for query in range(args.queries):
+            started = time.perf_counter()
+            run(query)
+            latencies.append(time.perf_counter() - started)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        rows.append([shape, args.queries, f"{p50:.2f}", f"{p99:.2f}"])
+    print_table(["query", "queries", "p50 ms", "p99 ms"], rows)
+
+
+def bench_passages(args):
+    """Recall per embedded token: one vector per place vs per passage."""
+    import passages
+    import recommend
+    from embeddings import TOKEN_PATTERN, HashingProvider, embed_texts
+
+    rng = np.random.default_rng(args.seed)
+    records, vocabulary = synthetic_places(
+        args.places, rng, words=10 + args.review_words, reviews=args.reviews
+    )
+    provider = HashingProvider()
+
+    def truncated(text):
+        # What a model with a `--model-tokens` input limit actually sees
+        return " ".join(TOKEN_PATTERN.findall(text)[: args.model_tokens])
+
+    # Each query is the rarest few words of one review, what a traveller
+    # remembers of it; the review's place is the one to find
+    rank = {word: index for index, word in enumerate(vocabulary)}
+    queries = []
+    for _ in range(args.queries):
+        place = int(rng.integers(len(records)))
+        review = records[place]["reviews"][int(rng.integers(args.reviews))].split()
+        words = sorted(set(review), key=rank.get)[-args.query_words :]
+        queries.append((" ".join(words), records[place]["accommodation_id"]))
+    query_vectors = provider.encode([text for text, _ in queries])
+
+    place_texts = [
+        truncated(recommend.place_text(record, "accommodation")) for record in records
+    ]
+    passage_objects = [
+        passage
+        for record in records
+        for passage in passages.place_passages(
+            record, "accommodation", args.passage_tokens
+        )
+    ]
+    passage_texts = [truncated(passage["text"]) for passage in passage_objects]
+
+    rows = []
+    for mode, texts in (("place", place_texts), ("passages", passage_texts)):
+        started = time.perf_counter()
+        vectors, _ = embed_texts(texts, provider, batch_size=args.batch_size)
+        seconds = time.perf_counter() - started
+        vectors = np.array(vectors)
+        if mode == "place":
+            ids = [record["accommodation_id"] for record in records]
+
+            def search(vector):
+                scores = vectors @ vector
+                best = np.argpartition(-scores, args.k - 1)[: args.k]
+                return [ids[position] for position in best]
+
+        else:
+            index = passages.PassageIndex(passage_objects, vectors, "accommodation")
+
+            def search(vector):
+                return [place_id for place_id, _ in index.query(vector, args.k)]
+
+        found = sum(
+            target in search(vector)
+            for vector, (_, target) in zip(query_vectors, queries)
+        )
+        tokens = sum(passages.token_count(text) for text in texts)
+        recall = found / len(queries)
+        rows.append(
+            [
+                mode,
+                len(texts),
+                tokens,
+                f"{seconds:.2f}",
+                f"{recall:.3f}",
+                f"{recall * 1e6 / tokens:.2f}",
+            ]
+        )
+    print_table(
+        ["mode", "vectors", "tokens", "embed s", f"recall@{args.k}", "recall/1M tok"],
+        rows,
+    )
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def bench_columns(args):
+    """Size and load time of the JSON output vs the columnar layout."""
+    import columnar
+
+    samples = load_sample_records(["stay"])["stay"]
+    if not samples:
+        print("No stay/extract_json output to sample")
+        sys.exit(1)
+    records = synthetic_rows(samples, args.places, "accommodation_name")
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "places_clean.json")
+        columns_directory = os.path.join(directory, "places_clean.columns")
+        started = time.perf_counter()
+        with open(json_file, "w", encoding="utf-8") as file:
+            json.dump(records, file, indent=4, ensure_ascii=False)
+        json_write = time.perf_counter() - started
+        started = time.perf_counter()
+        columnar.write_columns(records, columns_directory)
+        columns_write = time.perf_counter() - started
+
+        def json_records():
+            with open(json_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+
+        def json_coordinates():
+            data = json_records()
+            return np.array([[r["latitude"], r["longitude"]] for r in data])
+
+        def columns_coordinates():
+            table = columnar.ColumnarTable(columns_directory)
+            return np.column_stack(
+                [table.column("latitude"), table.column("longitude")]
+            )
+
+        def columns_names():
+            table = columnar.ColumnarTable(columns_directory)
+            return table.values("accommodation_name")
+
+        rows = [
+            [
+                "write",
+                f"{json_write * 1000:.1f}",
+                f"{columns_write * 1000:.1f}",
+            ],
+            [
+                "all records",
+                f"{timed(json_records, args.repeat) * 1000:.1f}",
+                f"{timed(lambda: columnar.ColumnarTable(columns_directory).records(), args.repeat) * 1000:.1f}",
+            ],
+            [
+                "coordinates",
+                f"{timed(json_coordinates, args.repeat) * 1000:.1f}",
+                f"{timed(columns_coordinates, args.repeat) * 1000:.1f}",
+            ],
+            [
+                "names",
+                f"{timed(json_records, args.repeat) * 1000:.1f}",
+                f"{timed(columns_names, args.repeat) * 1000:.1f}",
+            ],
+        ]
+        print(
+            f"{len(records)} records: JSON {directory_size(json_file) / 1e6:.2f} MB, "
+            f"columnar {directory_size(columns_directory) / 1e6:.2f} MB"
+        )
+        print_table(["load", "json ms", "columns ms"], rows)
+
+        table = columnar.ColumnarTable(columns_directory)
+        keys = list(table.types)
+        restored = table.records()
+        mismatches = sum(
+            {key: record.get(key) for key in keys} != row
+            for record, row in zip(records, restored)
+        )
+        if mismatches or len(restored) != len(records):
+            print(f"{mismatches} records differ after the columnar round trip")
+            sys.exit(1)
+        print("All records identical after the columnar round trip")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(results_file):
+    if not os.path.exists(results_file):
+        return []
+    with open(results_file, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def previous_result(history, result):
+    # The last earlier run of the same stage with the same settings
+    settings = [key for key in RESULT_SETTINGS if key != "stage"]
+    for earlier in reversed(history):
+        if earlier["stage"] == result["stage"] and all(
+            earlier.get(key) == result.get(key) for key in settings
+        ):
+            return earlier
+    return None
+
+
+def run_pipeline_stages(args, pages, directory):
+    """Generate `pages` synthetic pages under `directory` and time each stage.
+
+    Returns ({stage: (seconds, note)}, extraction mismatches).
+    """
+    prettier_json = load_stage("1.prettier_json.py", "prettier_json")
+    extract_all = load_stage("2.extract_all.py", "extract_all")
+    store_mariadb = load_stage("3.store_mariadb.py", "store_mariadb")
+    import synthetic_pages
+    from geo_index import CATEGORY_PREFIXES
+
+    counts = [pages // len(args.categories)] * len(args.categories)
+    counts[0] += pages - sum(counts)
+    expected = {}
+    started = time.perf_counter()
+    for category, count in zip(args.categories, counts):
+        category_directory = os.path.join(directory, category)
+        os.makedirs(category_directory)
+        expected[category] = synthetic_pages.write_job_file(
+            category,
+            count,
+            os.path.join(category_directory, "job-synthetic-result.jsonl"),
+            args.seed,
+            args.page_kb,
+        )
+    print(f"Generated {pages} pages in {time.perf_counter() - started:.1f}s")
+
+    def output_directory(category):
+        return os.path.join(directory, category, "extract_json")
+
+    def run_stage(stage, function):
+        # Stage scripts report every file; only the timing is printed here
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            note = function()
+        timings[stage] = (time.perf_counter() - started, note)
+
+    def prettify():
+        for category in args.categories:
+            prettier_json.prettify_directory(os.path.join(directory, category))
+
+    def extract():
+        for category in args.categories:
+            extract_all.process_files(
+                os.path.join(directory, category),
+                output_directory(category),
+                *extract_all.CATEGORY_SETTINGS[category],
+                workers=args.workers,
+                registry_file=os.path.join(directory, "id_registry.json"),
+                streaming=True,
+                output_format=args.output_format,
+                cache_file=None,
+                extraction_mode=args.extraction_mode,
+                profile_file=args.profile,
+            )
+
+    timings = {}
+    if "prettify" in args.stages:
+        run_stage("prettify", prettify)
+
+    mismatches = 0
+    # The loads read the extraction output
+    if {"extract", "mariadb", "weaviate"} & set(args.stages):
+        run_stage("extract", extract)
+        for category in args.categories:
+            records = []
+            for name in sorted(os.listdir(output_directory(category))):
+                records.extend(
+                    store_mariadb.load_json_records(
+                        os.path.join(output_directory(category), name)
+                    )
+                )
+            id_name = f"{CATEGORY_PREFIXES[category]}_id"
+            # Missing pages count as mismatches too
+            mismatches += abs(len(records) - len(expected[category]))
+            for record, fields in zip(records, expected[category]):
+                keys = (record.keys() | fields.keys()) - {id_name}
+                mismatches += any(record.get(key) != fields.get(key) for key in keys)
+        timings["extract"] = (timings["extract"][0], f"{mismatches} mismatches")
+
+    if "mariadb" in args.stages:
+        import pymysql
+
+        try:
+            connection = pymysql.connect(**store_mariadb.db_config)
+        except pymysql.err.OperationalError as e:
+            print(f"MariaDB unavailable: {e.args[-1]}")
+            timings["mariadb"] = (None, "skipped, no server")
+        else:
+            tables = [
+                f"bench_{CATEGORY_PREFIXES[category]}" for category in args.categories
+            ]
+
+            def drop_tables():
+                with connection.cursor() as cursor:
+                    for table_name in tables:
+                        cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+
+            pool = store_mariadb.ConnectionPool(
+                args.db_connections, **store_mariadb.db_config
+            )
+
+            def load_mariadb():
+                # One connection is the old one-table-after-another load
+                store_mariadb.load_tables(
+                    pool,
+                    [
+                        (output_directory(category), table_name, None)
+                        for category, table_name in zip(args.categories, tables)
+                    ],
+                )
+
+            try:
+                drop_tables()
+                run_stage("mariadb", load_mariadb)
+                drop_tables()
+            finally:
+                pool.close()
+                connection.close()
+
+    if "weaviate" in args.stages:
+        store_weaviate = load_stage("4.store_weaviate.py", "store_weaviate")
+        import weaviate
+        import weaviate.classes.config as wc
+
+        try:
+            client = weaviate.connect_to_local(
+                host=args.host, port=args.port, grpc_port=args.grpc_port
+            )
+        except weaviate.exceptions.WeaviateBaseError as e:
+            print(f"Weaviate unavailable: {type(e).__name__}")
+            timings["weaviate"] = (None, "skipped, no server")
+        else:
+
+            def load_weaviate():
+                failed = 0
+                for category in args.categories:
+                    prefix = CATEGORY_PREFIXES[category]
+                    collection_name = f"Bench_{prefix}_Embedded"
+                    records = []
+                    for name in sorted(os.listdir(output_directory(category))):
+                        records.extend(
+                            store_weaviate.load_json_records(
+                                os.path.join(output_directory(category), name)
+                            )
+                        )
+                    objects = [
+                        store_weaviate.extract_data(record, f"{prefix}_Embedded")
+                        for record in records
+                    ]
+                    client.collections.delete(collection_name)
+                    client.collections.create(
+                        collection_name,
+                        vectorizer_config=wc.Configure.Vectorizer.none(),
+                    )
+                    summary = store_weaviate.insert_objects(
+                        client, collection_name, objects
+                    )
+                    failed += len(summary["errors"])
+                    client.collections.delete(collection_name)
+                return f"{failed} failed"
+
+            try:
+                run_stage("weaviate", load_weaviate)
+            finally:
+                client.close()
+    return timings, mismatches
+
+
+def saved_page_mismatches(categories, limit=None):
+    """Compare "dom" and "embedded_state" extraction on the saved pages.
+
+    Synthetic pages only have the layouts synthetic_pages.py knows of; the
+    `<category>/prettier_json` pages are what the scraper really fetched.
+    Returns the number of differing fields, printing each of them.
+    """
+    extract_all = load_stage("2.extract_all.py", "extract_all")
+    mismatches = 0
+    for category in categories:
+        pages = load_pages(os.path.join(category, "prettier_json"), limit)
+        if not pages:
+            print(f"No saved pages in '{category}/prettier_json', skipping")
+            continue
+        settings = extract_all.CATEGORY_SETTINGS[category]
+        for index, page in enumerate(pages):
+            expected = extract_all.classify_page(page, *settings)
+            actual = extract_all.classify_page(
+                page, *settings, extraction_mode="embedded_state"
+            )
+            for field in expected.keys() | actual.keys():
+                if expected.get(field) != actual.get(field):
+                    mismatches += 1
+                    print(
+                        f"MISMATCH {category} saved page {index} field '{field}' "
+                        f"(dom vs embedded_state): "
+                        f"{expected.get(field)!r} != {actual.get(field)!r}"
+                    )
+    return mismatches
+
+
+def bench_pipeline(args):
+    """Time every pipeline stage on synthetic pages and keep a result history.
+
+    Each run is appended to the results file and compared with the previous
+    run of the same stage and settings. Exits with status 1 when extraction
+    output differs from what the pages should give, or, with
+    --fail-on-regression, when a stage is more than --tolerance slower.
+    """
+    history = load_results(args.results)
+    commit = git_commit()
+    started_at = datetime.now().isoformat(timespec="seconds")
+    results, rows = [], []
+    regressions = mismatches = 0
+    for pages in args.pages:
+        with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+            timings, page_mismatches = run_pipeline_stages(args, pages, directory)
+        mismatches += page_mismatches
+        for stage in PIPELINE_STAGES:
+            if stage not in timings:
+                continue
+            seconds, note = timings[stage]
+            if seconds is None:
+                rows.append([stage, pages, "-", "-", "-", "-", note])
+                continue
+            result = {
+                "time": started_at,
+                "commit": commit,
+                "stage": stage,
+                "pages": pages,
+                "page_kb": args.page_kb,
+                "workers": args.workers,
+                "output_format": args.output_format,
+                "extraction_mode": args.extraction_mode,
+                "categories": list(args.categories),
+                "seconds": round(seconds, 3),
+                "pages_per_sec": round(pages / seconds, 1),
+            }
+            if stage == "mariadb":
+                result["db_connections"] = args.db_connections
+            previous = previous_result(history, result)
+            change = "-"
+            if previous:
+                ratio = result["pages_per_sec"] / previous["pages_per_sec"] - 1
+                change = f"{ratio:+.1%}"
+                if ratio < -args.tolerance:
+                    regressions += 1
+                    note = f"{note or ''} REGRESSION vs {previous['commit']}".strip()
+            results.append(result)
+            rows.append(
+                [
+                    stage,
+                    pages,
+                    f"{seconds:.2f}",
+                    f"{result['pages_per_sec']:.1f}",
+                    f"{previous['pages_per_sec']:.1f}" if previous else "-",
+                    change,
+                    note or "",
+                ]
+            )
+
+    print_table(
+        ["stage", "pages", "seconds", "pages/sec", "previous", "change", ""], rows
+    )
+    if args.extraction_mode == "embedded_state" and "extract" in args.stages:
+        saved = saved_page_mismatches(args.categories, args.saved_pages)
+        if saved:
+            print(f"{saved} fields of saved pages differ from the DOM extraction")
+            mismatches += saved
+    if args.results and results:
+        with open(args.results, "a", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+        print(f"Results appended to '{args.results}'")
+    if mismatches:
+        print(f"{mismatches} extracted pages differ from the synthetic pages' fields")
+        sys.exit(1)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    selectors = subparsers.add_parser(
+        "selectors",
+        help="repeated soup.find_all calls vs the single-pass extraction plan",
+    )
+    selectors.add_argument("categories", nargs="*", default=["stay", "do"])
+    selectors.add_argument("--limit", type=int, help="pages per category")
+    selectors.add_argument("--repeat", type=int, default=3)
+    selectors.set_defaults(run=bench_selectors)
+
+    lazy_dom = subparsers.add_parser(
+        "lazy-dom",
+        help='"embedded_state" extraction of pages with and without a DOM to read',
+    )
+    lazy_dom.add_argument("categories", nargs="*", default=["eat", "do"])
+    lazy_dom.add_argument("--pages", type=int, default=500, help="per category")
+    lazy_dom.add_argument("--page-kb", type=float, default=32)
+    lazy_dom.add_argument("--backend", default="html.parser", choices=BACKENDS)
+    lazy_dom.add_argument("--repeat", type=int, default=3)
+    lazy_dom.set_defaults(run=bench_lazy_dom)
+
+    backends = subparsers.add_parser(
+        "backends",
+        help="field conformance and per-page parse time of each parser backend",
+    )
+    backends.add_argument("categories", nargs="*", default=["stay", "do"])
+    backends.add_argument("--limit", type=int, help="pages per category")
+    backends.add_argument("--repeat", type=int, default=3)
+    backends.set_defaults(run=bench_backends)
+
+    mariadb = subparsers.add_parser(
+        "mariadb", help="row-by-row INSERT vs the bulk load methods"
+    )
+    mariadb.add_argument("--rows", type=int, default=10000)
+    mariadb.add_argument("--batch-size", type=int, default=1000)
+    mariadb.add_argument("--commit-interval", type=int, default=10000)
+    mariadb.add_argument("--methods", nargs="+", default=["executemany", "load_data"])
+    mariadb.set_defaults(run=bench_mariadb)
+
+    queries = subparsers.add_parser(
+        "queries", help="radius and keyword lookups, inferred vs typed schema"
+    )
+    queries.add_argument("--rows", type=int, default=100000)
+    queries.add_argument("--queries", type=int, default=200)
+    queries.add_argument("--radius", type=float, default=1.0, help="km")
+    queries.add_argument("--seed", type=int, default=0)
+    queries.set_defaults(run=bench_queries)
+
+    weaviate_parser = subparsers.add_parser(
+        "weaviate", help="per-object inserts vs batched Weaviate ingestion"
+    )
+    weaviate_parser.add_argument("--objects", type=int, default=10000)
+    weaviate_parser.add_argument("--host", default="127.0.0.1")
+    weaviate_parser.add_argument("--port", type=int, default=8080)
+    weaviate_parser.add_argument("--grpc-port", type=int, default=50051)
+    weaviate_parser.add_argument("--batch-size", type=int, default=100)
+    weaviate_parser.add_argument("--concurrent-requests", type=int, default=2)
+    weaviate_parser.add_argument(
+        "--modes", nargs="+", default=["single", "fixed", "dynamic"]
+    )
+    weaviate_parser.set_defaults(run=bench_weaviate)
+
+    fetch = subparsers.add_parser(
+        "fetch", help="async fetcher against a local HTTP stand-in, cold and 304"
+    )
+    fetch.add_argument("categories", nargs="*", default=["stay", "do"])
+    fetch.add_argument("--limit", type=int, help="pages per category")
+    fetch.add_argument("--concurrency", type=int, default=8)
+    fetch.add_argument("--per-host", type=int, default=4)
+    fetch.add_argument("--rate", type=float, default=0, help="requests/sec, 0 = off")
+    fetch.add_argument(
+        "--fail-every", type=int, default=0, help="fail every Nth page once with a 503"
+    )
+    fetch.set_defaults(run=bench_fetch)
+
+    geo = subparsers.add_parser(
+        "geo", help="spatial index build, k-nearest, radius and batch nearby times"
+    )
+    geo.add_argument("--places", type=int, default=100000)
+    geo.add_argument("--queries", type=int, default=1000)
+    geo.add_argument("--check", type=int, default=100, help="queries brute-forced")
+    geo.add_argument("--k", type=int, default=10)
+    geo.add_argument("--radius", type=float, default=1.0, help="km")
+    geo.add_argument("--cell-degrees", type=float, default=0.005)
+    geo.add_argument("--repeat", type=int, default=3)
+    geo.add_argument("--seed", type=int, default=0)
+    geo.set_defaults(run=bench_geo)
+
+    recommend_parser = subparsers.add_parser(
+        "recommend", help="recommendation query latency on synthetic places"
+    )
+    recommend_parser.add_argument("--places", type=int, default=100000)
+    recommend_parser.add_argument("--queries", type=int, default=1000)
+    recommend_parser.add_argument("-k", type=int, default=10)
+    recommend_parser.add_argument("--radius", type=float, default=2.0, help="km")
+    recommend_parser.add_argument("--seed", type=int, default=0)
+    recommend_parser.set_defaults(run=bench_recommend)
+
+    passages_parser = subparsers.add_parser(
+        "passages", help="retrieval recall per embedded token, places vs passages"
+    )
+    passages_parser.add_argument("--places", type=int, default=2000)
+    passages_parser.add_argument("--reviews", type=int, default=20)
+    passages_parser.add_argument("--review-words", type=int, default=30)
+    passages_parser.add_argument("--queries", type=int, default=1000)
+    passages_parser.add_argument("--query-words", type=int, default=4)
+    passages_parser.add_argument("-k", type=int, default=10)
+    passages_parser.add_argument("--passage-tokens", type=int, default=128)
+    passages_parser.add_argument(
+        "--model-tokens", type=int, default=256, help="embedding input limit"
+    )
+    passages_parser.add_argument("--batch-size", type=int, default=64)
+    passages_parser.add_argument("--seed", type=int, default=0)
+    passages_parser.set_defaults(run=bench_passages)
+
+    columns = subparsers.add_parser(
+        "columns", help="JSON vs columnar extraction output, size and load time"
+    )
+    columns.add_argument("--places", type=int, default=100000)
+    columns.add_argument("--repeat", type=int, default=3)
+    columns.set_defaults(run=bench_columns)
+
+    pipeline = subparsers.add_parser(
+        "pipeline",
+        help="end-to-end stage timings on synthetic pages, with a result history",
+    )
+    pipeline.add_argument("--pages", type=int, nargs="+", default=[1000, 10000, 100000])
+    pipeline.add_argument("--categories", nargs="+", default=["eat", "stay", "do"])
+    pipeline.add_argument(
+        "--stages", nargs="+", choices=PIPELINE_STAGES, default=list(PIPELINE_STAGES)
+    )
+    pipeline.add_argument("--page-kb", type=float, default=32)
+    pipeline.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    pipeline.add_argument(
+        "--output-format", default="json", choices=("json", "jsonl", "columns")
+    )
+    pipeline.add_argument(
+        "--extraction-mode", default="dom", choices=("dom", "embedded_state")
+    )
+    pipeline.add_argument(
+        "--saved-pages",
+        type=int,
+        default=100,
+        help="saved pages per category checked against the DOM extraction",
+    )
+    pipeline.add_argument(
+        "--db-connections",
+        type=int,
+        default=4,
+        help="tables loaded into MariaDB at once",
+    )
+    pipeline.add_argument("--host", default="127.0.0.1", help="local Weaviate")
+    pipeline.add_argument("--port", type=int, default=8080)
+    pipeline.add_argument("--grpc-port", type=int, default=50051)
+    pipeline.add_argument("--directory", help="where the pages are generated")
+    pipeline.add_argument("--results", default=BENCHMARK_RESULTS_FILE)
+    pipeline.add_argument(
+        "--profile",
+        default="",
+        metavar="FILE",
+        help="profile the extract stage per field, appending the summary to FILE",
+    )
+    pipeline.add_argument(
+        "--tolerance", type=float, default=0.15, help="slowdown flagged, 0.15 = 15%%"
+    )
+    pipeline.add_argument("--fail-on-regression", action="store_true")
+    pipeline.add_argument("--seed", type=int, default=0)
+    pipeline.set_defaults(run=bench_pipeline)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
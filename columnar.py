@@ -0,0 +1,290 @@
+"""Columnar on-disk layout for extracted places, loadable by memory map.
+
+A table is a `<name>.columns` directory with a schema.json and one set of
+files per column:
+
+- "float64": `<column>.npy`, NaN for missing values (coordinates)
+- "int64": `<column>.npy` plus a `<column>.valid.npy` mask (durations)
+- "time": `<column>.npy` of int32 seconds since midnight, -1 when missing
+- "text": `<column>.bin` (UTF-8 values back to back), `<column>.offsets.npy`
+  (rows + 1 int64 offsets into it) and `<column>.kinds.npy` (one byte per
+  row: missing, a plain string, or JSON for lists, dicts and other values)
+
+Every file is a plain .npy or byte blob, so a reader maps only the columns it
+asks for and decodes only the rows it touches.
+
+A column holding only ints stays int64. One mixing ints and floats is
+float64, so its ints come back as floats (4 as 4.0); if one of its ints is
+too large for a float64 to hold exactly, the column is text instead.
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+from array import array
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+COLUMNS_SUFFIX = ".columns"
+# Only the zero-padded form round-trips through seconds since midnight
+TIME_PATTERN = r"^\d{2}:[0-5]\d:[0-5]\d$"
+# Text column row kinds
+MISSING, STRING, JSON = 0, 1, 2
+# Largest int magnitude a float64 holds exactly
+FLOAT64_EXACT_INT = 2**53
+
+
+def value_kind(key, value):
+    """Return the narrowest column type that can hold `value`."""
+    if isinstance(value, bool):
+        return "text"
+    if isinstance(value, int):
+        return "int64" if -(2**63) <= value < 2**63 else "text"
+    if isinstance(value, float):
+        return "float64"
+    if key.endswith("_time") and isinstance(value, str):
+        return "time" if re.match(TIME_PATTERN, value) else "text"
+    return "text"
+
+
+def time_to_seconds(value):
+    hours, minutes, seconds = value.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def seconds_to_time(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class _TextWriter:
+    # Appends a text column's values straight to its blob
+    def __init__(self, base):
+        self.base = base
+        self.file = open(f"{base}.bin", "wb")
+        self.offsets = array("q", [0])
+        self.kinds = bytearray()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, value):
+        if value is None:
+            self.kinds.append(MISSING)
+            self.offsets.append(self.offsets[-1])
+            return True
+        if isinstance(value, str):
+            self.kinds.append(STRING)
+        else:
+            self.kinds.append(JSON)
+            value = json.dumps(value, ensure_ascii=False)
+        self.offsets.append(self.offsets[-1] + self.file.write(value.encode()))
+        return True
+
+    def close(self):
+        self.file.close()
+        np.save(f"{self.base}.offsets.npy", np.frombuffer(self.offsets, np.int64))
+        np.save(f"{self.base}.kinds.npy", np.frombuffer(self.kinds, np.uint8))
+        return "text"
+
+
+class _TypedWriter:
+    # Buffers a numeric or time column until its type is settled; these
+    # values are small next to the text columns
+    def __init__(self, key, base):
+        self.key = key
+        self.base = base
+        self.kind = None
+        self.values = []
+        self.largest_int = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value):
+        """Add `value`; False when it needs the column to become text."""
+        if value is not None:
+            kind = value_kind(self.key, value)
+            if kind == "text" or (
+                self.kind not in (None, kind)
+                and {kind, self.kind} != {"int64", "float64"}
+            ):
+                return False
+            if kind == "int64":
+                self.largest_int = max(self.largest_int, abs(value))
+            kind = "float64" if self.kind == "float64" else kind
+            # Ints promoted to float64 must survive the round trip
+            if kind == "float64" and self.largest_int > FLOAT64_EXACT_INT:
+                return False
+            self.kind = kind
+        self.values.append(value)
+        return True
+
+    def to_text(self):
+        writer = _TextWriter(self.base)
+        for value in self.values:
+            writer.append(value)
+        return writer
+
+    def close(self):
+        if self.kind is None:
+            # Always null: an all-missing text column
+            return self.to_text().close()
+        if self.kind == "float64":
+            values = [np.nan if value is None else value for value in self.values]
+            dtype = np.float64
+        elif self.kind == "time":
+            values = [
+                -1 if value is None else time_to_seconds(value) for value in self.values
+            ]
+            dtype = np.int32
+        else:
+            values = [0 if value is None else value for value in self.values]
+            dtype = np.int64
+            valid = [value is not None for value in self.values]
+            np.save(f"{self.base}.valid.npy", np.array(valid, dtype=bool))
+        np.save(f"{self.base}.npy", np.array(values, dtype=dtype))
+        return self.kind
+
+
+def write_columns(records, output_directory):
+    """Write `records` as a columnar table; return the number of rows.
+
+    Records are consumed in one pass, so a generator works: text goes straight
+    to disk and only the numeric columns are held until the end. The table
+    only replaces `output_directory` once every column is written.
+    """
+    parent = os.path.dirname(os.path.abspath(output_directory))
+    tmp_directory = tempfile.mkdtemp(dir=parent, prefix=".columns-")
+    columns = {}
+    rows = 0
+    try:
+        for record in records:
+            for key, value in record.items():
+                column = columns.get(key)
+                if column is None:
+                    base = os.path.join(tmp_directory, key)
+                    column = columns[key] = _TypedWriter(key, base)
+                # Earlier rows without this key hold a missing value
+                while len(column) < rows:
+                    column.append(None)
+                if not column.append(value):
+                    column = columns[key] = column.to_text()
+                    column.append(value)
+            rows += 1
+
+        schema = []
+        for key, column in columns.items():
+            while len(column) < rows:
+                column.append(None)
+            schema.append({"name": key, "type": column.close()})
+    except BaseException:
+        for column in columns.values():
+            if isinstance(column, _TextWriter):
+                column.file.close()
+        shutil.rmtree(tmp_directory)
+        raise
+
+    with open(os.path.join(tmp_directory, SCHEMA_FILE), "w", encoding="utf-8") as file:
+        json.dump({"rows": rows, "columns": schema}, file, indent=4)
+    if os.path.isdir(output_directory):
+        shutil.rmtree(output_directory)
+    os.replace(tmp_directory, output_directory)
+    return rows
+
+
+class TextColumn:
+    """Lazily decoded text values over a memory-mapped blob."""
+
+    def __init__(self, base):
+        self.offsets = np.load(f"{base}.offsets.npy", mmap_mode="r")
+        self.kinds = np.load(f"{base}.kinds.npy", mmap_mode="r")
+        # np.memmap can't map an empty file
+        size = self.offsets[-1]
+        self.blob = np.memmap(f"{base}.bin", np.uint8, "r") if size else b""
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def valid(self):
+        return self.kinds != MISSING
+
+    def __getitem__(self, row):
+        kind = self.kinds[row]
+        if kind == MISSING:
+            return None
+        text = bytes(self.blob[self.offsets[row] : self.offsets[row + 1]]).decode()
+        return json.loads(text) if kind == JSON else text
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+class ColumnarTable:
+    """Read side of write_columns; columns are mapped on first access."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, SCHEMA_FILE), "r", encoding="utf-8") as file:
+            schema = json.load(file)
+        self.rows = schema["rows"]
+        self.types = {column["name"]: column["type"] for column in schema["columns"]}
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, f"{name}{suffix}")
+
+    def column(self, name):
+        """Return a column: a read-only memory-mapped array, or a TextColumn.
+
+        Float columns hold NaN and time columns -1 (seconds since midnight)
+        where the value is missing; see valid() for int64 columns.
+        """
+        if name not in self.types:
+            raise KeyError(f"No column '{name}' in '{self.directory}'")
+        if name not in self._columns:
+            if self.types[name] == "text":
+                self._columns[name] = TextColumn(self._path(name, ""))
+            else:
+                self._columns[name] = np.load(self._path(name, ".npy"), mmap_mode="r")
+        return self._columns[name]
+
+    def valid(self, name):
+        """Boolean mask of the rows where a column has a value."""
+        kind = self.types[name]
+        if kind == "int64":
+            return np.load(self._path(name, ".valid.npy"), mmap_mode="r")
+        column = self.column(name)
+        if kind == "text":
+            return column.valid
+        return ~np.isnan(column) if kind == "float64" else column >= 0
+
+    def values(self, name):
+        """Return a column as a list of the original values, None where missing."""
+        kind = self.types[name]
+        if kind == "text":
+            return list(self.column(name))
+        valid = self.valid(name).tolist()
+        values = self.column(name).tolist()
+        if kind == "time":
+            return [
+                seconds_to_time(value) if present else None
+                for value, present in zip(values, valid)
+            ]
+        return [value if present else None for value, present in zip(values, valid)]
+
+    def records(self, columns=None):
+        """Rebuild the records, with only `columns` (missing names skipped).
+
+        Keys that were absent from a record come back as None.
+        """
+        names = [name for name in (columns or self.types) if name in self.types]
+        if not names:
+            return [{} for _ in range(self.rows)]
+        values = [self.values(name) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
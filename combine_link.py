@@ -1,10 +1,20 @@
 import os
-from bs4 import BeautifulSoup
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+from html_backend import DEFAULT_BACKEND, make_soup
 
-def extract_links_from_html(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
+BASE_URL = 'https://www.tripadvisor.com/'
+LISTING_CLASS = 'kgrOn o'
+# Every TripAdvisor place page carries its location ID as "-d<id>-" in the path
+LOCATION_KEY_PATTERN = r'-d(\d+)-'
+CATEGORIES = ('eat', 'stay', 'do')
+FRONTIER_FILE = 'combine.txt'
+
+def extract_links_from_html(html_content, parser_backend=DEFAULT_BACKEND):
+    soup = make_soup(html_content, parser_backend)
     # Find all <a> elements within divs that have class "kgrOn o"
-    elements = soup.find_all("div", class_="kgrOn o")
+    elements = soup.find_all("div", class_=LISTING_CLASS)
     links = []
     for element in elements:
         link_tag = element.find("a", href=True)
@@ -13,28 +23,78 @@ def extract_links_from_html(html_content):
             links.append(link_tag['href'].strip())
     return links
 
-def extract_links_from_files(directory):
-    all_links = []
-    # Iterate through all .txt files in the given directory
-    for filename in os.listdir(directory):
-        if filename.endswith('.txt'):
-            filepath = os.path.join(directory, filename)
-            with open(filepath, 'r', encoding='utf-8') as file:
-                content = file.read()
-                links = extract_links_from_html(content)
-                all_links.extend(links)
-    return all_links
-
-def write_links_to_file(links, output_file):
-    with open(output_file, 'w', encoding='utf-8') as file:
+def extract_links_from_file(filepath):
+    # Runs inside a worker process
+    with open(filepath, 'r', encoding='utf-8') as file:
+        return extract_links_from_html(file.read())
+
+def normalise_url(href):
+    """Return the absolute https URL of a listing href, without query or fragment."""
+    parts = urlsplit(href.strip())
+    # The old harvester wrote BASE_URL + href, so relative hrefs became "//Hotel_Review-..."
+    path = re.sub(r'/{2,}', '/', '/' + parts.path.lstrip('/'))
+    host = (parts.netloc or urlsplit(BASE_URL).netloc).lower()
+    return urlunsplit(('https', host, path, '', ''))
+
+def location_key(url):
+    """Return the "d<id>" key of a place URL, or the URL itself when it has none."""
+    match = re.search(LOCATION_KEY_PATTERN, url)
+    return f'd{match.group(1)}' if match else url
+
+def listing_files(directory):
+    # Every .txt listing page, except the frontier written next to them
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if filename.endswith('.txt') and filename != FRONTIER_FILE
+    ]
+
+def load_frontier(frontier_file):
+    """Return the location keys of the URLs already in a frontier file."""
+    if not os.path.exists(frontier_file):
+        return set()
+    with open(frontier_file, 'r', encoding='utf-8') as file:
+        return {location_key(normalise_url(line)) for line in file if line.strip()}
+
+def append_links_to_file(links, output_file):
+    with open(output_file, 'a', encoding='utf-8') as file:
         for link in links:
-            file.write("https://www.tripadvisor.com/" + link + '\n')
+            file.write(link + '\n')
+
+def harvest_links(categories=CATEGORIES, workers=None):
+    """Append the new place URLs of each category's listing pages to its frontier.
+
+    Listing pages are parsed in parallel. URLs are deduplicated by location key
+    within a category, across categories and against every existing frontier,
+    so a re-crawl only fetches places no list has yet.
+    """
+    directories = {category: os.path.join(category, 'links') for category in categories}
+    seen = set()
+    for directory in directories.values():
+        seen |= load_frontier(os.path.join(directory, FRONTIER_FILE))
 
-# Example usage
-directory_path = 'do\\links'  # Replace with the path to your .txt files
-output_file_path = 'combine.txt'  # The output file to store the links
+    files = {category: listing_files(directory) for category, directory in directories.items()}
+    all_files = [filepath for category in categories for filepath in files[category]]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        links_per_file = dict(zip(all_files, executor.map(extract_links_from_file, all_files)))
 
-extracted_links = extract_links_from_files(directory_path)
-write_links_to_file(extracted_links, directory_path + "\\" + output_file_path)
+    for category in categories:
+        new_links = []
+        found = 0
+        for filepath in files[category]:
+            for href in links_per_file[filepath]:
+                found += 1
+                url = normalise_url(href)
+                key = location_key(url)
+                if key not in seen:
+                    seen.add(key)
+                    new_links.append(url)
+        output_file = os.path.join(directories[category], FRONTIER_FILE)
+        append_links_to_file(new_links, output_file)
+        print(f"{category}: {found} links in {len(files[category])} pages, "
+              f"{len(new_links)} new appended to {output_file}")
 
-print(f"All links have been written to {output_file_path}")
+if __name__ == '__main__':
+    harvest_links()
@@ -0,0 +1,155 @@
+"""Local text embeddings with an on-disk cache, for loading Weaviate without a
+vectorizer module.
+
+Providers are looked up by name in EMBEDDING_PROVIDERS:
+
+- "sentence-transformers": a sentence-transformers model run on the CPU
+  (EMBEDDING_MODEL, default all-MiniLM-L6-v2)
+- "hashing": a dependency-free hashed bag-of-words embedding, for offline
+  runs and benchmarks
+
+Vectors are cached in SQLite keyed by the SHA-256 of the model id and the
+text, so re-loading unchanged places never re-encodes them.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import numpy as np
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "sentence-transformers")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE", "embedding_cache.sqlite")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class SentenceTransformerProvider:
+    """Any sentence-transformers model, encoding on the CPU."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The sentence-transformers provider needs "
+                "`pip install sentence-transformers`"
+            ) from e
+        self.model_id = f"sentence-transformers/{model_name}"
+        self._model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts, batch_size=EMBEDDING_BATCH_SIZE):
+        vectors = self._model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return vectors.astype(np.float32)
+
+
+class HashingProvider:
+    """Signed feature hashing of lower-cased word tokens, L2-normalised."""
+
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+        self.model_id = f"hashing/{dimensions}"
+
+    def encode(self, texts, batch_size=EMBEDDING_BATCH_SIZE):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8)
+                value = int.from_bytes(digest.digest(), "little")
+                sign = 1.0 if value >> 63 else -1.0
+                vectors[row, value % self.dimensions] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+EMBEDDING_PROVIDERS = {
+    "sentence-transformers": SentenceTransformerProvider,
+    "hashing": HashingProvider,
+}
+
+
+def get_provider(name=EMBEDDING_PROVIDER):
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(
+            f"Unknown embedding provider '{name}', "
+            f"use one of {tuple(EMBEDDING_PROVIDERS)}"
+        )
+    return EMBEDDING_PROVIDERS[name]()
+
+
+def content_key(model_id, text):
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """float32 vectors in a SQLite file, keyed by content_key."""
+
+    # SQLite limits the number of parameters in one statement
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path=EMBEDDING_CACHE_FILE):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), self.LOOKUP_CHUNK):
+            chunk = keys[start : start + self.LOOKUP_CHUNK]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                chunk,
+            )
+            for key, vector in rows:
+                found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [
+                (key, np.asarray(vector, dtype=np.float32).tobytes())
+                for key, vector in items
+            ],
+        )
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def embed_texts(texts, provider, cache=None, batch_size=EMBEDDING_BATCH_SIZE):
+    """Return (vectors, cache hits) for `texts`, encoding only uncached ones.
+
+    Texts are encoded in batches of `batch_size`; duplicates within one call
+    are encoded once.
+    """
+    keys = [content_key(provider.model_id, text) for text in texts]
+    vectors = cache.get_many(set(keys)) if cache is not None else {}
+    hits = sum(1 for key in keys if key in vectors)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    missing_keys = list(missing)
+    for start in range(0, len(missing_keys), batch_size):
+        batch_keys = missing_keys[start : start + batch_size]
+        encoded = provider.encode([missing[key] for key in batch_keys], batch_size)
+        vectors.update(zip(batch_keys, encoded))
+        if cache is not None:
+            cache.put_many(zip(batch_keys, encoded))
+
+    return [vectors[key] for key in keys], hits
@@ -0,0 +1,94 @@
+"""On-disk cache of page classifications for 2.extract_all.py.
+
+Entries are keyed by the SHA-256 of the extractor version, the category
+settings and the raw page HTML, so a page is only parsed again when its
+content or the extraction code changes. The cache is a SQLite file kept under
+a size bound by evicting the least recently used entries.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+EXTRACTION_CACHE_FILE = os.getenv("EXTRACTION_CACHE", "extraction_cache.sqlite")
+EXTRACTION_CACHE_MAX_BYTES = int(
+    os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
+
+class ExtractionCache:
+    def __init__(
+        self, path=EXTRACTION_CACHE_FILE, max_bytes=EXTRACTION_CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, fields TEXT, size INTEGER, last_used REAL)"
+        )
+
+    @staticmethod
+    def key(html_content, settings):
+        digest = hashlib.sha256(json.dumps(settings).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(html_content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        row = self._connection.execute(
+            "SELECT fields FROM pages WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._connection.execute(
+            "UPDATE pages SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        return json.loads(row[0])
+
+    def put(self, key, fields):
+        value = json.dumps(fields, ensure_ascii=False)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages (key, fields, size, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time()),
+        )
+
+    def commit(self):
+        """Evict least recently used entries above max_bytes, then commit."""
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()[0]
+        if total > self.max_bytes:
+            evict = []
+            for key, size in self._connection.execute(
+                "SELECT key, size FROM pages ORDER BY last_used"
+            ):
+                if total <= self.max_bytes:
+                    break
+                evict.append((key,))
+                total -= size
+            self._connection.executemany("DELETE FROM pages WHERE key = ?", evict)
+            self.evicted += len(evict)
+        self._connection.commit()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        return (
+            f"Extraction cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate():.1%} hit rate), {self.evicted} evicted"
+        )
+
+    def close(self):
+        self.commit()
+        self._connection.close()
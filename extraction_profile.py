@@ -0,0 +1,151 @@
+"""Opt-in profile of where 2.extract_all.py spends its time per page.
+
+classify_page calls `lap(key, hit)` after each step; the time since the
+previous lap goes to `key`. Keys are "<field>/<tier>" for the fallback tiers
+of a field (e.g. "about_and_tags/ui_columns") or a bare step ("parse",
+"walk"), and `hit` records whether the tier found its value. The share of
+each field is the sum of its tiers. Selector buckets are counted as hits or
+misses too, so unused selectors and fallbacks that never fire show up.
+
+Enabled with EXTRACTION_PROFILE=<file>: process_files prints the summary and
+appends it to the file as one JSON object per run.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+
+EXTRACTION_PROFILE_FILE = os.getenv("EXTRACTION_PROFILE", "")
+
+
+class ExtractionProfile:
+    """Wall time, calls and hits/misses per extraction step and selector."""
+
+    def __init__(self):
+        self.pages = 0
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.selector_hits = Counter()
+        self.selector_misses = Counter()
+        self._last = None
+
+    def start(self):
+        self.pages += 1
+        self._last = time.perf_counter()
+
+    def lap(self, key, hit=None):
+        now = time.perf_counter()
+        self.seconds[key] += now - self._last
+        self.calls[key] += 1
+        self._last = now
+        if hit is not None:
+            (self.hits if hit else self.misses)[key] += 1
+
+    def count_selectors(self, buckets, plan):
+        for selector in plan:
+            if buckets[selector]:
+                self.selector_hits[selector] += 1
+            else:
+                self.selector_misses[selector] += 1
+
+    def update(self, other):
+        self.pages += other.pages
+        for name in (
+            "seconds",
+            "calls",
+            "hits",
+            "misses",
+            "selector_hits",
+            "selector_misses",
+        ):
+            getattr(self, name).update(getattr(other, name))
+
+    def summary(self):
+        """Return the profile as a JSON-serialisable dict, slowest first."""
+        field_seconds = Counter()
+        for key, seconds in self.seconds.items():
+            field_seconds[key.split("/")[0]] += seconds
+        total = sum(field_seconds.values())
+        pages = self.pages or 1
+        return {
+            "pages": self.pages,
+            "seconds": round(total, 6),
+            "fields": {
+                field: {
+                    "seconds": round(seconds, 6),
+                    "ms_per_page": round(seconds * 1000 / pages, 4),
+                    "share": round(seconds / total, 4) if total else 0.0,
+                }
+                for field, seconds in field_seconds.most_common()
+            },
+            "tiers": {
+                key: {
+                    "calls": self.calls[key],
+                    "hits": self.hits[key],
+                    "misses": self.misses[key],
+                    "seconds": round(self.seconds[key], 6),
+                    "ms_per_call": round(self.seconds[key] * 1000 / self.calls[key], 4),
+                }
+                for key in sorted(self.calls)
+                if "/" in key
+            },
+            "selectors": {
+                selector: {
+                    "hits": self.selector_hits[selector],
+                    "misses": self.selector_misses[selector],
+                }
+                for selector in sorted(
+                    self.selector_hits.keys() | self.selector_misses.keys()
+                )
+            },
+        }
+
+
+class _NoProfile:
+    # Stands in for a profile when profiling is off, so classify_page needs
+    # no checks around its laps
+    def start(self):
+        pass
+
+    def lap(self, key, hit=None):
+        pass
+
+    def count_selectors(self, buckets, plan):
+        pass
+
+
+NO_PROFILE = _NoProfile()
+
+
+def print_profile_report(summary, label="Extraction profile"):
+    print(
+        f"{label}: {summary['pages']} pages, "
+        f"{summary['seconds'] * 1000 / (summary['pages'] or 1):.2f} ms per page"
+    )
+    for field, entry in summary["fields"].items():
+        print(
+            f"  {field:<28} {entry['ms_per_page']:>9.3f} ms/page "
+            f"{entry['share']:>7.1%}"
+        )
+    print(f"  {'tier':<28} {'calls':>8} {'hits':>8} {'misses':>8} {'ms/call':>9}")
+    for key, entry in summary["tiers"].items():
+        if entry["hits"] or entry["misses"]:
+            hits, misses = str(entry["hits"]), str(entry["misses"])
+        else:
+            hits = misses = "-"
+        print(
+            f"  {key:<28} {entry['calls']:>8} {hits:>8} {misses:>8} "
+            f"{entry['ms_per_call']:>9.3f}"
+        )
+    print(f"  {'selector':<28} {'hits':>8} {'misses':>8}")
+    for selector, entry in summary["selectors"].items():
+        print(f"  {selector:<28} {entry['hits']:>8} {entry['misses']:>8}")
+
+
+def append_profile(summary, profile_file, **run):
+    """Append `summary`, with the `run` settings, to a JSON lines file."""
+    with open(profile_file, "a", encoding="utf-8") as file:
+        file.write(json.dumps({**run, **summary}) + "\n")
@@ -0,0 +1,372 @@
+"""In-memory spatial index over the extracted places.
+
+Places are bucketed into a grid of `cell_degrees` cells (a geohash-style
+grid: one sorted int64 cell key per place), and distances are vectorised
+haversine over the candidate cells only. That answers k-nearest and
+within-radius queries without scanning every place, and recomputes the
+`nearby_<category>1..3` fields of a whole dataset from coordinates instead
+of the scraped "Best nearby" blocks. Only the nearby fields a category
+already has are rewritten, so the extract_json schema is unchanged.
+
+The grid does not wrap around the antimeridian, which is fine for a
+dataset of one region.
+
+Three scripts rewrite the extract_json output in place, between
+2.extract_all.py and the loaders, and must run in this order:
+
+1. review_dedup.py drops duplicate reviews (it only touches `reviews`)
+2. geo_index.py (optional) rewrites the nearby fields with the names of the
+   nearest places
+3. name_index.py turns the nearby names into place IDs and writes
+   nearby_edges/ from them
+
+Once name_index.py has run, rewriting the nearby fields would leave
+nearby_edges/ describing other places, so geo_index.py refuses to run on
+output whose nearby fields already hold place IDs (re-run 2.extract_all.py
+to start over).
+"""
+
+import glob
+import json
+import os
+import re
+import numpy as np
+from columnar import COLUMNS_SUFFIX, ColumnarTable, write_columns
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+DEFAULT_CELL_DEGREES = 0.005
+# Category directory -> field prefix, e.g. "stay" -> accommodation_name
+CATEGORY_PREFIXES = {"eat": "foodAndDrink", "stay": "accommodation", "do": "activity"}
+NEARBY_COUNT = 3
+NEARBY_FIELD_PATTERN = r"^nearby_(foodAndDrink|accommodation|activity)(\d+)$"
+# Offsets between the two halves of a cell key; far above any cell index
+_CELL_KEY_SHIFT = 1 << 32
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km; arguments broadcast like NumPy arrays."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeoIndex:
+    """Grid index over one set of coordinates; results are positions in it."""
+
+    def __init__(self, latitudes, longitudes, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_degrees = cell_degrees
+        rows, columns = self._cells(self.latitudes, self.longitudes)
+        keys = self._keys(rows, columns)
+        # Rings are clipped to the cells that hold places
+        self._row_range = (rows.min(), rows.max()) if len(rows) else (0, -1)
+        self._column_range = (columns.min(), columns.max()) if len(rows) else (0, -1)
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+        # The occupied cells, for rings larger than the number of them
+        cell_keys, starts = np.unique(self._sorted_keys, return_index=True)
+        self._cell_rows, self._cell_columns = np.divmod(cell_keys, _CELL_KEY_SHIFT)
+        self._cell_starts = starts
+        self._cell_ends = np.append(starts[1:], len(keys))
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _cells(self, latitudes, longitudes):
+        rows = np.floor((np.asarray(latitudes) + 90) / self.cell_degrees)
+        columns = np.floor((np.asarray(longitudes) + 180) / self.cell_degrees)
+        return rows.astype(np.int64), columns.astype(np.int64)
+
+    @staticmethod
+    def _keys(rows, columns):
+        return rows * _CELL_KEY_SHIFT + columns
+
+    def _ring_members(self, row, column, radius):
+        # Positions of the places in the (2 * radius + 1)^2 cells around a cell
+        ring_rows = np.arange(
+            max(row - radius, self._row_range[0]),
+            min(row + radius, self._row_range[1]) + 1,
+        )
+        ring_columns = np.arange(
+            max(column - radius, self._column_range[0]),
+            min(column + radius, self._column_range[1]) + 1,
+        )
+        if len(ring_rows) * len(ring_columns) > len(self._cell_starts):
+            # A wide ring over sparse places (an outlier far from the rest):
+            # filter the occupied cells instead of listing every ring cell
+            inside = (
+                (self._cell_rows >= ring_rows[0])
+                & (self._cell_rows <= ring_rows[-1])
+                & (self._cell_columns >= ring_columns[0])
+                & (self._cell_columns <= ring_columns[-1])
+            )
+            starts, ends = self._cell_starts[inside], self._cell_ends[inside]
+        else:
+            keys = self._keys(ring_rows[:, None], ring_columns[None, :]).ravel()
+            starts = np.searchsorted(self._sorted_keys, keys, "left")
+            ends = np.searchsorted(self._sorted_keys, keys, "right")
+            occupied = ends > starts
+            starts, ends = starts[occupied], ends[occupied]
+        if not len(starts):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._order[s:e] for s, e in zip(starts, ends)])
+
+    def _covered_km(self, latitude, radius):
+        # Every place outside the ring is at least this far from a query in its
+        # centre cell; longitude cells narrow towards the poles
+        reach = radius * self.cell_degrees
+        poleward = min(89.9, abs(latitude) + reach + self.cell_degrees)
+        return reach * KM_PER_DEGREE * min(1.0, np.cos(np.radians(poleward)))
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Return (positions, distances in km) within `radius_km`, nearest first."""
+        row, column = self._cells(latitude, longitude)
+        reach = 1
+        while self._covered_km(latitude, reach) < radius_km:
+            reach += 1
+        candidates = self._ring_members(row, column, reach)
+        distances = haversine_km(
+            latitude,
+            longitude,
+            self.latitudes[candidates],
+            self.longitudes[candidates],
+        )
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, latitude, longitude, k, exclude=None):
+        """Return (positions, distances in km) of the `k` nearest places.
+
+        `exclude` is a position left out of the result, e.g. the query place.
+        """
+        wanted = min(k, len(self) - (exclude is not None))
+        if wanted <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        row, column = self._cells(latitude, longitude)
+        reach = 1
+        while True:
+            candidates = self._ring_members(row, column, reach)
+            if exclude is not None:
+                candidates = candidates[candidates != exclude]
+            if len(candidates) >= wanted:
+                distances = haversine_km(
+                    latitude,
+                    longitude,
+                    self.latitudes[candidates],
+                    self.longitudes[candidates],
+                )
+                nearest = np.argpartition(distances, wanted - 1)[:wanted]
+                nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+                # Done once nothing outside the ring can be closer than the kth
+                complete = len(candidates) == len(self) - (exclude is not None)
+                if complete or distances[nearest[-1]] <= self._covered_km(
+                    latitude, reach
+                ):
+                    return candidates[nearest], distances[nearest]
+            reach *= 2
+
+    def batch_nearest(self, latitudes, longitudes, k, exclude=None):
+        """k nearest places of many queries at once, as (positions, distances).
+
+        Both results have shape (queries, k); rows with fewer than k places
+        are padded with -1 and inf. `exclude[i]` (or -1) is a position left
+        out of query i's result.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        positions = np.full((len(latitudes), k), -1, dtype=np.int64)
+        distances = np.full((len(latitudes), k), np.inf)
+        if exclude is None:
+            exclude = np.full(len(latitudes), -1, dtype=np.int64)
+        rows, columns = self._cells(latitudes, longitudes)
+        query_keys = self._keys(rows, columns)
+        # Queries in the same cell share one candidate set and one distance matrix
+        by_cell = np.argsort(query_keys, kind="stable")
+        boundaries = np.flatnonzero(np.diff(query_keys[by_cell])) + 1
+        for queries in np.split(by_cell, boundaries):
+            row, column = rows[queries[0]], columns[queries[0]]
+            poleward = np.abs(latitudes[queries]).max()
+            reach = 1
+            while True:
+                candidates = self._ring_members(row, column, reach)
+                matrix = haversine_km(
+                    latitudes[queries, None],
+                    longitudes[queries, None],
+                    self.latitudes[candidates][None, :],
+                    self.longitudes[candidates][None, :],
+                )
+                # Excluded candidates get an infinite distance, so they sort last
+                matrix[candidates[None, :] == exclude[queries, None]] = np.inf
+                # One spare column in case a query's excluded place is among them
+                wanted = min(k + 1, len(candidates))
+                nearest = np.argpartition(matrix, wanted - 1, axis=1)[:, :wanted]
+                found = np.take_along_axis(matrix, nearest, axis=1)
+                order = np.argsort(found, axis=1, kind="stable")[:, :k]
+                nearest = np.take_along_axis(nearest, order, axis=1)
+                found = np.take_along_axis(found, order, axis=1)
+                if len(candidates) == len(self) or (
+                    found.shape[1] == k
+                    and np.all(found[:, -1] <= self._covered_km(poleward, reach))
+                ):
+                    break
+                reach *= 2
+            found_count = found.shape[1]
+            valid = np.isfinite(found)
+            positions[queries, :found_count] = np.where(valid, candidates[nearest], -1)
+            distances[queries, :found_count] = found
+        return positions, distances
+
+
+def load_places(categories=CATEGORY_PREFIXES, root=".", columns=None):
+    """Return {category: (records, path of each record's file)} of extract_json.
+
+    Reads every output format of 2.extract_all.py: JSON arrays, JSON lines
+    and columnar tables; `columns` limits the fields read from the columnar
+    ones (keep it None when the places are saved back).
+    """
+    places = {}
+    for category in categories:
+        records, paths = [], []
+        output_directory = os.path.join(root, category, "extract_json")
+        for input_file in sorted(
+            glob.glob(os.path.join(output_directory, "*.json"))
+            + glob.glob(os.path.join(output_directory, "*.jsonl"))
+            + glob.glob(os.path.join(output_directory, f"*{COLUMNS_SUFFIX}"))
+        ):
+            if input_file.endswith(COLUMNS_SUFFIX):
+                data = ColumnarTable(input_file).records(columns)
+            elif input_file.endswith(".jsonl"):
+                with open(input_file, "r", encoding="utf-8") as file:
+                    data = [json.loads(line) for line in file if line.strip()]
+            else:
+                with open(input_file, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            records.extend(data)
+            paths.extend([input_file] * len(data))
+        places[category] = (records, paths)
+    return places
+
+
+def located(records):
+    # Positions and coordinates of the records that have both coordinates
+    positions = [
+        position
+        for position, record in enumerate(records)
+        if record.get("latitude") is not None and record.get("longitude") is not None
+    ]
+    latitudes = np.array([records[p]["latitude"] for p in positions], dtype=float)
+    longitudes = np.array([records[p]["longitude"] for p in positions], dtype=float)
+    return np.array(positions, dtype=np.int64), latitudes, longitudes
+
+
+def build_indexes(places, cell_degrees=DEFAULT_CELL_DEGREES):
+    """Return {category: (GeoIndex, positions of the indexed records)}."""
+    indexes = {}
+    for category, (records, _) in places.items():
+        positions, latitudes, longitudes = located(records)
+        indexes[category] = (GeoIndex(latitudes, longitudes, cell_degrees), positions)
+    return indexes
+
+
+def recompute_nearby(places, indexes, count=NEARBY_COUNT):
+    """Fill the nearby_<prefix>1..count fields of every record from the indexes.
+
+    Each located record gets the `count` nearest places of every category (not
+    counting itself), but only in the nearby fields its category already has,
+    so the loaders infer the same tables as before: stay and do records, for
+    example, have no nearby_accommodation fields and don't get any. Records
+    without coordinates are left as scraped. Returns the number of records
+    updated.
+    """
+    updated = 0
+    for category, (records, _) in places.items():
+        positions, latitudes, longitudes = located(records)
+        if not len(positions):
+            continue
+        fields = {
+            field
+            for record in records
+            for field in record
+            if re.match(NEARBY_FIELD_PATTERN, field)
+        }
+        for target, (index, target_positions) in indexes.items():
+            prefix = CATEGORY_PREFIXES[target]
+            names = [f"nearby_{prefix}{rank + 1}" for rank in range(count)]
+            if not fields.intersection(names):
+                continue
+            target_records = places[target][0]
+            exclude = None
+            if target == category:
+                # A place's own category index holds it at the same position
+                exclude = np.arange(len(positions))
+            neighbours, _ = index.batch_nearest(latitudes, longitudes, count, exclude)
+            for position, row in zip(positions, neighbours):
+                for rank, field in enumerate(names):
+                    if field not in fields:
+                        continue
+                    name = None
+                    if row[rank] >= 0:
+                        name = target_records[target_positions[row[rank]]].get(
+                            f"{prefix}_name"
+                        )
+                    records[position][field] = name
+        updated += len(positions)
+    return updated
+
+
+def resolved_nearby(places):
+    """Return how many nearby fields hold a place ID, as name_index.py leaves them."""
+    place_ids = {
+        record.get(f"{CATEGORY_PREFIXES[category]}_id")
+        for category, (records, _) in places.items()
+        for record in records
+    }
+    place_ids.discard(None)
+    return sum(
+        1
+        for records, _ in places.values()
+        for record in records
+        for field, value in record.items()
+        if re.match(NEARBY_FIELD_PATTERN, field) and value in place_ids
+    )
+
+
+def save_places(places):
+    # Rewrite each extract_json file with its updated records
+    for category, (records, paths) in places.items():
+        for input_file in dict.fromkeys(paths):
+            data = [r for r, path in zip(records, paths) if path == input_file]
+            if input_file.endswith(COLUMNS_SUFFIX):
+                write_columns(data, input_file)
+                continue
+            tmp_file = f"{input_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                if input_file.endswith(".jsonl"):
+                    # One record per line, as 2.extract_all.py writes them
+                    for record in data:
+                        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                else:
+                    json.dump(data, file, indent=4, ensure_ascii=False)
+            os.replace(tmp_file, input_file)
+
+
+if __name__ == "__main__":
+    places = load_places()
+    resolved = resolved_nearby(places)
+    if resolved:
+        raise SystemExit(
+            f"{resolved} nearby fields already hold place IDs from name_index.py; "
+            "run geo_index.py before name_index.py, or re-run 2.extract_all.py"
+        )
+    indexes = build_indexes(places)
+    updated = recompute_nearby(places, indexes)
+    save_places(places)
+    print(f"Recomputed the nearby fields of {updated} places")
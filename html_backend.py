@@ -0,0 +1,128 @@
+"""HTML parser backends for the extraction stage.
+
+The field extractors only need to walk a page's elements, read their tag,
+classes and text, and search a subtree by class. Each backend implements
+those operations, so the tree builder can be swapped without touching the
+extractors:
+
+- "html.parser": BeautifulSoup with Python's built-in parser (the original)
+- "lxml": BeautifulSoup with the lxml tree builder
+- "selectolax": selectolax's lexbor C parser, no BeautifulSoup tree at all
+
+The default comes from the HTML_PARSER environment variable.
+
+The backends give the same fields on well-formed pages (checked by
+`python benchmark.py backends`, on the prettified and the raw job files), but
+repair broken markup differently:
+
+- a block element inside a <p> closes the paragraph in lxml and selectolax,
+  as browsers do, so the text after the block is no longer part of it;
+  html.parser keeps the nesting as written
+- selectolax doesn't walk <template> contents, BeautifulSoup does
+- prettified pages were already re-serialised by one tree builder (lxml for
+  selectolax, see make_soup), which hides these differences: compare on the
+  raw pages before switching backends
+"""
+
+import os
+from bs4 import BeautifulSoup
+
+BACKENDS = ("html.parser", "lxml", "selectolax")
+DEFAULT_BACKEND = os.getenv("HTML_PARSER", "html.parser")
+
+_backends = {}
+
+
+def class_matches(classes, selector):
+    # Same rule as BeautifulSoup's find_all(class_=...): the selector matches
+    # one of the classes or the whole (whitespace-normalised) class attribute
+    return selector in classes or " ".join(classes) == selector
+
+
+class SoupBackend:
+    """BeautifulSoup with one of its tree builders."""
+
+    def __init__(self, features):
+        self.name = features
+        self.soup_features = features
+
+    def parse(self, html_content):
+        return BeautifulSoup(html_content, self.soup_features)
+
+    def iter_elements(self, document):
+        return document.find_all(True)
+
+    def tag_name(self, element):
+        return element.name
+
+    def classes(self, element):
+        return element.get("class") or []
+
+    def text(self, element):
+        return element.text
+
+    def find_all_class(self, element, selector):
+        return element.find_all(class_=selector)
+
+
+class SelectolaxBackend:
+    """selectolax's lexbor parser behind the same operations as SoupBackend."""
+
+    name = "selectolax"
+    # prettify needs a BeautifulSoup tree, so 1.prettier_json.py falls back to lxml
+    soup_features = "lxml"
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError as e:
+            raise ImportError(
+                "The selectolax backend needs `pip install selectolax`"
+            ) from e
+        self._parser = LexborHTMLParser
+
+    def parse(self, html_content):
+        tree = self._parser(html_content)
+        # BeautifulSoup's .text leaves out script and style contents
+        tree.strip_tags(["script", "style"])
+        return tree
+
+    def iter_elements(self, document):
+        if document.root is None:
+            return []
+        return [node for node in document.root.traverse() if node.tag[0] != "-"]
+
+    def tag_name(self, element):
+        return element.tag
+
+    def classes(self, element):
+        return (element.attributes.get("class") or "").split()
+
+    def text(self, element):
+        return element.text(deep=True)
+
+    def find_all_class(self, element, selector):
+        # Descendants only, like BeautifulSoup's Tag.find_all
+        return [
+            node
+            for child in element.iter(include_text=False)
+            for node in child.traverse()
+            if node.tag[0] != "-" and class_matches(self.classes(node), selector)
+        ]
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """Return the (cached) backend called `name`."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend '{name}', use one of {BACKENDS}")
+    if name not in _backends:
+        if name == "selectolax":
+            _backends[name] = SelectolaxBackend()
+        else:
+            _backends[name] = SoupBackend(name)
+    return _backends[name]
+
+
+def make_soup(html_content, backend=DEFAULT_BACKEND):
+    """Build a BeautifulSoup tree with the tree builder closest to `backend`."""
+    return BeautifulSoup(html_content, get_backend(backend).soup_features)
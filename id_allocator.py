@@ -0,0 +1,92 @@
+import json
+import os
+
+# One ID prefix per category, e.g. H0001 for the first accommodation
+ID_PREFIXES = {
+    "foodAndDrink": "F",
+    "accommodation": "H",
+    "activity": "A",
+}
+DEFAULT_REGISTRY_FILE = "id_registry.json"
+# Coordinates in a place key are rounded to ~0.1 m, so float noise between
+# output formats doesn't change the key
+KEY_COORDINATE_DIGITS = 6
+
+
+def get_prefix(category_name):
+    """Return the ID prefix for a category, table or `<category>_name` key."""
+    category = category_name
+    for suffix in ("_name", "_id", "_Detail"):
+        if category.endswith(suffix):
+            category = category[: -len(suffix)]
+    if category not in ID_PREFIXES:
+        raise ValueError("Unknown table name")
+    return ID_PREFIXES[category]
+
+
+def place_key(record, category):
+    """Return the registry key of an extracted place record.
+
+    The page URL when the record has one, as 2.extract_all.py keys its IDs;
+    otherwise the name with the coordinates, so two places that share a name
+    ("Starbucks") get two IDs. Without coordinates the name alone is the key,
+    and without a name there is none (a fresh ID every time).
+    """
+    if record.get("url"):
+        return record["url"]
+    name = record.get(f"{category}_name")
+    if name is None:
+        return None
+    latitude, longitude = record.get("latitude"), record.get("longitude")
+    if latitude is None or longitude is None:
+        return name
+    return (
+        f"{name}@{round(latitude, KEY_COORDINATE_DIGITS)},"
+        f"{round(longitude, KEY_COORDINATE_DIGITS)}"
+    )
+
+
+def new_registry():
+    return {
+        "next": {prefix: 1 for prefix in ID_PREFIXES.values()},
+        "ids": {prefix: {} for prefix in ID_PREFIXES.values()},
+    }
+
+
+def load_registry(path=DEFAULT_REGISTRY_FILE):
+    """Load the ID registry from disk, or start an empty one."""
+    registry = new_registry()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            stored = json.load(file)
+        registry["next"].update(stored.get("next", {}))
+        for prefix, ids in stored.get("ids", {}).items():
+            registry["ids"].setdefault(prefix, {}).update(ids)
+    return registry
+
+
+def save_registry(registry, path=DEFAULT_REGISTRY_FILE):
+    # Write to a temporary file first so an interrupted run keeps the old registry
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(registry, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def allocate_id(registry, prefix, key=None):
+    """Return the ID for `key`, handing out the next one for new keys.
+
+    A key (the page URL, or see place_key when there is none) always maps to
+    the same ID, so IDs stay stable across files and re-extractions. Without a
+    key a fresh ID is always allocated.
+    """
+    ids = registry["ids"].setdefault(prefix, {})
+    if key is not None and key in ids:
+        return ids[key]
+
+    next_id_num = registry["next"].get(prefix, 1)
+    registry["next"][prefix] = next_id_num + 1
+    new_id = f"{prefix}{next_id_num:04d}"
+    if key is not None:
+        ids[key] = new_id
+    return new_id
@@ -0,0 +1,167 @@
+"""Resolve the free-text nearby place names to place IDs.
+
+The scraped nearby_<category>1..3 fields hold names such as "Novotel Phuket
+Resort". The index maps every place's normalised name (accents stripped,
+casefolded, punctuation dropped) to its ID, with a difflib fuzzy match as a
+fallback. Running this module rewrites the resolved nearby fields of every
+extract_json file into ID references, and writes an edge table
+(nearby_edges/nearby_edges.json) with one row per nearby slot, for the
+MariaDB and Weaviate loaders to bulk-load.
+
+It is the last script to rewrite extract_json: after review_dedup.py and
+geo_index.py, before the loaders (see geo_index.py for why).
+"""
+
+import difflib
+import json
+import os
+import re
+import unicodedata
+from geo_index import (
+    CATEGORY_PREFIXES,
+    NEARBY_FIELD_PATTERN,
+    load_places,
+    save_places,
+)
+from id_allocator import (
+    allocate_id,
+    get_prefix,
+    load_registry,
+    place_key,
+    save_registry,
+)
+
+FUZZY_CUTOFF = float(os.getenv("NAME_FUZZY_CUTOFF", "0.85"))
+EDGE_DIRECTORY = "nearby_edges"
+EDGE_TABLE = "nearby_edge"
+
+
+def normalise_name(name):
+    """Casefold a name and drop accents, punctuation and repeated spaces."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = name.casefold().replace("&", " and ")
+    return " ".join(re.sub(r"[^\w\s]", " ", name).split())
+
+
+class NameIndex:
+    """Normalised name -> place ID, per category prefix."""
+
+    def __init__(self, fuzzy_cutoff=FUZZY_CUTOFF):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._ids = {prefix: {} for prefix in CATEGORY_PREFIXES.values()}
+        # Place ID -> name, to recognise fields an earlier run already rewrote
+        self.names = {}
+        self._resolved = {}
+
+    def add(self, prefix, name, place_id):
+        if name:
+            # The first place with a name keeps it
+            self._ids[prefix].setdefault(normalise_name(name), place_id)
+        self.names.setdefault(place_id, name)
+
+    def resolve(self, prefix, name):
+        """Return (place ID or None, "id" | "exact" | "fuzzy" | None)."""
+        if not name:
+            return None, None
+        if name in self.names:
+            # Already rewritten by an earlier run
+            return name, "id"
+        key = (prefix, name)
+        if key not in self._resolved:
+            ids = self._ids[prefix]
+            normalised = normalise_name(name)
+            if normalised in ids:
+                self._resolved[key] = ids[normalised], "exact"
+            else:
+                matches = difflib.get_close_matches(
+                    normalised, ids.keys(), n=1, cutoff=self.fuzzy_cutoff
+                )
+                self._resolved[key] = (
+                    (ids[matches[0]], "fuzzy") if matches else (None, None)
+                )
+        return self._resolved[key]
+
+
+def assign_place_ids(places, id_registry):
+    # Same place_key IDs the MariaDB loader gives rows without one
+    for category, (records, _) in places.items():
+        prefix = CATEGORY_PREFIXES[category]
+        id_name = f"{prefix}_id"
+        for index, record in enumerate(records):
+            if not record.get(id_name):
+                place_id = allocate_id(
+                    id_registry, get_prefix(prefix), place_key(record, prefix)
+                )
+                records[index] = {id_name: place_id, **record}
+
+
+def build_name_index(places, fuzzy_cutoff=FUZZY_CUTOFF):
+    index = NameIndex(fuzzy_cutoff)
+    for category, (records, _) in places.items():
+        prefix = CATEGORY_PREFIXES[category]
+        for record in records:
+            index.add(prefix, record.get(f"{prefix}_name"), record[f"{prefix}_id"])
+    return index
+
+
+def resolve_nearby(places, index):
+    """Rewrite the nearby fields into IDs and return (edges, match counts).
+
+    Names that resolve to no place are kept, so a later run over more places
+    can still resolve them; their edge has a NULL target_id.
+    """
+    edges = []
+    matches = {"id": 0, "exact": 0, "fuzzy": 0, None: 0}
+    for category, (records, _) in places.items():
+        source_type = CATEGORY_PREFIXES[category]
+        for record in records:
+            source_id = record[f"{source_type}_id"]
+            for field, name in list(record.items()):
+                field_match = re.match(NEARBY_FIELD_PATTERN, field)
+                if not field_match or name is None:
+                    continue
+                target_type, rank = field_match.group(1), int(field_match.group(2))
+                target_id, match = index.resolve(target_type, name)
+                matches[match] += 1
+                if target_id is not None:
+                    record[field] = target_id
+                edges.append(
+                    {
+                        f"{EDGE_TABLE}_id": f"{source_id}-{target_type}{rank}",
+                        "source_id": source_id,
+                        "source_type": source_type,
+                        "target_id": target_id,
+                        "target_type": target_type,
+                        "target_name": index.names[name] if match == "id" else name,
+                        "rank": rank,
+                        "match_method": match,
+                    }
+                )
+    return edges, matches
+
+
+def write_edges(edges, output_directory=EDGE_DIRECTORY):
+    os.makedirs(output_directory, exist_ok=True)
+    output_file = os.path.join(output_directory, f"{EDGE_TABLE}s.json")
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(edges, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+if __name__ == "__main__":
+    places = load_places()
+    id_registry = load_registry()
+    assign_place_ids(places, id_registry)
+    index = build_name_index(places)
+    edges, matches = resolve_nearby(places, index)
+    save_places(places)
+    save_registry(id_registry)
+    output_file = write_edges(edges)
+    print(
+        f"{len(edges)} nearby edges written to '{output_file}': "
+        f"{matches['exact']} exact, {matches['fuzzy']} fuzzy, "
+        f"{matches['id']} already IDs, {matches[None]} unresolved"
+    )
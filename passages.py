@@ -0,0 +1,136 @@
+"""Split a place's description and reviews into size-bounded passages.
+
+A place's reviews make one unbounded text: the embedding model truncates it
+(all-MiniLM-L6-v2 at 256 word pieces), so reviews past the cut never reach
+the vector, and the long inputs are slow to batch. Passages hold at most
+PASSAGE_MAX_TOKENS word tokens: the sentences of one review (or description)
+are packed greedily and only a sentence longer than a passage is split
+between words. A passage never spans two reviews, so a hit points at one
+review rather than at whatever it was packed with.
+
+Each passage carries its place's <prefix>_id, the key of the Bridge
+collections, so passage hits are aggregated back to places: a place scores
+its best passage.
+"""
+
+import os
+import re
+import numpy as np
+from embeddings import TOKEN_PATTERN
+
+PASSAGE_MAX_TOKENS = int(os.getenv("PASSAGE_MAX_TOKENS", "128"))
+# Passage hits fetched per place asked for, before aggregating
+PASSAGE_FANOUT = int(os.getenv("PASSAGE_FANOUT", "5"))
+PASSAGE_FIELDS = ("about_and_tags", "reviews")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def token_count(text):
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def split_text(text, max_tokens=PASSAGE_MAX_TOKENS):
+    """Return the sentences of `text`, splitting any longer than `max_tokens`."""
+    pieces = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if token_count(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words, tokens = [], 0
+        for word in sentence.split():
+            count = token_count(word)
+            if words and tokens + count > max_tokens:
+                pieces.append(" ".join(words))
+                words, tokens = [], 0
+            words.append(word)
+            tokens += count
+        if words:
+            pieces.append(" ".join(words))
+    return [piece for piece in pieces if piece]
+
+
+def pack(pieces, max_tokens=PASSAGE_MAX_TOKENS):
+    # Consecutive pieces joined while they fit in one passage
+    passages, current, tokens = [], [], 0
+    for piece in pieces:
+        count = token_count(piece)
+        if current and tokens + count > max_tokens:
+            passages.append(" ".join(current))
+            current, tokens = [], 0
+        current.append(piece)
+        tokens += count
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def field_texts(value):
+    # about_and_tags and reviews are lists of strings, or a string
+    if isinstance(value, list):
+        return [str(item) for item in value if item]
+    return [str(value)] if value else []
+
+
+def place_passages(record, prefix, max_tokens=PASSAGE_MAX_TOKENS):
+    """Return the passage objects of one extracted place, in field order."""
+    place_id = record.get(f"{prefix}_id")
+    passages = []
+    for field in PASSAGE_FIELDS:
+        texts = [
+            passage
+            for text in field_texts(record.get(field))
+            for passage in pack(split_text(text, max_tokens), max_tokens)
+        ]
+        for position, text in enumerate(texts):
+            passages.append(
+                {
+                    f"{prefix}_id": place_id,
+                    "field": field,
+                    "position": position,
+                    "text": text,
+                }
+            )
+    return passages
+
+
+def aggregate_hits(hits, k):
+    """Return the `k` best (place ID, score) of (place ID, passage score) hits."""
+    best = {}
+    for place_id, score in hits:
+        if place_id not in best or score > best[place_id]:
+            best[place_id] = score
+    return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+
+class PassageIndex:
+    """In-process passage vectors, queried like the Weaviate passage collections."""
+
+    def __init__(self, passages, vectors, prefix):
+        self.ids = []
+        positions = {}
+        places = []
+        for passage in passages:
+            place_id = passage[f"{prefix}_id"]
+            if place_id not in positions:
+                positions[place_id] = len(self.ids)
+                self.ids.append(place_id)
+            places.append(positions[place_id])
+        self._places = np.array(places, dtype=np.int64)
+        # No passages (no description nor reviews) is an empty index, as in
+        # recommend.CategoryIndex
+        self.vectors = (
+            np.asarray(vectors, dtype=np.float32).reshape(len(passages), -1)
+            if passages
+            else np.empty((0, 0), dtype=np.float32)
+        )
+
+    def query(self, vector, k=10):
+        """Return the `k` best (place ID, best passage score), best first."""
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+        scores = np.full(len(self.ids), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, self._places, self.vectors @ vector)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.ids[position], float(scores[position])) for position in best]
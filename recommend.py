@@ -0,0 +1,281 @@
+"""In-process recommendation queries over the extracted places.
+
+Each category's records are loaded once into arrays: coordinates, one
+L2-normalised embedding per place (from embeddings.py) and a BM25 inverted
+index over the place's name, description and reviews. A query for the top-k
+places of a category near (lat, lon) matching a text is scored in one
+vectorised pass:
+
+    score = w_vector * cosine + w_keyword * bm25 / max(bm25)
+            + w_distance * exp(-distance_km / DISTANCE_SCALE_KM)
+
+Usage:
+
+    python recommend.py stay --text "quiet beach resort" --near 7.89 98.29 -k 5
+"""
+
+import argparse
+import os
+import numpy as np
+from embeddings import (
+    EMBEDDING_CACHE_FILE,
+    EMBEDDING_PROVIDER,
+    TOKEN_PATTERN,
+    EmbeddingCache,
+    embed_texts,
+    get_provider,
+)
+from geo_index import CATEGORY_PREFIXES, EARTH_RADIUS_KM, load_places
+
+DEFAULT_WEIGHTS = {"vector": 0.5, "keyword": 0.3, "distance": 0.2}
+DISTANCE_SCALE_KM = float(os.getenv("RECOMMEND_DISTANCE_SCALE_KM", "2.0"))
+# Record fields besides the ID and name that the index reads
+INDEXED_FIELDS = ("about_and_tags", "reviews", "latitude", "longitude")
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def place_text(record, prefix):
+    # Name, description/tags and reviews, the fields a traveller searches by
+    parts = [record.get(f"{prefix}_name") or ""]
+    for field in ("about_and_tags", "reviews"):
+        value = record.get(field)
+        if isinstance(value, list):
+            parts.extend(str(item) for item in value)
+        elif value:
+            parts.append(str(value))
+    return " ".join(parts)
+
+
+class KeywordIndex:
+    """BM25 over tokenised documents, as flat posting arrays sorted by term."""
+
+    def __init__(self, texts):
+        self.vocabulary = {}
+        terms, documents, frequencies = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for document, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            lengths[document] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                terms.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                documents.append(document)
+                frequencies.append(count)
+
+        terms = np.array(terms, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        self._documents = np.array(documents, dtype=np.int64)[order]
+        self._frequencies = np.array(frequencies, dtype=np.float32)[order]
+        self._offsets = np.searchsorted(
+            terms[order], np.arange(len(self.vocabulary) + 1)
+        )
+        document_frequency = np.diff(self._offsets).astype(np.float32)
+        self._idf = np.log(
+            1 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5)
+        )
+        average = lengths.mean() if len(texts) and lengths.mean() else 1.0
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+        self.size = len(texts)
+
+    def scores(self, text):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(TOKEN_PATTERN.findall(text.lower())):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self._offsets[term], self._offsets[term + 1]
+            documents = self._documents[start:end]
+            frequencies = self._frequencies[start:end]
+            # Each document appears once per term, so plain fancy-index adds are safe
+            scores[documents] += (
+                self._idf[term]
+                * frequencies
+                * (BM25_K1 + 1)
+                / (frequencies + self._length_norm[documents])
+            )
+        return scores
+
+
+class CategoryIndex:
+    """The arrays one category's queries are scored against."""
+
+    def __init__(self, category, records, vectors):
+        self.category = category
+        self.prefix = CATEGORY_PREFIXES[category]
+        self.names = [record.get(f"{self.prefix}_name") for record in records]
+        self.ids = [record.get(f"{self.prefix}_id") for record in records]
+        # Places without coordinates get NaN, and so no distance score
+        self.latitudes = np.array(
+            [np.nan if r.get("latitude") is None else r["latitude"] for r in records],
+            dtype=np.float64,
+        )
+        self.longitudes = np.array(
+            [np.nan if r.get("longitude") is None else r["longitude"] for r in records],
+            dtype=np.float64,
+        )
+        # Precomputed haversine terms of every place
+        self._latitude_radians = np.radians(self.latitudes)
+        self._longitude_radians = np.radians(self.longitudes)
+        self._latitude_cosines = np.cos(self._latitude_radians)
+        # A category without records has an empty matrix, never scored
+        self.vectors = (
+            np.asarray(vectors, dtype=np.float32).reshape(len(records), -1)
+            if records
+            else np.empty((0, 0), dtype=np.float32)
+        )
+        self.keywords = KeywordIndex(
+            [place_text(record, self.prefix) for record in records]
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances_km(self, latitude, longitude):
+        # haversine_km, reusing the per-place terms
+        latitude, longitude = np.radians(latitude), np.radians(longitude)
+        a = (
+            np.sin((self._latitude_radians - latitude) / 2) ** 2
+            + np.cos(latitude)
+            * self._latitude_cosines
+            * np.sin((self._longitude_radians - longitude) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class RecommendationEngine:
+    """Top-k places per category by combined vector, keyword and distance score."""
+
+    def __init__(self, provider, weights=None):
+        self.provider = provider
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.categories = {}
+
+    def add_category(self, category, records, vectors=None, cache=None):
+        """Index `records`; embeds them with the provider unless `vectors` is given."""
+        if vectors is None:
+            prefix = CATEGORY_PREFIXES[category]
+            vectors, _ = embed_texts(
+                [place_text(record, prefix) for record in records],
+                self.provider,
+                cache,
+            )
+            vectors = np.array(vectors) if vectors else np.empty((0, 1))
+        self.categories[category] = CategoryIndex(category, records, vectors)
+
+    @classmethod
+    def from_directory(
+        cls, root=".", provider=None, cache_file=EMBEDDING_CACHE_FILE, weights=None
+    ):
+        """Load every category's extract_json output under `root`."""
+        engine = cls(provider or get_provider(), weights)
+        cache = EmbeddingCache(cache_file) if cache_file else None
+        try:
+            for category, prefix in CATEGORY_PREFIXES.items():
+                # Columnar output is read for the indexed fields only
+                columns = [f"{prefix}_id", f"{prefix}_name", *INDEXED_FIELDS]
+                records, _ = load_places([category], root, columns)[category]
+                engine.add_category(category, records, cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        return engine
+
+    def query(
+        self,
+        category,
+        text=None,
+        latitude=None,
+        longitude=None,
+        k=10,
+        radius_km=None,
+        weights=None,
+    ):
+        """Return the `k` best places of `category`, best first.
+
+        Every part of the query is optional: without text only distance counts,
+        without a location only the text does. `radius_km` drops places further
+        away (and places without coordinates).
+        """
+        if category not in self.categories:
+            raise ValueError(
+                f"Unknown category '{category}', use one of {tuple(self.categories)}"
+            )
+        index = self.categories[category]
+        weights = {**self.weights, **(weights or {})}
+        scores = np.zeros(len(index), dtype=np.float32)
+        parts = {}
+
+        if text and len(index):
+            query_vector = self.provider.encode([text])[0]
+            parts["vector"] = np.clip(index.vectors @ query_vector, 0.0, None)
+            keyword = index.keywords.scores(text)
+            top = keyword.max()
+            parts["keyword"] = keyword / top if top > 0 else keyword
+
+        distances = None
+        if latitude is not None and longitude is not None:
+            distances = index.distances_km(latitude, longitude)
+            parts["distance"] = np.nan_to_num(
+                np.exp(-distances / DISTANCE_SCALE_KM), nan=0.0
+            )
+
+        for name, part in parts.items():
+            scores += weights[name] * part
+        candidates = np.arange(len(index))
+        if radius_km is not None and distances is not None:
+            candidates = np.flatnonzero(distances <= radius_km)
+
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        best = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        results = []
+        for position in best:
+            result = {
+                "id": index.ids[position],
+                "name": index.names[position],
+                "score": float(scores[position]),
+                "distance_km": (
+                    None
+                    if distances is None or np.isnan(distances[position])
+                    else float(distances[position])
+                ),
+            }
+            for name, part in parts.items():
+                result[f"{name}_score"] = float(part[position])
+            results.append(result)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("category", choices=tuple(CATEGORY_PREFIXES))
+    parser.add_argument("--text", help="what the place should match")
+    parser.add_argument(
+        "--near", nargs=2, type=float, metavar=("LAT", "LON"), help="search origin"
+    )
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--radius", type=float, help="km around --near")
+    parser.add_argument("--provider", default=EMBEDDING_PROVIDER)
+    parser.add_argument("--root", default=".", help="directory holding stay/eat/do")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine.from_directory(args.root, get_provider(args.provider))
+    latitude, longitude = args.near or (None, None)
+    results = engine.query(
+        args.category, args.text, latitude, longitude, args.k, args.radius
+    )
+    for rank, result in enumerate(results, 1):
+        distance = (
+            "" if result["distance_km"] is None else f", {result['distance_km']:.2f} km"
+        )
+        print(f"{rank:>3}. {result['name']} (score {result['score']:.3f}{distance})")
+
+
+if __name__ == "__main__":
+    main()
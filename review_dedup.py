@@ -0,0 +1,254 @@
+"""Drop near-duplicate reviews across the whole extracted dataset.
+
+The same review is often scraped from several pages, and from both the
+review class and the partial_entry fallback with slightly different
+whitespace or characters. Every copy would be stored in MariaDB and
+embedded by Weaviate.
+
+Reviews are normalised like place names (name_index.normalise_name),
+split into 5-byte shingles and MinHashed with NumPy. LSH buckets the
+signatures by bands, so only reviews sharing a band are compared; a pair
+whose estimated Jaccard similarity reaches REVIEW_DEDUP_THRESHOLD joins a
+cluster. Each cluster keeps its first copy in input order (category, file,
+record, then review) and drops the others: the first scrape of a review,
+rather than a longer copy that may be padded or mangled. Reviews shorter
+than REVIEW_DEDUP_MIN_CHARS ("Great stay!") are never touched: different
+people write them independently.
+
+Running this module after 2.extract_all.py, first of the scripts that
+rewrite extract_json (see geo_index.py), rewrites the reviews of every
+extract_json file, writes the clusters to
+review_duplicates.json and prints the review bytes and embedding tokens
+saved.
+"""
+
+import json
+import os
+import numpy as np
+from embeddings import TOKEN_PATTERN
+from geo_index import load_places, save_places
+from name_index import normalise_name
+
+DEDUP_THRESHOLD = float(os.getenv("REVIEW_DEDUP_THRESHOLD", "0.8"))
+MIN_REVIEW_CHARS = int(os.getenv("REVIEW_DEDUP_MIN_CHARS", "50"))
+DUPLICATES_FILE = os.getenv("REVIEW_DEDUP_REPORT", "review_duplicates.json")
+SHINGLE_SIZE = 5
+# 16 bands of 8 rows: pairs above ~0.7 similarity share a band
+LSH_BANDS = 16
+LSH_ROWS = 8
+_SEED = 1
+_SHIFT = np.uint64(32)
+# Shingles permuted at once; the batch takes 128 * 8 bytes per shingle
+MINHASH_BATCH = 1 << 14
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """Return the distinct shingles of `text` (UTF-8, `size` bytes) as ints."""
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    # A text shorter than a shingle is one shingle
+    width = min(size, len(data))
+    count = max(len(data) - size + 1, 1)
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(width):
+        shingles |= data[offset : offset + count] << np.uint64(8 * offset)
+    return np.unique(shingles)
+
+
+class MinHasher:
+    """MinHash signatures of LSH_BANDS * LSH_ROWS seeded permutations."""
+
+    def __init__(self, permutations=LSH_BANDS * LSH_ROWS, seed=_SEED):
+        # Multiply-shift hashing: (a * x + b) mod 2^64, keeping the high bits
+        rng = np.random.default_rng(seed)
+        bits = np.iinfo(np.uint64).max
+        self._a = rng.integers(0, bits, permutations, dtype=np.uint64)[:, None] | 1
+        self._b = rng.integers(0, bits, permutations, dtype=np.uint64)[:, None]
+
+    def signatures(self, texts, batch_shingles=MINHASH_BATCH):
+        """Return one row of MinHashes per text, permuting a batch at a time."""
+        hashes = [shingle_hashes(text) for text in texts]
+        rows = []
+        start = 0
+        while start < len(hashes):
+            end, total = start, 0
+            while end < len(hashes) and (end == start or total < batch_shingles):
+                total += len(hashes[end])
+                end += 1
+            batch = hashes[start:end]
+            offsets = np.cumsum([0] + [len(h) for h in batch[:-1]])
+            values = (self._a * np.concatenate(batch)[None, :] + self._b) >> _SHIFT
+            rows.append(np.minimum.reduceat(values, offsets, axis=1).T)
+            start = end
+        if not rows:
+            return np.zeros((0, len(self._a)), dtype=np.uint64)
+        return np.concatenate(rows)
+
+
+def lsh_candidates(signatures, bands=LSH_BANDS, rows=LSH_ROWS):
+    """Yield the index pairs whose signatures are equal in at least one band."""
+    seen = set()
+    for band in range(bands):
+        buckets = {}
+        for index, signature in enumerate(signatures):
+            key = signature[band * rows : (band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(index)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1 :]:
+                    if (first, second) not in seen:
+                        seen.add((first, second))
+                        yield first, second
+
+
+def _find(parents, index):
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def similarity(signatures, first, second):
+    # Estimated Jaccard similarity: the share of equal MinHashes
+    return float(np.mean(signatures[first] == signatures[second]))
+
+
+def find_duplicates(places, threshold=DEDUP_THRESHOLD, min_chars=MIN_REVIEW_CHARS):
+    """Return the clusters of near-duplicate reviews across `places`.
+
+    Each cluster is {"canonical": occurrence, "duplicates": [occurrence with
+    its "similarity" to the canonical copy]}, where an occurrence is
+    {"category", "record", "position", "review"}.
+    """
+    # Identical normalised texts are one entry; only the distinct ones are hashed
+    occurrences, texts, groups = [], {}, []
+    for category, (records, _) in places.items():
+        for record_index, record in enumerate(records):
+            for position, review in enumerate(record.get("reviews") or ()):
+                if not isinstance(review, str):
+                    continue
+                text = normalise_name(review)
+                if len(text) < min_chars:
+                    continue
+                if text not in texts:
+                    texts[text] = len(groups)
+                    groups.append([])
+                groups[texts[text]].append(len(occurrences))
+                occurrences.append(
+                    {
+                        "category": category,
+                        "record": record_index,
+                        "position": position,
+                        "review": review,
+                    }
+                )
+
+    hasher = MinHasher()
+    signatures = hasher.signatures(list(texts))
+    parents = list(range(len(groups)))
+    for first, second in lsh_candidates(signatures):
+        if similarity(signatures, first, second) >= threshold:
+            parents[_find(parents, second)] = _find(parents, first)
+
+    members = {}
+    for group in range(len(groups)):
+        members.setdefault(_find(parents, group), []).append(group)
+    clusters = []
+    for cluster_groups in members.values():
+        cluster = [(group, o) for group in cluster_groups for o in groups[group]]
+        if len(cluster) < 2:
+            continue
+        # The first copy read is kept, whatever its length
+        cluster.sort(key=lambda item: item[1])
+        canonical_group, canonical = cluster[0]
+        clusters.append(
+            {
+                "canonical": occurrences[canonical],
+                "duplicates": [
+                    {
+                        **occurrences[occurrence],
+                        "similarity": round(
+                            similarity(signatures, canonical_group, group), 4
+                        ),
+                    }
+                    for group, occurrence in cluster[1:]
+                ],
+            }
+        )
+    clusters.sort(key=lambda c: (c["canonical"]["category"], c["canonical"]["record"]))
+    return clusters
+
+
+def drop_duplicates(places, clusters):
+    """Remove the duplicate copies from the records; return the savings."""
+    dropped = {}
+    for cluster in clusters:
+        for duplicate in cluster["duplicates"]:
+            key = (duplicate["category"], duplicate["record"])
+            dropped.setdefault(key, set()).add(duplicate["position"])
+
+    savings = {"reviews": 0, "removed": 0, "bytes": 0, "tokens": 0}
+    for category, (records, _) in places.items():
+        for record_index, record in enumerate(records):
+            reviews = record.get("reviews") or []
+            savings["reviews"] += len(reviews)
+            positions = dropped.get((category, record_index))
+            if not positions:
+                continue
+            for position in positions:
+                review = str(reviews[position])
+                savings["removed"] += 1
+                savings["bytes"] += len(review.encode("utf-8"))
+                savings["tokens"] += len(TOKEN_PATTERN.findall(review))
+            # No reviews left reads the same as none extracted
+            record["reviews"] = [
+                review
+                for position, review in enumerate(reviews)
+                if position not in positions
+            ] or None
+    return savings
+
+
+def write_duplicates(places, clusters, output_file=DUPLICATES_FILE):
+    # Occurrences name the place by its ID (or name) instead of its position
+    def place(occurrence):
+        record = places[occurrence["category"]][0][occurrence["record"]]
+        place_id = next(
+            (value for key, value in record.items() if key.endswith("_id")), None
+        )
+        name = next(
+            (value for key, value in record.items() if key.endswith("_name")), None
+        )
+        return {
+            "category": occurrence["category"],
+            "place": place_id or name,
+            **{k: v for k, v in occurrence.items() if k not in ("category", "record")},
+        }
+
+    report = [
+        {
+            "canonical": place(cluster["canonical"]),
+            "duplicates": [place(duplicate) for duplicate in cluster["duplicates"]],
+        }
+        for cluster in clusters
+    ]
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+if __name__ == "__main__":
+    places = load_places()
+    clusters = find_duplicates(places)
+    # The report names the places before their reviews are rewritten
+    output_file = write_duplicates(places, clusters)
+    savings = drop_duplicates(places, clusters)
+    save_places(places)
+    share = savings["removed"] / (savings["reviews"] or 1)
+    print(
+        f"{len(clusters)} clusters of near-duplicate reviews written to "
+        f"'{output_file}': dropped {savings['removed']} of {savings['reviews']} "
+        f"reviews ({share:.1%}), {savings['bytes']} bytes of review text and "
+        f"{savings['tokens']} embedding tokens"
+    )
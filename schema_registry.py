@@ -0,0 +1,205 @@
+"""Streaming column type inference and the schema registry of the MariaDB tables.
+
+Types are inferred one value at a time and only ever widen (INT -> DOUBLE,
+VARCHAR(255) -> TEXT, anything mixed -> TEXT), so the result doesn't depend on
+the order of the files or how many there are, and memory stays at one record.
+
+The registry (schema_registry.json) keeps each table's merged columns with a
+version, the change history and the size/mtime of every file already
+inferred. A later run only infers new or modified files. 3.store_mariadb.py
+diffs the merged columns against the live table (information_schema), not
+against the registry, so a new or stale registry never re-adds a column the
+table already has.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from columnar import COLUMNS_SUFFIX, SCHEMA_FILE, ColumnarTable
+
+SCHEMA_REGISTRY_FILE = os.getenv("DB_SCHEMA_REGISTRY", "schema_registry.json")
+# Within a family a type widens to the later one; across families to TEXT
+TYPE_FAMILIES = (("BOOLEAN", "INT", "DOUBLE"), ("VARCHAR(255)", "TEXT"))
+# Every type value_type and widen_type produce
+INFERRED_TYPES = {
+    "TIME",
+    *(sql_type for family in TYPE_FAMILIES for sql_type in family),
+}
+# SQL types of the typed columnar.py columns
+COLUMN_TYPES = {"float64": "DOUBLE", "int64": "INT", "time": "TIME"}
+READ_CHUNK = 1 << 16
+# Whitespace and the commas between array items
+SEPARATORS = re.compile(r"[\s,]*")
+ITEM_ENDS = (",", "]", " ", "\t", "\r", "\n")
+
+
+def value_type(key, value):
+    """Return the SQL type of one non-None value of column `key`."""
+    # bool is an int, so booleans have always been stored as INT
+    if isinstance(value, int):
+        return "INT"
+    if isinstance(value, float):
+        return "DOUBLE"
+    if isinstance(value, str):
+        if key.endswith("_time"):
+            return "TIME"
+        return "VARCHAR(255)" if len(value) <= 255 else "TEXT"
+    return "TEXT"
+
+
+def widen_type(current, new):
+    if current is None or current == new:
+        return new
+    for family in TYPE_FAMILIES:
+        if current in family and new in family:
+            return max(current, new, key=family.index)
+    return "TEXT"
+
+
+class SchemaInference:
+    """Column types merged over any number of records, one value at a time."""
+
+    def __init__(self, schema=None):
+        self.schema = dict(schema or {})
+
+    def observe_type(self, key, sql_type):
+        self.schema[key] = widen_type(self.schema.get(key), sql_type)
+
+    def observe(self, record):
+        for key, value in record.items():
+            # Missing values say nothing about the type
+            if value is not None:
+                self.observe_type(key, value_type(key, value))
+
+    def observe_file(self, input_file):
+        """Observe every record of an extraction output file, streaming it."""
+        if input_file.endswith(COLUMNS_SUFFIX):
+            table = ColumnarTable(input_file)
+            for name, kind in table.types.items():
+                if kind != "text":
+                    if table.valid(name).any():
+                        self.observe_type(name, COLUMN_TYPES[kind])
+                    continue
+                for value in table.column(name):
+                    if value is not None:
+                        self.observe_type(name, value_type(name, value))
+            return
+        with open(input_file, "r", encoding="utf-8") as file:
+            if input_file.endswith(".jsonl"):
+                records = (json.loads(line) for line in file if line.strip())
+            else:
+                records = iter_json_array(file)
+            for record in records:
+                self.observe(record)
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK):
+    """Yield the items of a JSON array file one at a time.
+
+    The file is read in chunks, so memory holds one item and one chunk rather
+    than the whole array.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    opened = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and not opened:
+            if buffer[position] != "[":
+                raise ValueError(f"'{file.name}' is not a JSON array")
+            opened = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        item, end = None, None
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        # A number cut off by the end of the chunk still parses; only trust an
+        # item once the separator after it has been read
+        if end is None or (not eof and buffer[end : end + 1] not in ITEM_ENDS):
+            if eof:
+                raise ValueError(f"'{file.name}' ends inside the JSON array")
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+        position = end
+
+
+def new_schema_registry():
+    return {"tables": {}}
+
+
+def load_schema_registry(path=SCHEMA_REGISTRY_FILE):
+    if not os.path.exists(path):
+        return new_schema_registry()
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_schema_registry(registry, path=SCHEMA_REGISTRY_FILE):
+    # Same write-then-rename as the ID registry
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(registry, file, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def file_signature(path):
+    # A columns table is rewritten as a whole, schema.json included
+    if os.path.isdir(path):
+        path = os.path.join(path, SCHEMA_FILE)
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def registered_schema(registry, table_name, input_files, required=None):
+    """Return (columns, changes) of `table_name` after seeing `input_files`.
+
+    Only files the registry hasn't seen with the same size and mtime are
+    inferred. `changes` maps each added or widened column to (old type or
+    None, new type); when there are any, the table's version goes up.
+    `required` columns are added first, e.g. IDs the loader assigns itself.
+    """
+    entry = registry["tables"].setdefault(
+        table_name, {"version": 0, "columns": {}, "files": {}, "history": []}
+    )
+    inference = SchemaInference({**(required or {}), **entry["columns"]})
+    signatures = {}
+    for input_file in input_files:
+        signature = file_signature(input_file)
+        if entry["files"].get(input_file) != signature:
+            inference.observe_file(input_file)
+        signatures[input_file] = signature
+
+    changes = {
+        column: (entry["columns"].get(column), sql_type)
+        for column, sql_type in inference.schema.items()
+        if entry["columns"].get(column) != sql_type
+    }
+    if changes:
+        entry["version"] += 1
+        entry["columns"] = inference.schema
+        entry["history"].append(
+            {
+                "version": entry["version"],
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "changes": {column: list(types) for column, types in changes.items()},
+            }
+        )
+    # Deleted files keep their columns (the schema never narrows) but drop out
+    # of the file list; other directories of the same table stay in it
+    entry["files"] = {
+        path: signature
+        for path, signature in entry["files"].items()
+        if os.path.exists(path)
+    }
+    entry["files"].update(signatures)
+    return entry["columns"], changes
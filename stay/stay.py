@@ -2,7 +2,11 @@ import json
 import html
 import os
 import re
-from bs4 import BeautifulSoup
+import sys
+
+# Run as `python <category>/<category>.py` from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html_backend import DEFAULT_BACKEND, make_soup
 
 def remove_newline_and_extra_spaces_from_string(string):
     # Replace multiple spaces with a single space
@@ -18,7 +22,7 @@ def clean_html_and_classify(json_data):
         url = entry.get("url", "")
         html_content = entry.get("html", "")
         cleaned_html = html.unescape(html_content)
-        soup = BeautifulSoup(cleaned_html, "html.parser")
+        soup = make_soup(cleaned_html, DEFAULT_BACKEND)
         classification = {}
 
         # Extract title and description from the HTML content
@@ -0,0 +1,434 @@
+"""Synthetic TripAdvisor-like pages for benchmarking the pipeline.
+
+Pages cycle through the layout variants 2.extract_all.py handles:
+
+- descriptions in the category's description class, in `ui_columns` "About"
+  blocks, or only in the page state ("description":"...") plus SrqKb tags
+- reviews in the category's review class, in `partial_entry` paragraphs, or
+  in JguWG/yCeTE blocks
+- nearby places under "Best nearby ..." titles (title or sectionTitle
+  class), in xCVkR blocks or in yvHvW lists
+- coordinates as plain "latitude":..., "longitude":... state or URL-encoded
+- some pages also carry a JSON-LD place object for "embedded_state" mode,
+  whose description is a shorter summary of the DOM one
+
+Each page comes with the fields the extractor should return for it (all but
+the ID), so a benchmark run also checks the extraction output. Pages are
+padded to about `page_kb` kilobytes with navigation markup and script state.
+
+    python synthetic_pages.py stay do --pages 1000 --root /tmp/synthetic
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+
+CATEGORIES = ("eat", "stay", "do")
+DEFAULT_PAGE_KB = 32
+GEO_ID = 293920
+URL_PATHS = {
+    "eat": "Restaurant_Review",
+    "stay": "Hotel_Review",
+    "do": "Attraction_Review",
+}
+NAME_WORDS = {
+    "eat": (
+        ("Baan", "Krua", "Sea Shell", "Golden", "Old Town", "Spice"),
+        ("Kitchen", "Cafe", "Bistro", "Seafood", "Noodle House", "Grill"),
+    ),
+    "stay": (
+        ("Sea Breeze", "Patong", "Kata", "Andaman", "Palm", "Sunset"),
+        ("Resort", "Hotel", "Villas", "Hostel", "Boutique Hotel", "Residence"),
+    ),
+    "do": (
+        ("Phang Nga", "Big Buddha", "Old Phuket", "Similan", "Karon", "Elephant"),
+        ("Tour", "Viewpoint", "Walk", "Snorkelling Trip", "Cooking Class", "Park"),
+    ),
+}
+WORDS = (
+    "quiet friendly staff view beach clean room breakfast pool local food spicy "
+    "value walk sunset guide boat island market family great nice busy fresh "
+    "trip night street temple garden lovely service price morning bay"
+).split()
+# Category markup, as (description class, review class, hours class)
+EAT_CLASSES = (
+    "biGQs _P pZUbB alXOW eWlDX GzNcM ATzgx UTQMg TwpTY hmDzD",
+    "JguWG",
+    "biGQs _P pZUbB egaXP hmDzD",
+)
+STAY_CLASSES = ("uqMDf z BGJxv YGfmd YQkjl", "orRIx Ci _a C", None)
+DO_CLASSES = ("USjYi _d", "JguWG", "EFKKt")
+NEARBY_TITLE_CLASS = "biGQs _P fiohW ngXxk"
+NEARBY_LIST_ITEM_CLASS = "biGQs _P alXOW oCpZu GzNcM nvOhm UTQMg ZTpaU ngXxk"
+# Opening hours as (page text, JSON-LD hours, extracted start and end)
+OPENING_HOURS = (
+    ("9:00 AM - 5:30 PM", "Mo-Su 09:00-17:30", "09:00:00", "17:30:00"),
+    ("11:00 AM - 10:00 PM", "Mo-Su 11:00-22:00", "11:00:00", "22:00:00"),
+    ("7:30 AM - 3:00 PM", "Mo-Su 07:30-15:00", "07:30:00", "15:00:00"),
+)
+LD_TYPES = {"eat": "Restaurant", "stay": "Hotel", "do": "TouristAttraction"}
+
+_filler_blocks = []
+
+
+def place_name(category, index):
+    first, second = NAME_WORDS[category]
+    word = first[index % len(first)]
+    kind = second[index // len(first) % len(second)]
+    return f"{word} {kind} {index}"
+
+
+def place_url(category, index):
+    slug = place_name(category, index).replace(" ", "_")
+    return (
+        f"https://www.tripadvisor.com/{URL_PATHS[category]}-g{GEO_ID}"
+        f"-d{10000000 + index}-Reviews-{slug}-Phuket.html"
+    )
+
+
+def clean_text(text):
+    # remove_newline_and_extra_spaces of 2.extract_all.py
+    return " ".join(text.split())
+
+
+def clean_review(text):
+    # Reviews also lose their non-ASCII characters
+    return clean_text(re.sub(r"[^\x00-\x7F]+", "", text.strip()))
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def filler_blocks():
+    # A fixed pool of page chrome, drawn from to pad every page; none of it
+    # uses a class or pattern the extractors look for
+    if not _filler_blocks:
+        rng = random.Random(0)
+        for index in range(256):
+            links = "".join(
+                f'<li class="kLqdM Wh"><a href="/Tourism-g{rng.randrange(10**6)}" '
+                f'class="UikNM _G B- _S _T c G_">{sentence(rng, 2)}</a></li>'
+                for _ in range(8)
+            )
+            state = json.dumps(
+                {
+                    "urqlCache": {
+                        f"q{index}-{key}": {"data": sentence(rng, 12)}
+                        for key in range(6)
+                    }
+                }
+            )
+            _filler_blocks.append(
+                f'<nav class="hTmEs Zb"><ul class="oKtVy">{links}</ul></nav>'
+                f'<div class="JVaPo"><span class="fOtGX">{sentence(rng, 10)}</span>'
+                f'<svg viewBox="0 0 24 24" class="d Vb UmNoP"><path d="M12 2l3 7h7l-6 4 '
+                f'2 7-6-4-6 4 2-7-6-4h7z"></path></svg></div>'
+                f"<script>window.__WEB_CONTEXT__.push({state});</script>"
+            )
+    return _filler_blocks
+
+
+def padding(rng, page_kb):
+    blocks = filler_blocks()
+    size = sum(map(len, blocks)) / len(blocks)
+    return "".join(rng.choices(blocks, k=max(1, round(page_kb * 1024 / size))))
+
+
+def coordinates_markup(rng, index):
+    latitude = round(rng.uniform(7.75, 8.1), 6)
+    longitude = round(rng.uniform(98.25, 98.45), 6)
+    if index % 2:
+        state = f'"latitude":{latitude:.6f},"longitude":{longitude:.6f}'
+    else:
+        state = (
+            f"latitude%5C%5C%5C%22%3A{latitude:.6f}%2C%5C%5C%5C%22"
+            f"longitude%5C%5C%5C%22%3A{longitude:.6f}"
+        )
+    return f"<script>window.__PAGE_STATE__='{state}';</script>", latitude, longitude
+
+
+def json_ld_markup(category, name, latitude, longitude, hours=None, summary=None):
+    place = {
+        "@context": "https://schema.org",
+        "@type": LD_TYPES[category],
+        "name": name,
+        "geo": {
+            "@type": "GeoCoordinates",
+            "latitude": latitude,
+            "longitude": longitude,
+        },
+    }
+    if hours:
+        place["openingHours"] = hours[1]
+    if summary:
+        place["description"] = summary
+    return f'<script type="application/ld+json">{json.dumps(place)}</script>'
+
+
+def summary_text(about):
+    # The first words of a description, as the JSON-LD summary of the place
+    return " ".join(about.split()[:6]).capitalize()
+
+
+def description_markup(rng, index, desc_class, variants):
+    """Return (markup, expected about_and_tags, JSON-LD summary) of a variant.
+
+    Like real listings, a page describing the place in the DOM has a shorter
+    JSON-LD summary without the amenities; the DOM text is what is expected.
+    """
+    about = sentence(rng, rng.randint(8, 30))
+    variant = variants[index % len(variants)]
+    if variant == "class":
+        markup = f'<div class="{desc_class}"><p>{about}.</p></div>'
+        return markup, [f"{about}."], summary_text(about)
+    if variant == "about":
+        markup = (
+            f'<div class="ui_columns">Manage this business? About the owner</div>'
+            f'<div class="ui_columns">About {about}.</div>'
+            f'<div class="ui_columns">Amenities</div>'
+        )
+        return markup, [f"About {about}."], summary_text(about)
+    tags = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(0, 3))]
+    markup = f'<script>window.__DESCRIPTION__={{"description":"{about}"}};</script>'
+    markup += "".join(f'<div class="SrqKb">{tag}</div>' for tag in tags)
+    return markup, [about] + tags, None
+
+
+def titled_nearby_markup(rng, title_class):
+    # "Best nearby" titles followed by the place names, all in one class
+    hotels = [
+        place_name("stay", rng.randrange(10**5)) for _ in range(rng.randint(0, 3))
+    ]
+    restaurants = [
+        place_name("eat", rng.randrange(10**5)) for _ in range(rng.randint(1, 4))
+    ]
+    attractions = [
+        place_name("do", rng.randrange(10**5)) for _ in range(rng.randint(1, 3))
+    ]
+    texts = (
+        ["Best nearby hotels"]
+        + hotels
+        + ["Best nearby restaurants"]
+        + restaurants
+        + ["Best nearby attractions"]
+        + attractions
+    )
+    markup = "".join(f'<span class="{title_class}">{text}</span>' for text in texts)
+    expected = {}
+    for prefix, names in (
+        ("accommodation", hotels),
+        ("foodAndDrink", restaurants),
+        ("activity", attractions),
+    ):
+        for rank in range(3):
+            expected[f"nearby_{prefix}{rank + 1}"] = (
+                names[rank] if rank < len(names) else None
+            )
+    return markup, expected
+
+
+def block_nearby_markup(rng):
+    # xCVkR blocks, whose heading says which kind of place they list
+    restaurants = [
+        place_name("eat", rng.randrange(10**5)) for _ in range(rng.randint(1, 4))
+    ]
+    attractions = [
+        place_name("do", rng.randrange(10**5)) for _ in range(rng.randint(1, 4))
+    ]
+    markup = "".join(
+        f'<div class="xCVkR"><div class="kHzSj">{heading}</div>'
+        + "".join(f'<a class="o W q" href="#">{name}</a>' for name in names)
+        + "</div>"
+        for heading, names in (
+            ("Restaurants", restaurants),
+            ("Attractions", attractions),
+        )
+    )
+    expected = {}
+    for prefix, names in (("foodAndDrink", restaurants), ("activity", attractions)):
+        for rank in range(3):
+            expected[f"nearby_{prefix}{rank + 1}"] = (
+                names[rank] if rank < len(names) else None
+            )
+    return markup, expected
+
+
+def list_nearby_markup(rng):
+    # Two yvHvW lists, restaurants then attractions, with an empty entry
+    restaurants = [
+        place_name("eat", rng.randrange(10**5)) for _ in range(rng.randint(1, 4))
+    ]
+    attractions = [
+        place_name("do", rng.randrange(10**5)) for _ in range(rng.randint(1, 4))
+    ]
+    markup = "".join(
+        '<div class="yvHvW">'
+        + "".join(
+            f'<div class="{NEARBY_LIST_ITEM_CLASS}">{name}</div>'
+            for name in names[:1] + [" "] + names[1:]
+        )
+        + "</div>"
+        for names in (restaurants, attractions)
+    )
+    expected = {}
+    for prefix, names in (("foodAndDrink", restaurants), ("activity", attractions)):
+        for rank in range(3):
+            expected[f"nearby_{prefix}{rank + 1}"] = (
+                names[rank] if rank < len(names) else None
+            )
+    return markup, expected
+
+
+def review_texts(rng, count, label):
+    # Some reviews have non-ASCII characters, which extraction drops
+    return [
+        (
+            f"{sentence(rng, rng.randint(6, 40))} {label} ★★★★"
+            if rng.random() < 0.3
+            else f"{sentence(rng, rng.randint(6, 40))} {label}"
+        )
+        for _ in range(count)
+    ]
+
+
+def generate_page(category, index, rng, page_kb=DEFAULT_PAGE_KB):
+    """Return (url, html, expected fields) of synthetic page `index` of a category."""
+    name = place_name(category, index)
+    prefix = {"eat": "foodAndDrink", "stay": "accommodation", "do": "activity"}[
+        category
+    ]
+    coordinates, latitude, longitude = coordinates_markup(rng, index)
+    expected = {f"{prefix}_name": name}
+    body = []
+
+    if category == "stay":
+        desc_class, review_class, _ = STAY_CLASSES
+        markup, expected["about_and_tags"], summary = description_markup(
+            rng, index, desc_class, ("class", "about", "state")
+        )
+        body.append(markup)
+        hours = None
+        expected["latitude"], expected["longitude"] = latitude, longitude
+        expected["start_time"], expected["end_time"] = "00:00:00", "23:59:00"
+        reviews = review_texts(rng, rng.randint(0, 8), f"stay {index}")
+        if index % 4 == 3:
+            body.extend(f'<p class="partial_entry">{text}</p>' for text in reviews)
+        else:
+            body.extend(f'<div class="{review_class}">{text}</div>' for text in reviews)
+        expected["reviews"] = [clean_review(text) for text in reviews] or None
+        title_class = "sectionTitle" if index % 5 == 4 else NEARBY_TITLE_CLASS
+        markup, nearby = titled_nearby_markup(rng, title_class)
+        body.append(markup)
+        expected.update(nearby)
+
+    elif category == "do":
+        desc_class, _, hours_class = DO_CLASSES
+        about = sentence(rng, rng.randint(8, 30))
+        body.append(f'<div class="{desc_class}">{about}.</div>')
+        expected["about_and_tags"] = [f"{about}."]
+        summary = summary_text(about)
+        expected["latitude"], expected["longitude"] = latitude, longitude
+        hours = OPENING_HOURS[index % 3] if index % 6 != 5 else None
+        if hours:
+            body.append(f'<div class="{hours_class}">{hours[0]}</div>')
+        expected["start_time"] = hours[2] if hours else None
+        expected["end_time"] = hours[3] if hours else None
+        expected["duration"] = None
+        if index % 7 != 6:
+            expected["duration"] = rng.randint(1, 8)
+            body.append(
+                f'<div class="bTBvn">Duration: {expected["duration"]}-'
+                f'{expected["duration"] + 1} hours</div>'
+            )
+        reviews = review_texts(rng, rng.randint(0, 6), f"do {index}")
+        body.extend(
+            f'<div class="JguWG"><span class="yCeTE">{text}</span></div>'
+            for text in reviews
+        )
+        expected["reviews"] = [clean_review(text) for text in reviews] or None
+        variant = index % 3
+        if variant == 0:
+            markup, nearby = block_nearby_markup(rng)
+        elif variant == 1:
+            markup, nearby = list_nearby_markup(rng)
+        else:
+            markup, nearby = titled_nearby_markup(rng, NEARBY_TITLE_CLASS)
+        body.append(markup)
+        expected.update(nearby)
+
+    else:
+        desc_class, review_class, hours_class = EAT_CLASSES
+        markup, expected["about_and_tags"], summary = description_markup(
+            rng, index, desc_class, ("class", "class", "about")
+        )
+        body.append(markup)
+        expected["latitude"], expected["longitude"] = latitude, longitude
+        hours = OPENING_HOURS[index % 3]
+        body.append(f'<div class="{hours_class}">{hours[0]}</div>')
+        expected["start_time"], expected["end_time"] = hours[2], hours[3]
+        reviews = review_texts(rng, rng.randint(0, 8), f"eat {index}")
+        if index % 5 == 4:
+            body.extend(f'<p class="partial_entry">{text}</p>' for text in reviews)
+        else:
+            body.extend(
+                f'<div class="{review_class}"><span class="yCeTE">{text}</span></div>'
+                for text in reviews
+            )
+        expected["reviews"] = [clean_review(text) for text in reviews] or None
+        markup, nearby = titled_nearby_markup(rng, NEARBY_TITLE_CLASS)
+        body.append(markup)
+        expected.update(nearby)
+
+    if index % 4 == 0:
+        body.append(json_ld_markup(category, name, latitude, longitude, hours, summary))
+    half = padding(rng, page_kb / 2)
+    page = (
+        f'<!DOCTYPE html><html lang="en"><head><title>{name} - Tripadvisor</title>'
+        f"</head><body>{half}<main><h1>{name}</h1><h2>Phuket, Thailand</h2>"
+        f"{''.join(body)}</main>{coordinates}{padding(rng, page_kb / 2)}"
+        f"</body></html>"
+    )
+    return place_url(category, index), page, expected
+
+
+def iter_pages(category, count, seed=0, page_kb=DEFAULT_PAGE_KB):
+    """Yield (url, html, expected fields) of `count` pages, the same for a seed."""
+    rng = random.Random(f"{seed}-{category}")
+    for index in range(count):
+        yield generate_page(category, index, rng, page_kb)
+
+
+def write_job_file(category, count, output_file, seed=0, page_kb=DEFAULT_PAGE_KB):
+    """Write `count` pages as a scraper job file; return their expected fields."""
+    expected = []
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        for url, page, fields in iter_pages(category, count, seed, page_kb):
+            file.write(json.dumps({"input": url, "result": page}) + "\n")
+            expected.append(fields)
+    os.replace(tmp_file, output_file)
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("categories", nargs="*", default=list(CATEGORIES))
+    parser.add_argument("--pages", type=int, default=1000, help="per category")
+    parser.add_argument("--root", default=".", help="directory to write <category>/")
+    parser.add_argument("--page-kb", type=float, default=DEFAULT_PAGE_KB)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for category in args.categories:
+        directory = os.path.join(args.root, category)
+        os.makedirs(directory, exist_ok=True)
+        output_file = os.path.join(directory, "job-synthetic-result.jsonl")
+        write_job_file(category, args.pages, output_file, args.seed, args.page_kb)
+        print(f"{args.pages} synthetic pages written to '{output_file}'")
+
+
+if __name__ == "__main__":
+    main()
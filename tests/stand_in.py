@@ -0,0 +1,73 @@
+"""A local HTTP stand-in for the page host, for the fetcher tests and benchmark."""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def page_etag(page):
+    return f'"{hashlib.sha1(page.encode("utf-8")).hexdigest()}"'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves server.pages at /page/<index> with ETag and Last-Modified.
+
+    server.failures maps a page index to the statuses its next requests get
+    (with Retry-After: 0) before the page is served, to exercise the
+    fetcher's retries. /redirect redirects to itself forever.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def send_empty(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/redirect":
+            self.send_empty(302, [("Location", "/redirect")])
+            return
+        try:
+            index = int(self.path.rsplit("/", 1)[-1])
+            body = server.pages[index].encode("utf-8")
+        except (ValueError, IndexError):
+            self.send_empty(404)
+            return
+        with server.lock:
+            server.requests += 1
+            if self.headers.get("If-None-Match"):
+                server.conditional += 1
+            statuses = server.failures.get(index)
+            status = statuses.pop(0) if statuses else None
+        etag = page_etag(server.pages[index])
+        if status is not None:
+            self.send_empty(status, [("Retry-After", "0")])
+        elif self.headers.get("If-None-Match") == etag:
+            self.send_empty(304, [("ETag", etag)])
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_pages(pages):
+    """Start a stand-in serving `pages`; return (server, base URL of the pages)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.pages, server.failures = pages, {}
+    server.requests, server.conditional = 0, 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/page/"
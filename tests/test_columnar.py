@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from columnar import ColumnarTable, write_columns
+
+
+class ColumnTypesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def round_trip(self, records):
+        output_directory = os.path.join(self.directory.name, "places.columns")
+        write_columns(records, output_directory)
+        table = ColumnarTable(output_directory)
+        return table.types, table.records()
+
+    def test_int_column_stays_int(self):
+        records = [{"duration": 3}, {"duration": None}, {"duration": 2**62}]
+        types, restored = self.round_trip(records)
+        self.assertEqual(types["duration"], "int64")
+        self.assertEqual(restored, records)
+        self.assertIsInstance(restored[2]["duration"], int)
+
+    def test_mixed_int_and_float_is_float(self):
+        types, restored = self.round_trip([{"rating": 4}, {"rating": 4.5}])
+        self.assertEqual(types["rating"], "float64")
+        self.assertEqual(restored, [{"rating": 4.0}, {"rating": 4.5}])
+        self.assertIsInstance(restored[0]["rating"], float)
+
+    def test_mixed_column_with_a_large_int_is_text(self):
+        for values in ([2**60, 0.5], [0.5, 2**60]):
+            records = [{"count": value} for value in values]
+            types, restored = self.round_trip(records)
+            self.assertEqual(types["count"], "text")
+            self.assertEqual(restored, records)
+
+    def test_time_and_text_columns(self):
+        records = [
+            {"start_time": "09:00:00", "reviews": ["Great pool"]},
+            {"start_time": None, "reviews": None},
+        ]
+        types, restored = self.round_trip(records)
+        self.assertEqual(types, {"start_time": "time", "reviews": "text"})
+        self.assertEqual(restored, records)
+
+
+if __name__ == "__main__":
+    unittest.main()
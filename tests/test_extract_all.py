@@ -0,0 +1,219 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import synthetic_pages
+
+
+def load_stage(filename, module_name):
+    # One module object per stage, whichever test file loads it first
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+extract_all = load_stage("2.extract_all.py", "extract_all")
+prettier_json = load_stage("1.prettier_json.py", "prettier_json")
+
+
+def synthetic_entries(category, count):
+    return [
+        {"url": url, "html": page}
+        for url, page, _ in synthetic_pages.iter_pages(category, count, page_kb=2)
+    ]
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def classify(self, entries, workers, chunksize):
+        return list(
+            extract_all.classify_entries(
+                iter(entries),
+                *extract_all.CATEGORY_SETTINGS["stay"],
+                workers=workers,
+                chunksize=chunksize,
+                id_registry=extract_all.new_registry(),
+            )
+        )
+
+    def test_pool_output_matches_serial_order(self):
+        entries = synthetic_entries("stay", 23)
+        serial = self.classify(entries, workers=1, chunksize=4)
+        self.assertEqual(
+            [place["accommodation_name"] for place in serial],
+            [synthetic_pages.place_name("stay", index) for index in range(23)],
+        )
+        # Uneven chunks over several workers, finishing out of order
+        self.assertEqual(self.classify(entries, workers=3, chunksize=2), serial)
+        self.assertEqual(self.classify(entries, workers=2, chunksize=5), serial)
+
+
+class SingleWalkTest(unittest.TestCase):
+    def test_buckets_match_find_all(self):
+        backend = extract_all.get_backend("html.parser")
+        # One class alone, and a whole multi-class attribute with odd spacing
+        extra = '<div class="  uqMDf  z BGJxv YGfmd YQkjl ">Spaced</div>'
+        for category, settings in extract_all.CATEGORY_SETTINGS.items():
+            _, desc_class, reviews_class, time_class = settings[:4]
+            plan = extract_all.compile_extraction_plan(
+                desc_class, reviews_class, time_class
+            )
+            for index, (_, page, _) in enumerate(
+                synthetic_pages.iter_pages(category, 12, page_kb=2)
+            ):
+                soup = backend.parse(page.replace("</main>", f"{extra}</main>"))
+                buckets = extract_all.collect_buckets(soup, plan, backend)
+                with self.subTest(category=category, page=index):
+                    # The same element objects, in document order
+                    for selector in plan:
+                        self.assertEqual(
+                            list(map(id, buckets[selector])),
+                            list(map(id, soup.find_all(class_=selector))),
+                        )
+                    self.assertEqual(
+                        list(map(id, buckets["headings"])),
+                        list(map(id, soup.find_all(list(extract_all.HEADING_TAGS)))),
+                    )
+
+
+class StreamingInputTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def extract(self, category, input_directory, streaming):
+        output_directory = os.path.join(self.directory.name, f"{category}-{streaming}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            extract_all.process_files(
+                input_directory,
+                output_directory,
+                *extract_all.CATEGORY_SETTINGS[category],
+                workers=1,
+                registry_file=os.path.join(output_directory, "id_registry.json"),
+                streaming=streaming,
+                cache_file=None,
+                profile_file="",
+            )
+        [output_file] = [
+            name
+            for name in os.listdir(output_directory)
+            if name.endswith("_clean.json")
+        ]
+        with open(
+            os.path.join(output_directory, output_file), encoding="utf-8"
+        ) as file:
+            return json.load(file)
+
+    def test_jsonl_matches_prettier_json(self):
+        for category in extract_all.CATEGORY_SETTINGS:
+            with self.subTest(category=category):
+                job_directory = os.path.join(self.directory.name, category)
+                os.makedirs(job_directory)
+                expected = synthetic_pages.write_job_file(
+                    category,
+                    12,
+                    os.path.join(job_directory, "job-1-result.jsonl"),
+                    page_kb=2,
+                )
+                with contextlib.redirect_stdout(io.StringIO()):
+                    prettier_json.prettify_directory(job_directory)
+                streamed = self.extract(category, job_directory, True)
+                prettified = self.extract(
+                    category, os.path.join(job_directory, "prettier_json"), False
+                )
+                self.assertEqual(len(streamed), len(expected))
+                self.assertEqual(streamed, prettified)
+
+
+class StreamingWriterTest(unittest.TestCase):
+    records = [
+        {"accommodation_id": "H0001", "accommodation_name": "Café del Mar"},
+        {"accommodation_id": "H0002", "reviews": ["Great pool", "Noisy"]},
+        {"accommodation_id": "H0003", "latitude": 7.89, "about_and_tags": None},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, records, output_format):
+        output_file = os.path.join(self.directory.name, f"out.{output_format}")
+        count = extract_all.write_classifications(
+            iter(records), output_file, output_format
+        )
+        self.assertEqual(count, len(records))
+        self.assertEqual(os.listdir(self.directory.name), [f"out.{output_format}"])
+        with open(output_file, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def test_json_is_what_json_dump_writes(self):
+        for records in (self.records, []):
+            text = self.write(records, "json")
+            self.assertEqual(text, json.dumps(records, indent=4, ensure_ascii=False))
+            self.assertEqual(json.loads(text), records)
+
+    def test_jsonl_round_trips(self):
+        text = self.write(self.records, "jsonl")
+        self.assertEqual([json.loads(line) for line in text.splitlines()], self.records)
+        self.assertIn("Café", text)
+
+
+class LazyDomTest(unittest.TestCase):
+    def setUp(self):
+        # Pages with a JSON-LD place object (every 4th) and nothing else in <main>
+        self.pages = {}
+        for category in extract_all.CATEGORY_SETTINGS:
+            pages = []
+            for index, (_, page, _) in enumerate(
+                synthetic_pages.iter_pages(category, 12, page_kb=2)
+            ):
+                if index % 4 == 0:
+                    start = page.index("<main>") + len("<main>")
+                    json_ld = page.index('<script type="application/ld+json">')
+                    pages.append(page[:start] + page[json_ld:])
+            self.pages[category] = pages
+
+    def classify(self, page, category):
+        return extract_all.classify_page(
+            page,
+            *extract_all.CATEGORY_SETTINGS[category],
+            extraction_mode="embedded_state",
+        )
+
+    def test_state_only_page_is_not_parsed(self):
+        backend = mock.Mock()
+        backend.parse.side_effect = AssertionError("parsed a state-only page")
+        with mock.patch.object(extract_all, "get_backend", return_value=backend):
+            for category, pages in self.pages.items():
+                for page in pages:
+                    self.classify(page, category)
+
+    def test_skipped_parse_matches_a_parsed_page(self):
+        # The class filter only sees substrings: "SrqKb-x" makes it parse the
+        # page, but matches no selector, so the fields must come out the same
+        decoy = '<main><span class="SrqKb-x"></span>'
+        for category, pages in self.pages.items():
+            for page in pages:
+                fields = self.classify(page, category)
+                self.assertIsNotNone(fields["latitude"])
+                self.assertEqual(
+                    self.classify(page.replace("<main>", decoy), category), fields
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
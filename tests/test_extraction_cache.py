@@ -0,0 +1,94 @@
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import synthetic_pages
+from extraction_cache import ExtractionCache
+
+
+def load_stage(filename, module_name):
+    # One module object per stage, whichever test file loads it first
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+extract_all = load_stage("2.extract_all.py", "extract_all")
+
+
+class ExtractionCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "extraction_cache.sqlite")
+        self.entries = [
+            {"url": url, "html": page}
+            for url, page, _ in synthetic_pages.iter_pages("do", 6, page_kb=2)
+        ]
+
+    def classify(self, cache, extraction_mode="dom"):
+        return list(
+            extract_all.classify_entries(
+                iter(self.entries),
+                *extract_all.CATEGORY_SETTINGS["do"],
+                id_registry=extract_all.new_registry(),
+                extraction_cache=cache,
+                extraction_mode=extraction_mode,
+            )
+        )
+
+    def test_hit_after_a_first_run(self):
+        cache = ExtractionCache(self.path)
+        self.addCleanup(cache.close)
+        first = self.classify(cache)
+        self.assertEqual((cache.hits, cache.misses), (0, len(self.entries)))
+        cache.commit()
+        with mock.patch.object(extract_all, "_classify_chunk") as classify_chunk:
+            self.assertEqual(self.classify(cache), first)
+        classify_chunk.assert_not_called()
+        self.assertEqual(cache.hits, len(self.entries))
+
+    def test_miss_after_a_settings_change(self):
+        cache = ExtractionCache(self.path)
+        self.addCleanup(cache.close)
+        self.classify(cache)
+        self.classify(cache, extraction_mode="embedded_state")
+        self.assertEqual((cache.hits, cache.misses), (0, 2 * len(self.entries)))
+        with mock.patch.object(extract_all, "EXTRACTOR_VERSION", "test"):
+            self.classify(cache)
+        self.assertEqual(cache.hits, 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        fields = {"activity_name": "x" * 20}
+        size = len(json.dumps(fields))
+        clock = itertools.count()
+        with mock.patch("extraction_cache.time.time", lambda: next(clock)):
+            cache = ExtractionCache(self.path, max_bytes=2 * size)
+            self.addCleanup(cache.close)
+            for key in ("a", "b", "c"):
+                cache.put(key, fields)
+            # "a" was used last, so "b" is the oldest
+            cache.get("a")
+            cache.commit()
+        self.assertEqual(cache.evicted, 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), fields)
+        self.assertEqual(cache.get("c"), fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import httpx
+import synthetic_pages
+from tests.stand_in import LAST_MODIFIED, page_etag, serve_pages
+
+
+def load_stage(filename, module_name):
+    # One module object per stage, whichever test file loads it first
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+fetch_pages = load_stage("0.fetch_pages.py", "fetch_pages")
+
+
+class FetchTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.pages = [
+            synthetic_pages.generate_page("stay", index, rng, page_kb=4)[1]
+            for index in range(6)
+        ]
+        self.server, base_url = serve_pages(self.pages)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.urls = [f"{base_url}{index}" for index in range(len(self.pages))]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache_file = os.path.join(self.directory.name, "fetch_cache.sqlite")
+
+    def fetch(self, urls=None, label="job", cache=None, **options):
+        output_file = os.path.join(self.directory.name, f"{label}-result.jsonl")
+        summary = asyncio.run(
+            fetch_pages.fetch_to_jsonl(
+                urls or self.urls, output_file, rate=0, cache=cache, **options
+            )
+        )
+        with open(output_file, "r", encoding="utf-8") as file:
+            fetched = {
+                record["input"]: record["result"] for record in map(json.loads, file)
+            }
+        return summary, fetched
+
+    def test_revalidation_keeps_the_cached_page(self):
+        cache = fetch_pages.PageCache(self.cache_file)
+        self.addCleanup(cache.close)
+        self.fetch(label="cold", cache=cache)
+        summary, fetched = self.fetch(label="revalidate", cache=cache)
+        self.assertEqual(summary["fetched"], 0)
+        self.assertEqual(summary["not_modified"], len(self.pages))
+        self.assertEqual(self.server.conditional, len(self.pages))
+        self.assertEqual(fetched, dict(zip(self.urls, self.pages)))
+
+    def test_validators_are_persisted(self):
+        cache = fetch_pages.PageCache(self.cache_file)
+        self.fetch(cache=cache)
+        cache.close()
+        cache = fetch_pages.PageCache(self.cache_file)
+        self.addCleanup(cache.close)
+        for url, page in zip(self.urls, self.pages):
+            self.assertEqual(
+                cache.get(url),
+                {"etag": page_etag(page), "last_modified": LAST_MODIFIED, "body": page},
+            )
+
+    def test_retries_429_and_5xx(self):
+        self.server.failures = {0: [429], 1: [503, 500], 2: [502, 504, 429]}
+        summary, fetched = self.fetch(retries=3)
+        self.assertEqual(summary["failed"], [])
+        self.assertEqual(fetched, dict(zip(self.urls, self.pages)))
+        self.assertEqual(self.server.requests, len(self.pages) + 6)
+
+    def test_gives_up_after_the_last_retry(self):
+        self.server.failures = {0: [503] * 5}
+        summary, fetched = self.fetch(retries=2)
+        self.assertEqual(summary["failed"], [(self.urls[0], "HTTP 503")])
+        self.assertNotIn(self.urls[0], fetched)
+        self.assertEqual(len(fetched), len(self.pages) - 1)
+
+    def test_request_errors_fail_the_url_only(self):
+        redirect = self.urls[0].replace("/page/0", "/redirect")
+        summary, fetched = self.fetch([redirect, *self.urls], retries=0)
+        [(url, error)] = summary["failed"]
+        self.assertEqual(url, redirect)
+        self.assertTrue(error.startswith("TooManyRedirects"))
+        self.assertEqual(len(fetched), len(self.pages))
+        self.assertEqual(
+            [name for name in os.listdir(self.directory.name) if name.endswith(".tmp")],
+            [],
+        )
+
+
+class RetryDelayTest(unittest.TestCase):
+    def test_retry_after_is_capped(self):
+        response = httpx.Response(429, headers={"Retry-After": "7200"})
+        self.assertEqual(fetch_pages.retry_delay(response, 0, max_delay=30), 30)
+        response = httpx.Response(503, headers={"Retry-After": "2"})
+        self.assertEqual(fetch_pages.retry_delay(response, 0, max_delay=30), 2)
+
+    def test_backoff_without_retry_after(self):
+        self.assertEqual(fetch_pages.retry_delay(None, 3, max_delay=30), 8)
+        self.assertEqual(fetch_pages.retry_delay(None, 10, max_delay=30), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from geo_index import GeoIndex, build_indexes, haversine_km, recompute_nearby
+
+
+class GeoIndexTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        # Phuket-sized spread, plus a few far-off places outside the dense grid
+        self.latitudes = np.concatenate(
+            [rng.uniform(7.75, 8.1, 500), [13.75, -33.87, 60.17]]
+        )
+        self.longitudes = np.concatenate(
+            [rng.uniform(98.25, 98.45, 500), [100.5, 151.21, 24.94]]
+        )
+        self.index = GeoIndex(self.latitudes, self.longitudes)
+        self.queries = [(7.89, 98.29), (8.05, 98.44), (7.5, 98.0), (13.7, 100.4)]
+
+    def brute_force(self, latitude, longitude):
+        distances = haversine_km(latitude, longitude, self.latitudes, self.longitudes)
+        return np.argsort(distances, kind="stable"), distances
+
+    def test_nearest_matches_brute_force(self):
+        for latitude, longitude in self.queries:
+            order, distances = self.brute_force(latitude, longitude)
+            for k in (1, 5, 40, len(self.latitudes)):
+                with self.subTest(query=(latitude, longitude), k=k):
+                    positions, found = self.index.nearest(latitude, longitude, k)
+                    np.testing.assert_array_equal(positions, order[:k])
+                    np.testing.assert_allclose(found, distances[order[:k]])
+
+    def test_nearest_excludes_the_query_place(self):
+        positions, _ = self.index.nearest(
+            self.latitudes[3], self.longitudes[3], 5, exclude=3
+        )
+        order, _ = self.brute_force(self.latitudes[3], self.longitudes[3])
+        np.testing.assert_array_equal(positions, order[order != 3][:5])
+
+    def test_within_radius_matches_brute_force(self):
+        for latitude, longitude in self.queries:
+            order, distances = self.brute_force(latitude, longitude)
+            for radius_km in (0.5, 3.0, 25.0, 1000.0):
+                with self.subTest(query=(latitude, longitude), radius=radius_km):
+                    positions, found = self.index.within_radius(
+                        latitude, longitude, radius_km
+                    )
+                    expected = order[distances[order] <= radius_km]
+                    np.testing.assert_array_equal(positions, expected)
+                    np.testing.assert_allclose(found, distances[expected])
+
+    def test_batch_nearest_matches_nearest(self):
+        positions, distances = self.index.batch_nearest(
+            self.latitudes[:50], self.longitudes[:50], 3, exclude=np.arange(50)
+        )
+        for query in range(50):
+            expected, found = self.index.nearest(
+                self.latitudes[query], self.longitudes[query], 3, exclude=query
+            )
+            np.testing.assert_array_equal(positions[query], expected)
+            np.testing.assert_allclose(distances[query], found)
+
+    def test_empty_index(self):
+        index = GeoIndex([], [])
+        self.assertEqual(len(index.nearest(7.89, 98.29, 3)[0]), 0)
+        self.assertEqual(len(index.within_radius(7.89, 98.29, 5.0)[0]), 0)
+
+
+class RecomputeNearbyTest(unittest.TestCase):
+    def setUp(self):
+        nearby = {
+            f"nearby_{p}{n}": None
+            for p in ("foodAndDrink", "activity")
+            for n in (1, 2, 3)
+        }
+        self.places = {
+            "stay": (
+                [
+                    {
+                        "accommodation_name": "Resort A",
+                        "latitude": 7.89,
+                        "longitude": 98.29,
+                        **nearby,
+                    },
+                    {
+                        "accommodation_name": "Resort B",
+                        "latitude": 7.9,
+                        "longitude": 98.3,
+                        **nearby,
+                    },
+                ],
+                ["stay.json"] * 2,
+            ),
+            "do": (
+                [
+                    {
+                        "activity_name": "Dive",
+                        "latitude": 7.891,
+                        "longitude": 98.291,
+                        **nearby,
+                    },
+                    {
+                        "activity_name": "Hike",
+                        "latitude": None,
+                        "longitude": None,
+                        **nearby,
+                    },
+                ],
+                ["do.json"] * 2,
+            ),
+        }
+        self.fields = {
+            category: [sorted(record) for record in records]
+            for category, (records, _) in self.places.items()
+        }
+
+    def test_only_existing_fields_are_written(self):
+        updated = recompute_nearby(self.places, build_indexes(self.places))
+        self.assertEqual(updated, 3)
+        for category, (records, _) in self.places.items():
+            self.assertEqual(
+                [sorted(record) for record in records], self.fields[category]
+            )
+        resort = self.places["stay"][0][0]
+        self.assertEqual(resort["nearby_activity1"], "Dive")
+        self.assertNotIn("nearby_accommodation1", resort)
+
+    def test_own_category_excludes_the_place(self):
+        dive = self.places["do"][0][0]
+        recompute_nearby(self.places, build_indexes(self.places))
+        self.assertIsNone(dive["nearby_activity1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
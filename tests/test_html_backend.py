@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+import pytest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import synthetic_pages
+
+
+def load_stage(filename, module_name):
+    # One module object per stage, whichever test file loads it first
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+extract_all = load_stage("2.extract_all.py", "extract_all")
+
+# Enough pages per category to cycle through every layout variant
+PAGES = 24
+
+
+class BackendConformanceTest(unittest.TestCase):
+    """Every backend extracts the same fields as html.parser from the same pages."""
+
+    def assert_same_fields(self, backend):
+        for category, settings in extract_all.CATEGORY_SETTINGS.items():
+            for index, (_, page, _) in enumerate(
+                synthetic_pages.iter_pages(category, PAGES, page_kb=2)
+            ):
+                with self.subTest(category=category, page=index):
+                    self.assertEqual(
+                        extract_all.classify_page(page, *settings, backend),
+                        extract_all.classify_page(page, *settings, "html.parser"),
+                    )
+
+    def test_html_parser_matches_the_synthetic_fields(self):
+        for category, settings in extract_all.CATEGORY_SETTINGS.items():
+            for index, (_, page, expected) in enumerate(
+                synthetic_pages.iter_pages(category, PAGES, page_kb=2)
+            ):
+                with self.subTest(category=category, page=index):
+                    fields = extract_all.classify_page(page, *settings, "html.parser")
+                    self.assertEqual(
+                        {key: fields.get(key) for key in expected}, expected
+                    )
+
+    def test_lxml(self):
+        pytest.importorskip("lxml")
+        self.assert_same_fields("lxml")
+
+    def test_selectolax(self):
+        pytest.importorskip("selectolax")
+        self.assert_same_fields("selectolax")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from id_allocator import (
+    allocate_id,
+    load_registry,
+    new_registry,
+    place_key,
+    save_registry,
+)
+
+NOVOTEL = {
+    "accommodation_name": "Novotel Phuket Resort",
+    "latitude": 7.8912345,
+    "longitude": 98.2954321,
+}
+
+
+class AllocateIdTest(unittest.TestCase):
+    def test_ids_survive_a_registry_reload(self):
+        registry = new_registry()
+        keys = ["https://example.com/a", "https://example.com/b"]
+        ids = [allocate_id(registry, "H", key) for key in keys]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "id_registry.json")
+            save_registry(registry, path)
+            reloaded = load_registry(path)
+        self.assertEqual([allocate_id(reloaded, "H", key) for key in keys], ids)
+        # New keys continue after the ones handed out before the reload
+        self.assertEqual(allocate_id(reloaded, "H", "https://example.com/c"), "H0003")
+
+    def test_unkeyed_ids_are_always_fresh(self):
+        registry = new_registry()
+        self.assertEqual(
+            [allocate_id(registry, "A") for _ in range(2)], ["A0001", "A0002"]
+        )
+
+
+class PlaceKeyTest(unittest.TestCase):
+    def test_url_comes_first(self):
+        record = {**NOVOTEL, "url": "https://example.com/novotel"}
+        self.assertEqual(place_key(record, "accommodation"), record["url"])
+
+    def test_name_and_rounded_coordinates(self):
+        noisy = {**NOVOTEL, "latitude": NOVOTEL["latitude"] + 1e-9}
+        self.assertEqual(
+            place_key(NOVOTEL, "accommodation"),
+            "Novotel Phuket Resort@7.891235,98.295432",
+        )
+        self.assertEqual(
+            place_key(noisy, "accommodation"), place_key(NOVOTEL, "accommodation")
+        )
+
+    def test_name_only_and_no_name(self):
+        self.assertEqual(
+            place_key({"accommodation_name": "Novotel"}, "accommodation"), "Novotel"
+        )
+        self.assertIsNone(place_key({"latitude": 7.89}, "accommodation"))
+
+    def test_same_name_elsewhere_gets_another_id(self):
+        registry = new_registry()
+        elsewhere = {**NOVOTEL, "latitude": 7.95}
+        ids = [
+            allocate_id(registry, "H", place_key(record, "accommodation"))
+            for record in (NOVOTEL, elsewhere, NOVOTEL)
+        ]
+        self.assertEqual(ids, ["H0001", "H0002", "H0001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import copy
+import os
+import sys
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from name_index import build_name_index, normalise_name, resolve_nearby
+
+
+def sample_places():
+    stay = [
+        {
+            "accommodation_id": "H0001",
+            "accommodation_name": "Novotel Phuket Resort",
+            "nearby_foodAndDrink1": "CAFÉ  del Mar!",
+            "nearby_foodAndDrink2": "Cafe del Marr",
+            "nearby_foodAndDrink3": "Somewhere Else Entirely",
+            "nearby_activity1": None,
+        }
+    ]
+    eat = [
+        {
+            "foodAndDrink_id": "F0001",
+            "foodAndDrink_name": "Café del Mar",
+            "nearby_accommodation1": "Novotel Phuket Resort",
+        }
+    ]
+    return {"stay": (stay, ["stay.json"]), "eat": (eat, ["eat.json"])}
+
+
+class ResolveNearbyTest(unittest.TestCase):
+    def test_normalise_name(self):
+        self.assertEqual(normalise_name("  CAFÉ  del Mar!"), "cafe del mar")
+        self.assertEqual(normalise_name("Fish & Chips"), "fish and chips")
+
+    def test_exact_fuzzy_and_unresolved_names(self):
+        places = sample_places()
+        edges, matches = resolve_nearby(places, build_name_index(places))
+        self.assertEqual(matches, {"id": 0, "exact": 2, "fuzzy": 1, None: 1})
+        novotel = places["stay"][0][0]
+        self.assertEqual(novotel["nearby_foodAndDrink1"], "F0001")
+        self.assertEqual(novotel["nearby_foodAndDrink2"], "F0001")
+        # Unresolved names are kept for a later run
+        self.assertEqual(novotel["nearby_foodAndDrink3"], "Somewhere Else Entirely")
+        self.assertEqual(places["eat"][0][0]["nearby_accommodation1"], "H0001")
+
+    def test_edges(self):
+        places = sample_places()
+        edges, _ = resolve_nearby(places, build_name_index(places))
+        self.assertEqual(
+            [
+                (e["nearby_edge_id"], e["target_id"], e["rank"], e["match_method"])
+                for e in edges
+            ],
+            [
+                ("H0001-foodAndDrink1", "F0001", 1, "exact"),
+                ("H0001-foodAndDrink2", "F0001", 2, "fuzzy"),
+                ("H0001-foodAndDrink3", None, 3, None),
+                ("F0001-accommodation1", "H0001", 1, "exact"),
+            ],
+        )
+        self.assertEqual(edges[1]["source_type"], "accommodation")
+        self.assertEqual(edges[1]["target_name"], "Cafe del Marr")
+
+    def test_rerun_keeps_the_ids_and_edges(self):
+        places = sample_places()
+        first, _ = resolve_nearby(places, build_name_index(places))
+        records = copy.deepcopy(places)
+        second, matches = resolve_nearby(places, build_name_index(places))
+        self.assertEqual(places, records)
+        self.assertEqual(matches["id"], 3)
+        # Resolved edges keep their ID and name; only the method says "id"
+        for before, after in zip(first, second):
+            self.assertEqual(
+                {**before, "match_method": None, "target_name": None},
+                {**after, "match_method": None, "target_name": None},
+            )
+        self.assertEqual(second[0]["target_name"], "Café del Mar")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from embeddings import HashingProvider
+from passages import PassageIndex, place_passages
+
+
+class PassageIndexTest(unittest.TestCase):
+    def test_places_without_text(self):
+        records = [{"foodAndDrink_id": "R0001", "foodAndDrink_name": "Noodle Bar"}]
+        passages = [p for r in records for p in place_passages(r, "foodAndDrink")]
+        self.assertEqual(passages, [])
+        index = PassageIndex(passages, [], "foodAndDrink")
+        self.assertEqual(index.query(np.ones(64, dtype=np.float32)), [])
+
+    def test_place_scores_its_best_passage(self):
+        provider = HashingProvider(dimensions=64)
+        record = {
+            "accommodation_id": "H0001",
+            "about_and_tags": ["Rooftop pool with a sea view."],
+            "reviews": ["Breakfast was cold.", "The rooftop pool is lovely."],
+        }
+        passages = place_passages(record, "accommodation")
+        vectors = provider.encode([passage["text"] for passage in passages])
+        index = PassageIndex(passages, vectors, "accommodation")
+        query = provider.encode(["rooftop pool"])[0]
+        [(place_id, score)] = index.query(query, k=5)
+        self.assertEqual(place_id, "H0001")
+        self.assertAlmostEqual(score, float(np.max(vectors @ query)), places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from embeddings import HashingProvider
+from recommend import RecommendationEngine
+
+
+class EmptyCategoryTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = RecommendationEngine(HashingProvider(dimensions=64))
+
+    def test_category_without_records(self):
+        self.engine.add_category("eat", [])
+        self.assertEqual(len(self.engine.categories["eat"]), 0)
+        self.assertEqual(self.engine.query("eat", "beach", 7.89, 98.29), [])
+        self.assertEqual(self.engine.query("eat", radius_km=1.0), [])
+
+    def test_root_without_extraction_output(self):
+        with tempfile.TemporaryDirectory() as root:
+            engine = RecommendationEngine.from_directory(
+                root, HashingProvider(dimensions=64), cache_file=None
+            )
+        for category in ("eat", "stay", "do"):
+            self.assertEqual(engine.query(category, "quiet resort"), [])
+
+    def test_other_categories_still_answer(self):
+        self.engine.add_category("eat", [])
+        self.engine.add_category(
+            "stay",
+            [
+                {
+                    "accommodation_id": "H0001",
+                    "accommodation_name": "Quiet Beach Resort",
+                    "latitude": 7.89,
+                    "longitude": 98.29,
+                }
+            ],
+        )
+        results = self.engine.query("stay", "quiet resort", 7.89, 98.29)
+        self.assertEqual([result["id"] for result in results], ["H0001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
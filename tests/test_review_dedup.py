@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+from review_dedup import drop_duplicates, find_duplicates
+
+POOL = (
+    "The pool was lovely and the staff at the front desk were friendly and "
+    "helpful throughout our stay."
+)
+BREAKFAST = (
+    "Breakfast had a good choice of Thai and western dishes, though the coffee "
+    "was weak and the eggs were cold."
+)
+BEACH = (
+    "A short walk to Patong beach, but the street outside is noisy until late "
+    "at night, so ask for a room at the back."
+)
+
+
+def places_with(stay_reviews, do_reviews=()):
+    stay = [{"accommodation_id": f"H000{i}", "reviews": r} for i, r in stay_reviews]
+    do = [{"activity_id": f"A000{i}", "reviews": r} for i, r in do_reviews]
+    return {
+        "stay": (stay, ["stay.json"] * len(stay)),
+        "do": (do, ["do.json"] * len(do)),
+    }
+
+
+class ReviewDedupTest(unittest.TestCase):
+    def test_near_duplicates_are_dropped(self):
+        places = places_with(
+            [
+                (1, [POOL, BREAKFAST]),
+                # Scraped again with other whitespace, case and punctuation
+                (2, [BEACH, "  " + POOL.upper().replace(",", "")]),
+            ],
+            [(1, [POOL.replace("lovely", "lovely!!")])],
+        )
+        clusters = find_duplicates(places)
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(len(clusters[0]["duplicates"]), 2)
+        savings = drop_duplicates(places, clusters)
+        self.assertEqual((savings["reviews"], savings["removed"]), (5, 2))
+        remaining = [
+            review
+            for records, _ in places.values()
+            for record in records
+            for review in record["reviews"] or ()
+        ]
+        self.assertEqual(sum("front desk" in r.lower() for r in remaining), 1)
+        self.assertIn(BREAKFAST, remaining)
+        self.assertIn(BEACH, remaining)
+
+    def test_distinct_and_short_reviews_are_kept(self):
+        places = places_with(
+            [(1, [POOL, BREAKFAST, "Great stay!"]), (2, [BEACH, "Great stay!"])]
+        )
+        self.assertEqual(find_duplicates(places), [])
+        self.assertEqual(drop_duplicates(places, [])["removed"], 0)
+
+    def test_place_left_without_reviews(self):
+        places = places_with([(1, [POOL]), (2, [POOL])])
+        drop_duplicates(places, find_duplicates(places))
+        self.assertEqual(
+            [record["reviews"] for record in places["stay"][0]], [[POOL], None]
+        )
+
+    def test_first_copy_is_kept(self):
+        padded = POOL + " Book now at www.example.com for the best rates!!!"
+        places = places_with([(1, [BREAKFAST, POOL]), (2, [padded])])
+        [cluster] = find_duplicates(places, threshold=0.6)
+        canonical = cluster["canonical"]
+        self.assertEqual(
+            (canonical["category"], canonical["record"], canonical["position"]),
+            ("stay", 0, 1),
+        )
+        drop_duplicates(places, [cluster])
+        self.assertEqual(places["stay"][0][1]["reviews"], None)
+
+    def test_first_copy_is_kept_on_equal_lengths(self):
+        variants = [POOL, POOL.replace("lovely", "lovelY"), POOL.upper()]
+        places = places_with([(i, [review]) for i, review in enumerate(variants)])
+        [cluster] = find_duplicates(places)
+        self.assertEqual(cluster["canonical"]["review"], POOL)
+
+
+if __name__ == "__main__":
+    unittest.main()
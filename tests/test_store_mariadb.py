@@ -0,0 +1,342 @@
+import importlib.util
+import json
+import os
+import re
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import id_allocator
+
+
+def load_stage(filename, module_name):
+    # One module object per stage, whichever test file loads it first
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(ROOT_DIRECTORY, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+store_mariadb = load_stage("3.store_mariadb.py", "store_mariadb")
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        self.connection.statements.append(query)
+        self._rows = []
+        tables = self.connection.tables
+        if "information_schema.tables" in query:
+            self._rows = [(1,)] if args[0] in tables else []
+        elif "information_schema.columns" in query:
+            self._rows = [
+                (name, column_type.lower())
+                for name, column_type in tables.get(args[0], {}).items()
+            ]
+        elif query.startswith("ALTER TABLE"):
+            # What MariaDB rejects with "Duplicate column name"
+            table = tables[re.match(r"ALTER TABLE `([^`]+)`", query).group(1)]
+            for column in re.findall(r"ADD COLUMN `([^`]+)`", query):
+                if column in table:
+                    raise AssertionError(f"Duplicate column name '{column}'")
+
+    def executemany(self, query, rows):
+        self.connection.statements.append(query)
+        self.connection.rows += len(rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class StubConnection:
+    """Answers the information_schema queries from `tables`, records the rest."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.statements = []
+        self.rows = 0
+        self.closed = False
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class PrepareTableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        records = [
+            {
+                "accommodation_id": "H0001",
+                "accommodation_name": "Novotel Phuket Resort",
+                "latitude": 7.89,
+                "rating": 4,
+            }
+        ]
+        with open(os.path.join(self.directory.name, "job-1.json"), "w") as file:
+            json.dump(records, file)
+
+    def load(self, connection):
+        store_mariadb.process_json_files(
+            connection,
+            self.directory.name,
+            "accommodation",
+            write_mode="insert",
+            prefetch=False,
+            schema_mode="inferred",
+            schema_registry={"tables": {}},
+        )
+
+    def alters(self, connection):
+        return [s for s in connection.statements if s.startswith("ALTER TABLE")]
+
+    def test_empty_registry_against_existing_table(self):
+        # Created by an earlier loader, with MariaDB's spelling of the types
+        connection = StubConnection(
+            {
+                "accommodation": {
+                    "accommodation_id": "VARCHAR(255)",
+                    "accommodation_name": "VARCHAR(255)",
+                    "latitude": "DOUBLE",
+                }
+            }
+        )
+        self.load(connection)
+        self.assertEqual(
+            self.alters(connection),
+            ["ALTER TABLE `accommodation` ADD COLUMN `rating` INT"],
+        )
+        self.assertEqual(connection.rows, 1)
+
+    def test_existing_table_with_every_column(self):
+        connection = StubConnection(
+            {
+                "accommodation": {
+                    "accommodation_id": "VARCHAR(255)",
+                    "accommodation_name": "TEXT",
+                    "latitude": "DOUBLE",
+                    "rating": "INT(11)",
+                }
+            }
+        )
+        self.load(connection)
+        self.assertEqual(self.alters(connection), [])
+        self.assertFalse(
+            any(s.startswith("CREATE TABLE") for s in connection.statements)
+        )
+
+    def test_narrower_column_is_widened(self):
+        connection = StubConnection(
+            {
+                "accommodation": {
+                    "accommodation_id": "VARCHAR(255)",
+                    "accommodation_name": "VARCHAR(255)",
+                    "latitude": "INT(11)",
+                    "rating": "INT(11)",
+                }
+            }
+        )
+        self.load(connection)
+        self.assertEqual(
+            self.alters(connection),
+            ["ALTER TABLE `accommodation` MODIFY COLUMN `latitude` DOUBLE"],
+        )
+
+    def test_missing_table_is_created(self):
+        connection = StubConnection({})
+        self.load(connection)
+        self.assertEqual(self.alters(connection), [])
+        self.assertTrue(
+            any(s.startswith("CREATE TABLE") for s in connection.statements)
+        )
+
+
+class AssignMissingIdsTest(unittest.TestCase):
+    def test_same_name_at_different_places(self):
+        registry = id_allocator.new_registry()
+        rows = [
+            {"accommodation_name": "Starbucks", "latitude": 7.89, "longitude": 98.29},
+            {"accommodation_name": "Starbucks", "latitude": 7.95, "longitude": 98.34},
+            {"accommodation_name": "Starbucks", "latitude": 7.89, "longitude": 98.29},
+        ]
+        store_mariadb.assign_missing_ids(rows, "accommodation", registry)
+        ids = [row["accommodation_id"] for row in rows]
+        self.assertEqual(ids, ["H0001", "H0002", "H0001"])
+
+
+class TypedLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        files = {
+            "job-1.json": [
+                {
+                    "accommodation_id": "H0001",
+                    "accommodation_name": "Novotel Phuket Resort",
+                    "latitude": 7.89,
+                    "longitude": 98.29,
+                    "reviews": ["Great pool", "Noisy street"],
+                    "nearby_activity1": "Patong Beach",
+                }
+            ],
+            # Only the second file has a rating
+            "job-2.json": [
+                {
+                    "accommodation_id": "H0002",
+                    "accommodation_name": "Starbucks",
+                    "latitude": None,
+                    "longitude": None,
+                    "rating": 4,
+                }
+            ],
+        }
+        for name, records in files.items():
+            with open(os.path.join(self.directory.name, name), "w") as file:
+                json.dump(records, file)
+
+    def load(self, connection):
+        store_mariadb.process_json_files(
+            connection,
+            self.directory.name,
+            "accommodation",
+            write_mode="insert",
+            prefetch=False,
+            schema_mode="typed",
+        )
+
+    def test_one_layout_for_every_file(self):
+        connection = StubConnection({})
+        self.load(connection)
+        creates = [s for s in connection.statements if s.startswith("CREATE TABLE")]
+        self.assertEqual(len(creates), 3)
+        self.assertIn("`rating` INT", creates[0])
+        self.assertNotIn("nearby_activity1", creates[0])
+
+    def test_insert_mode_rerun_replaces_the_places(self):
+        # Tables an earlier typed run created
+        layout = store_mariadb.typed_layout("accommodation", {})
+        connection = StubConnection(
+            {
+                name: {
+                    column: sql_type.split()[0]
+                    for column, sql_type in table["schema"].items()
+                }
+                for name, table in layout.items()
+            }
+        )
+        connection.tables["accommodation"]["rating"] = "INT(11)"
+        self.load(connection)
+        deletes = [s for s in connection.statements if s.startswith("DELETE FROM")]
+        self.assertEqual(
+            [s.split("`")[1] for s in deletes],
+            ["accommodation", "accommodation_review", "accommodation_nearby"] * 2,
+        )
+        self.assertFalse(
+            any(
+                s.startswith(("CREATE TABLE", "ALTER TABLE"))
+                for s in connection.statements
+            )
+        )
+
+    def test_radius_search_skips_missing_coordinates(self):
+        connection = StubConnection({})
+        store_mariadb.places_within(connection, "accommodation", 0.0, 0.0, 1.0, "typed")
+        self.assertIn("`latitude` IS NOT NULL", connection.statements[-1])
+
+
+class SettingsTest(unittest.TestCase):
+    def test_unknown_modes_are_rejected(self):
+        for settings in (
+            {"write_mode": "replace"},
+            {"schema_mode": "strict"},
+            {"load_method": "copy"},
+            {"max_connections": 0},
+        ):
+            with self.subTest(**settings), self.assertRaises(ValueError):
+                store_mariadb.check_settings(**settings)
+
+    def test_main_exits_before_opening_the_pool(self):
+        with mock.patch.object(
+            store_mariadb, "check_settings", side_effect=ValueError("bad mode")
+        ), mock.patch.object(store_mariadb, "ConnectionPool") as pool:
+            with self.assertRaises(SystemExit) as raised:
+                store_mariadb.main()
+        self.assertIn("bad mode", str(raised.exception.code))
+        pool.assert_not_called()
+
+    def test_main_closes_the_pool_on_a_load_error(self):
+        pool = mock.Mock()
+        with mock.patch.object(
+            store_mariadb, "ConnectionPool", return_value=pool
+        ), mock.patch.object(
+            store_mariadb, "load_tables", side_effect=ValueError("no ID column")
+        ), mock.patch.object(
+            store_mariadb, "load_registry", return_value={}
+        ), mock.patch.object(
+            store_mariadb, "load_schema_registry", return_value={"tables": {}}
+        ):
+            with self.assertRaises(SystemExit) as raised:
+                store_mariadb.main()
+        self.assertIn("no ID column", str(raised.exception.code))
+        pool.close.assert_called_once_with()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(
+            store_mariadb.pymysql, "connect", side_effect=lambda **_: StubConnection({})
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_idle_connections_are_closed(self):
+        pool = store_mariadb.ConnectionPool(size=2)
+        with pool.connection() as connection:
+            pass
+        pool.close()
+        self.assertTrue(connection.closed)
+
+    def test_failed_block_closes_its_connection(self):
+        pool = store_mariadb.ConnectionPool(size=2)
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as connection:
+                raise RuntimeError
+        self.assertTrue(connection.closed)
+
+    def test_connection_returned_after_close_is_closed(self):
+        pool = store_mariadb.ConnectionPool(size=2)
+        with pool.connection() as connection:
+            pool.close()
+            self.assertFalse(connection.closed)
+        self.assertTrue(connection.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()